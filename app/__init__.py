@@ -23,6 +23,29 @@ def create_app(test_config=None):
     if test_config:
         app.config.update(test_config)
     
+    # Tempos por etapa e /metrics
+    from app.services.metrics import init_metrics
+    init_metrics(app)
+
+    # Cache de transcrições compartilhado entre os workers
+    from app.services.transcript_cache import init_transcript_cache
+    init_transcript_cache(app)
+
+    # Banco de transcrições, agendador das chamadas ao YouTube, proxies e processos de
+    # alinhamento: também seguem o app.config (e o test_config)
+    from app.services.transcript_store import init_store
+    from app.services.upstream_scheduler import init_scheduler
+    from app.services.proxy_pool import init_proxy_pool
+    from app.services.alignment_pool import init_alignment_pool
+    init_store(app)
+    init_scheduler(app)
+    init_proxy_pool(app)
+    init_alignment_pool(app)
+
+    # static/ servido da memória, comprimido e com URLs com hash
+    from app.services.static_assets import init_static_assets, send_shell
+    init_static_assets(app)
+
     # Register blueprints
     from app.api import youtube_bp
     app.register_blueprint(youtube_bp, url_prefix='/api')
@@ -30,7 +53,7 @@ def create_app(test_config=None):
     # Basic route for testing
     @app.route('/')
     def index():
-        return app.send_static_file('index.html')
+        return send_shell(app)
 
     # Rotas SPA para evitar 404 em refresh
     @app.route('/test-1')
@@ -41,10 +64,10 @@ def create_app(test_config=None):
     @app.route('/home')
     @app.route('/watch')
     def spa_routes():
-        return app.send_static_file('index.html')
+        return send_shell(app)
 
     @app.route('/home-user')
     def home_user():
-        return app.send_static_file('index.html')
+        return send_shell(app)
     
     return app 
\ No newline at end of file
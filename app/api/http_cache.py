@@ -0,0 +1,37 @@
+import hashlib
+from typing import Callable
+
+from flask import Response, current_app, request
+
+# Validadores HTTP para as respostas que não mudam depois de entrar no cache (transcrições e
+# detalhes de vídeo). A ETag é um hash do conteúdo em cache, não do corpo serializado: um
+# If-None-Match que bate responde 304 sem montar a resposta.
+
+
+def content_etag(*parts) -> str:
+    """
+    Hex digest of the parts (str, bytes or anything with the buffer protocol), for a strong ETag.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        view = memoryview(part)
+        # Tamanho antes de cada parte, para ('ab', 'c') e ('a', 'bc') não darem o mesmo hash
+        digest.update(view.nbytes.to_bytes(8, 'little'))
+        digest.update(view)
+    return digest.hexdigest()
+
+
+def conditional_response(etag: str, cache_control: str, build: Callable[[], Response]) -> Response:
+    """
+    304 if the request's If-None-Match matches etag, otherwise the response of build(). Both get
+    the ETag and the Cache-Control policy.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,58 @@
+import json
+from typing import Dict, Iterable
+
+from flask import current_app
+
+from app.services.metrics import timed
+
+# Serialização rápida para as respostas mais pesadas da API.
+# orjson é opcional: sem ele cai no serializador JSON padrão do Flask.
+# Respostas em NDJSON (um objeto JSON por linha) são enviadas aos poucos: as primeiras linhas
+# saem sozinhas, para o cliente começar a usar logo, e o resto em blocos de NDJSON_CHUNK_BYTES.
+
+NDJSON_CHUNK_BYTES = 16 * 1024
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_response(payload, status=200):
+    if orjson is None:
+        with timed('response_serialization_seconds', encoder='json'):
+            response = current_app.json.response(payload)
+        response.status_code = status
+        return response
+    with timed('response_serialization_seconds', encoder='orjson'):
+        body = orjson.dumps(payload)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+def json_line(payload) -> bytes:
+    if orjson is None:
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+    return orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def ndjson_response(lines: Iterable[Dict], eager: int = 2, chunk_bytes: int = NDJSON_CHUNK_BYTES):
+    """
+    Streamed application/x-ndjson response with one line per payload. The first eager lines are
+    sent as soon as they are produced, the rest in chunks of about chunk_bytes.
+    """
+    def generate():
+        chunk = []
+        size = 0
+        for count, payload in enumerate(lines):
+            line = json_line(payload)
+            if count < eager:
+                yield line
+                continue
+            chunk.append(line)
+            size += len(line)
+            if size >= chunk_bytes:
+                yield b''.join(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield b''.join(chunk)
+    return current_app.response_class(generate(), mimetype='application/x-ndjson')
@@ -1,24 +1,118 @@
-from flask import jsonify, request
+import hmac
+
+from flask import current_app, jsonify, request
 from app.api import youtube_bp
-from app.services.youtube_service import search_videos, get_video_details, get_video_transcript
-from app.services.transcription_service import validate_transcription
-from collections import OrderedDict
-
-# Cache LRU em memória para as últimas 1000 transcrições
-CACHE_LIMIT = 1000
-TRANSCRIPT_CACHE = OrderedDict()
-
-def get_from_cache(video_id):
-    if video_id in TRANSCRIPT_CACHE:
-        TRANSCRIPT_CACHE.move_to_end(video_id)
-        return TRANSCRIPT_CACHE[video_id]
+from app.services.youtube_service import (search_videos, get_video_details, get_videos_details, get_video_transcript,
+                                          VIDEOS_LIST_BATCH)
+from app.services.transcription_service import ALIGNMENT_MODES, build_actual_tokens, find_window
+from app.services.alignment_pool import get_alignment_pool, AlignmentCancelled, AlignmentTimeout
+from app.services.transcription_correction import STATUS_NAMES
+from app.api.serialization import json_response, ndjson_response
+from app.api.http_cache import conditional_response, content_etag
+from app.services.validation_sessions import create_session, get_session, close_session
+from app.services.transcript_store import get_store
+from app.services.prefetch_queue import PrefetchQueue, QueueFull, PRIORITIES
+from app.services.upstream_scheduler import get_scheduler, UpstreamBusy
+from app.services.proxy_pool import get_proxy_pool
+
+def transcript_cache():
+    # Memória do worker na frente do SQLite compartilhado (ver app.services.transcript_cache)
+    return current_app.extensions['transcript_cache']
+
+@youtube_bp.after_request
+def errors_are_not_cached(response):
+    # Erros (400, 404, 503 do agendador, 500) não podem ficar num cache compartilhado no lugar
+    # da resposta boa; as rotas que põem Cache-Control o fazem só nas respostas de sucesso
+    if response.status_code >= 400 and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def upstream_busy_response(e):
+    # Agendador recusou a chamada ao YouTube: o cliente deve tentar de novo mais tarde
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = str(int(e.retry_after) + 1)
+    return response, 503
+
+def admin_error():
+    """
+    Error response for an admin-only route, or None if the request carries ADMIN_TOKEN as a
+    bearer token. Without ADMIN_TOKEN the admin routes are disabled.
+    """
+    token = current_app.config.get('ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Admin routes are disabled'}), 403
+    scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(given.strip().encode('utf-8'), token.encode('utf-8')):
+        return jsonify({'error': 'Unauthorized'}), 401
     return None
 
-def save_to_cache(video_id, transcript, timestamps):
-    TRANSCRIPT_CACHE[video_id] = (transcript, timestamps)
-    TRANSCRIPT_CACHE.move_to_end(video_id)
-    if len(TRANSCRIPT_CACHE) > CACHE_LIMIT:
-        TRANSCRIPT_CACHE.popitem(last=False)
+def time_window(values):
+    """
+    Optional start/end (seconds) of a clip from the request values. Raises ValueError if they are
+    not non-negative numbers or start comes after end.
+    """
+    bounds = []
+    for name in ('start', 'end'):
+        value = values.get(name)
+        if value is not None and value != '':
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"'{name}' must be a number of seconds")
+            if value < 0:
+                raise ValueError(f"'{name}' must not be negative")
+            bounds.append(value)
+        else:
+            bounds.append(None)
+    start, end = bounds
+    if start is not None and end is not None and start > end:
+        raise ValueError("'start' must not be after 'end'")
+    return start, end
+
+def wants_stream():
+    # ?stream=1 ou Accept pedindo NDJSON antes de JSON
+    if request.args.get('stream') in ('1', 'true', 'ndjson'):
+        return True
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+def transcript_lines(transcript, artifact, first, end):
+    """
+    NDJSON lines of a transcript stream: a meta line with the word count and the index of the
+    first word, one segment line per caption line (its start time is the timestamp of each of
+    its words), and an end line with the segment count. A failure streams an error line instead
+    of the segments.
+    """
+    yield {'type': 'meta', 'words': end - first, 'first_word': first}
+    if artifact is None:
+        yield {'type': 'error', 'error': transcript}
+        yield {'type': 'end', 'segments': 0}
+        return
+    segments = 0
+    for timestamp, start, stop in artifact.segments(first, end):
+        yield {'type': 'segment', 'start': timestamp, 'first_word': start, 'words': artifact.texts[start:stop]}
+        segments += 1
+    yield {'type': 'end', 'segments': segments}
+
+def transcript_response(transcript, timestamps, artifact, window, stream):
+    if stream:
+        # Segmentos saem direto do artefato em cache, sem montar a resposta inteira
+        first, last = (window.start, window.end) if window else (0, len(artifact) if artifact is not None else 0)
+        return ndjson_response(transcript_lines(transcript, artifact, first, last))
+    if window is None:
+        return jsonify({
+            'transcript': transcript,
+            'timestamps': timestamps
+        })
+    return jsonify({
+        'transcript': ' '.join(artifact.texts[window.start:window.end]),
+        'timestamps': timestamps[window.start:window.end],
+        'first_word': window.start
+    })
+
+def load_transcript(video_id, language_preference):
+    return transcript_cache().get_or_fetch(
+        video_id, language_preference,
+        lambda: get_video_transcript(video_id, language_preference, detailed=True))
 
 @youtube_bp.route('/search-videos', methods=['POST'])
 def search_videos_route():
@@ -31,6 +125,8 @@ def search_videos_route():
     try:
         videos = search_videos(query)
         return jsonify({'videos': videos})
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -38,7 +134,34 @@ def search_videos_route():
 def video_details_route(video_id):
     try:
         details = get_video_details(video_id)
-        return jsonify(details)
+        # Detalhes são pequenos: o corpo já serializado dá a ETag
+        response = jsonify(details)
+        return conditional_response(content_etag(response.get_data()), current_app.config['VIDEO_DETAILS_CACHE_CONTROL'],
+                                    lambda: response)
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Máximo de IDs aceitos por requisição em /video-details
+VIDEO_DETAILS_BATCH_LIMIT = 4 * VIDEOS_LIST_BATCH
+
+@youtube_bp.route('/video-details', methods=['POST'])
+def videos_details_route():
+    data = request.get_json()
+    video_ids = data.get('video_ids')
+    if not video_ids or not isinstance(video_ids, list):
+        return jsonify({'error': 'A list of video IDs is required'}), 400
+    if len(video_ids) > VIDEO_DETAILS_BATCH_LIMIT:
+        return jsonify({'error': f'At most {VIDEO_DETAILS_BATCH_LIMIT} video IDs per request'}), 400
+    try:
+        details = get_videos_details([str(video_id) for video_id in video_ids])
+        return jsonify({
+            'videos': details,
+            'missing': [video_id for video_id in video_ids if str(video_id) not in details]
+        })
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -47,29 +170,101 @@ def transcript_route(video_id):
     try:
         # Obter o idioma preferido do parâmetro da requisição, padrão é 'en'
         language_preference = request.args.get('language', 'en')
-        transcript, timestamps = get_video_transcript(video_id, language_preference)
-        return jsonify({
-            'transcript': transcript,
-            'timestamps': timestamps
-        })
+        start, end = time_window(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        transcript, timestamps, artifact = load_transcript(video_id, language_preference)
+        window = None
+        if timestamps and (start is not None or end is not None):
+            # Só as palavras do trecho (com a folga); first_word é a posição da primeira na transcrição inteira
+            window = find_window(artifact.timestamps, start, end, current_app.config['TRANSCRIPT_WINDOW_MARGIN'])
+        stream = wants_stream()
+        # A ETag muda com a representação: JSON ou NDJSON, transcrição inteira ou um trecho
+        variant = ['ndjson' if stream else 'json']
+        if window is not None:
+            variant.append(f"{window.start}-{window.end}")
+        if timestamps:
+            etag = content_etag(transcript, artifact.timestamps, str(len(timestamps)), *variant)
+            cache_control = current_app.config['TRANSCRIPT_CACHE_CONTROL']
+        else:
+            etag = content_etag(transcript, *variant)
+            cache_control = current_app.config['TRANSCRIPT_NEGATIVE_CACHE_CONTROL']
+        response = conditional_response(etag, cache_control, lambda: transcript_response(
+            transcript, timestamps, artifact, window, stream))
+        response.vary.add('Accept')
+        return response
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@youtube_bp.route('/transcript/<video_id>', methods=['DELETE'])
+def invalidate_transcript_route(video_id):
+    # Descarta o resultado em cache, inclusive uma falha guardada, para forçar nova busca.
+    # Só com o token de administração: sem ele, qualquer um faria o servidor buscar de novo
+    error = admin_error()
+    if error is not None:
+        return error
+    try:
+        language_preference = request.args.get('language', 'en')
+        # O banco primeiro: senão uma busca concorrente poderia ler a transcrição dele e gravá-la
+        # de novo no cache. Os outros workers largam a cópia em memória em MEMORY_CACHE_TTL
+        transcript_deleted = get_store().delete_transcript(video_id, language_preference)
+        failure_cleared = get_store().delete_failure(video_id, language_preference)
+        transcript_cache().delete(video_id, language_preference)
+        return jsonify({'success': True, 'transcript_deleted': transcript_deleted, 'failure_cleared': failure_cleared})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def prefetch_queue():
+    queue = current_app.extensions.get('prefetch_queue')
+    if queue is None:
+        # Criada no primeiro uso; se duas threads chegarem juntas, fica a primeira
+        queue = current_app.extensions.setdefault('prefetch_queue', PrefetchQueue(
+            current_app._get_current_object(), load_transcript,
+            current_app.config['PREFETCH_WORKERS'], current_app.config['PREFETCH_QUEUE_LIMIT']))
+    return queue
+
 @youtube_bp.route('/preload-transcript', methods=['POST'])
 def preload_transcript_route():
+    # Enfileira o pré-carregamento e responde na hora com os IDs dos jobs
     data = request.get_json()
-    video_id = data.get('video_id')
+    video_ids = data.get('video_ids') or ([data['video_id']] if data.get('video_id') else [])
     language_preference = data.get('language', 'en')
-    if not video_id:
+    priority = data.get('priority', 'normal')
+    if not video_ids or not isinstance(video_ids, list):
         return jsonify({'error': 'Video ID is required'}), 400
+    if priority not in PRIORITIES:
+        return jsonify({'error': f"Priority must be one of: {', '.join(PRIORITIES)}"}), 400
     try:
-        cached = get_from_cache(video_id)
-        if cached:
-            transcript, timestamps = cached
-        else:
-            transcript, timestamps = get_video_transcript(video_id, language_preference)
-            save_to_cache(video_id, transcript, timestamps)
-        return jsonify({'success': True})
+        jobs = prefetch_queue().submit([str(video_id) for video_id in video_ids], language_preference, priority)
+        return jsonify({'success': True, 'jobs': [job.to_dict() for job in jobs]}), 202
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@youtube_bp.route('/preload-transcript/<job_id>', methods=['GET'])
+def preload_status_route(job_id):
+    job = prefetch_queue().get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@youtube_bp.route('/cache-stats', methods=['GET'])
+def cache_stats_route():
+    try:
+        stats = transcript_cache().stats()
+        stats['prefetch'] = prefetch_queue().stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@youtube_bp.route('/upstream-status', methods=['GET'])
+def upstream_status_route():
+    try:
+        return jsonify(dict(get_scheduler().stats(), proxies=get_proxy_pool().stats()))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -79,26 +274,113 @@ def validate_transcription_route():
     video_id = data.get('video_id')
     user_transcription = data.get('user_transcription')
     language_preference = data.get('language', 'en')
+    alignment = data.get('alignment', 'greedy')
+    # 'compact' omite os textos que o cliente já tem e codifica os resultados em spans
+    response_format = data.get('format', 'full')
     if not video_id or not user_transcription:
         return jsonify({'error': 'Video ID and user transcription are required'}), 400
+    if alignment not in ALIGNMENT_MODES:
+        return jsonify({'error': f"Alignment must be one of: {', '.join(ALIGNMENT_MODES)}"}), 400
+    if response_format not in ('full', 'compact'):
+        return jsonify({'error': 'Format must be one of: full, compact'}), 400
     try:
-        cached = get_from_cache(video_id)
-        if cached:
-            actual_transcript, timestamps = cached
-        else:
-            actual_transcript, timestamps = get_video_transcript(video_id, language_preference)
-            save_to_cache(video_id, actual_transcript, timestamps)
+        start, end = time_window(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        actual_transcript, timestamps, artifact = load_transcript(video_id, language_preference)
         if isinstance(actual_transcript, str) and not timestamps:
             return jsonify({'error': actual_transcript}), 400
-        results = validate_transcription(user_transcription, actual_transcript, timestamps)
-        return jsonify({
-            'user_transcription': user_transcription,
-            'actual_transcript': actual_transcript,
-            'results': results,
-            'wpm_stats': {
+        window = None
+        if start is not None or end is not None:
+            # Alinha só contra as palavras do trecho praticado, mais a folga
+            tokens = artifact if artifact is not None else build_actual_tokens(actual_transcript, timestamps)
+            window = find_window(tokens.timestamps, start, end, current_app.config['TRANSCRIPT_WINDOW_MARGIN'])
+            artifact = tokens.slice(window.start, window.end)
+        # Textos longos rodam no pool de processos; os curtos, aqui mesmo
+        result, user_tokens, actual_tokens = get_alignment_pool().align(user_transcription, actual_transcript,
+                                                                         timestamps, alignment, artifact)
+        if window is None:
+            first_word = 0
+            wpm_stats = {
                 'total_words': len(actual_transcript.split()),
                 'duration_minutes': timestamps[-1] / 60 if timestamps else 0
             }
+        else:
+            # Palavras da folga que o usuário não digitou não contam como faltando
+            first_word = window.start
+            result = result.without_missing(window.core_start - window.start, window.core_end - window.start)
+            clip_end = min(end, timestamps[-1]) if end is not None else timestamps[-1]
+            wpm_stats = {
+                'total_words': window.core_end - window.core_start,
+                'duration_minutes': max(clip_end - (start or 0), 0) / 60
+            }
+        if response_format == 'compact':
+            # Spans [tipo, início, tamanho]: 'missing' indexa as palavras de actual_transcript.split(),
+            # os demais tipos indexam as palavras do usuário (regex \b\w+[\w']*\b)
+            return json_response({
+                'format': 'compact',
+                'types': STATUS_NAMES,
+                'spans': result.to_spans(actual_offset=first_word),
+                'user_words': len(user_tokens),
+                'wpm_stats': wpm_stats
+            })
+        return json_response({
+            'user_transcription': user_transcription,
+            'actual_transcript': actual_transcript if window is None else ' '.join(actual_tokens.texts),
+            'results': result.to_dicts(user_tokens, actual_tokens),
+            'wpm_stats': wpm_stats
+        })
+    except AlignmentTimeout as e:
+        return jsonify({'error': str(e)}), 503
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@youtube_bp.route('/validation-sessions', methods=['POST'])
+def create_validation_session_route():
+    data = request.get_json()
+    video_id = data.get('video_id')
+    language_preference = data.get('language', 'en')
+    if not video_id:
+        return jsonify({'error': 'Video ID is required'}), 400
+    try:
+        actual_transcript, timestamps, artifact = load_transcript(video_id, language_preference)
+        if isinstance(actual_transcript, str) and not timestamps:
+            return jsonify({'error': actual_transcript}), 400
+        session = create_session(video_id, language_preference, actual_transcript, timestamps, artifact)
+        return jsonify({
+            'session_id': session.session_id,
+            'total_words': len(session.actual)
         })
+    except UpstreamBusy as e:
+        return upstream_busy_response(e)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@youtube_bp.route('/validation-sessions/<session_id>', methods=['POST'])
+def update_validation_session_route(session_id):
+    data = request.get_json()
+    text = data.get('text', '')
+    offset = data.get('offset')
+    if not isinstance(text, str) or (offset is not None and (not isinstance(offset, int) or isinstance(offset, bool))):
+        return jsonify({'error': 'Text must be a string and offset an integer'}), 400
+    session = get_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Validation session not found or expired'}), 404
+    try:
+        return jsonify(session.update(text, offset))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except AlignmentCancelled:
+        # Uma atualização mais nova chegou; a resposta dela já inclui este texto
+        return jsonify({'error': 'Superseded by a newer update'}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@youtube_bp.route('/validation-sessions/<session_id>', methods=['DELETE'])
+def close_validation_session_route(session_id):
+    if not close_session(session_id):
+        return jsonify({'error': 'Validation session not found or expired'}), 404
+    return jsonify({'success': True})
@@ -0,0 +1,217 @@
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from app.services.alignment_worker import FRAME_HEADER, write_frame
+from app.services.app_singleton import AppSingleton
+from app.services.metrics import inc, timed
+from app.services.transcription_correction import AlignmentCancelled, AlignmentResult, TokenSequence
+from app.services.transcription_service import ALIGNMENT_MODES, build_actual_tokens, build_user_tokens
+
+# select() em pipes só existe em sistemas POSIX; sem ele tudo roda na própria thread
+try:
+    import select
+except ImportError:
+    select = None
+if os.name == 'nt':
+    select = None
+
+# O alinhamento é Python puro e segura o GIL: um texto longo parava todas as outras requisições
+# do worker. Acima de um número de tokens ele roda num processo separado, de um pool persistente;
+# os curtos continuam na thread da requisição. Um alinhamento que passa do tempo ou é cancelado
+# tem o processo encerrado, e um novo é iniciado no próximo uso.
+
+# Raiz do repositório, para os processos acharem o pacote app
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Intervalo entre as verificações de cancelamento enquanto espera a resposta
+_POLL_INTERVAL = 0.05
+# Bytes lidos do pipe por vez
+_READ_SIZE = 1 << 16
+
+
+class AlignmentTimeout(Exception):
+    pass
+
+
+class _Worker:
+    def __init__(self, startup_timeout: float):
+        self.process = subprocess.Popen([sys.executable, '-m', 'app.services.alignment_worker'], cwd=_ROOT,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        # Leituras sem bloqueio direto no descritor: um pickle.load depois do select ainda
+        # bloquearia (sem prazo) até a resposta inteira chegar
+        self.stdout_fd = self.process.stdout.fileno()
+        os.set_blocking(self.stdout_fd, False)
+        try:
+            status, _ = self.receive(time.monotonic() + startup_timeout)
+        except BaseException:
+            self.kill()
+            raise
+        if status != 'ready':
+            self.kill()
+            raise RuntimeError('Alignment worker failed to start')
+
+    def send(self, request):
+        write_frame(self.process.stdin, request)
+
+    def receive(self, deadline: float, cancel: Optional[threading.Event] = None):
+        """
+        Next reply of the worker, read as it arrives and unpickled once the whole frame is in.
+        """
+        received = bytearray()
+        size = None
+        while True:
+            if cancel is not None and cancel.is_set():
+                raise AlignmentCancelled('Alignment cancelled')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise AlignmentTimeout('Alignment took too long')
+            readable, _, _ = select.select([self.stdout_fd], [], [], min(remaining, _POLL_INTERVAL))
+            if not readable:
+                continue
+            try:
+                chunk = os.read(self.stdout_fd, _READ_SIZE)
+            except BlockingIOError:
+                continue
+            if not chunk:
+                raise RuntimeError('Alignment worker exited')
+            received += chunk
+            if size is None and len(received) >= FRAME_HEADER.size:
+                size = FRAME_HEADER.size + FRAME_HEADER.unpack_from(received)[0]
+            if size is not None and len(received) >= size:
+                return pickle.loads(memoryview(received)[FRAME_HEADER.size:size])
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+
+class AlignmentPool:
+    """
+    Runs alignments with at least threshold tokens (user plus actual) in a pool of worker
+    processes, and shorter ones inline. With workers=0, or without select() on pipes,
+    everything runs inline.
+    """
+    def __init__(self, workers: int = 2, threshold: int = 4000, timeout: float = 30, startup_timeout: float = 30):
+        self.workers = workers if select is not None else 0
+        self.threshold = threshold
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.idle: List[_Worker] = []
+        self.started = 0
+        self.condition = threading.Condition()
+
+    def align(self, user_input: str, actual_transcript: str, timestamps: List[float] = None,
+              alignment: str = 'greedy', artifact=None, timeout: Optional[float] = None,
+              cancel: Optional[threading.Event] = None) -> Tuple[AlignmentResult, TokenSequence, TokenSequence]:
+        """
+        Same as align_transcription. Raises AlignmentTimeout when a pooled alignment does not
+        finish (or find a free worker) within timeout seconds, and AlignmentCancelled when
+        cancel is set first; either way the worker running it is killed.
+        """
+        if alignment not in ALIGNMENT_MODES:
+            raise ValueError(f"Unknown alignment mode: {alignment}")
+        actual_tokens = artifact if artifact is not None else build_actual_tokens(actual_transcript, timestamps)
+        user_tokens = build_user_tokens(user_input)
+
+        if not self.workers or len(user_tokens) + len(actual_tokens) < self.threshold:
+            inc('alignments_total', where='inline')
+            return ALIGNMENT_MODES[alignment]().compare(user_tokens, actual_tokens), user_tokens, actual_tokens
+
+        inc('alignments_total', where='pool')
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with timed('alignment_pool_seconds', alignment=alignment, outcome='ok'):
+            worker = self._checkout(deadline)
+            try:
+                worker.send((alignment, user_tokens.texts, user_tokens.normalized,
+                             actual_tokens.texts, actual_tokens.normalized))
+                status, payload = worker.receive(deadline, cancel)
+            except BaseException:
+                self._discard(worker)
+                raise
+            self._checkin(worker)
+        if status != 'ok':
+            raise RuntimeError(payload)
+        result = AlignmentResult()
+        result.statuses, result.indexes = payload
+        return result, user_tokens, actual_tokens
+
+    def stats(self):
+        with self.condition:
+            return {'workers': self.workers, 'started': self.started, 'idle': len(self.idle),
+                    'threshold': self.threshold, 'timeout': self.timeout}
+
+    def shutdown(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+            self.started -= len(idle)
+        for worker in idle:
+            worker.kill()
+
+    def _checkout(self, deadline: float) -> _Worker:
+        dead = None
+        with self.condition:
+            while not self.idle:
+                if self.started < self.workers:
+                    # Inicia fora do lock; a vaga já fica reservada
+                    self.started += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise AlignmentTimeout('No alignment worker became free in time')
+                self.condition.wait(remaining)
+            else:
+                worker = self.idle.pop()
+                if worker.alive():
+                    return worker
+                # Morreu parado (OOM killer, por exemplo): a vaga passa para um processo novo
+                dead = worker
+        if dead is not None:
+            dead.kill()
+        try:
+            return _Worker(self.startup_timeout)
+        except BaseException:
+            with self.condition:
+                self.started -= 1
+                self.condition.notify()
+            raise
+
+    def _checkin(self, worker: _Worker):
+        with self.condition:
+            self.idle.append(worker)
+            self.condition.notify()
+
+    def _discard(self, worker: _Worker):
+        worker.kill()
+        with self.condition:
+            self.started -= 1
+            self.condition.notify()
+
+
+def _create_alignment_pool(config) -> AlignmentPool:
+    return AlignmentPool(config['ALIGNMENT_POOL_WORKERS'], config['ALIGNMENT_POOL_THRESHOLD'],
+                         config['ALIGNMENT_TIMEOUT'])
+
+
+# Uma segunda app no mesmo processo (testes) não deixa os processos da anterior para trás
+_POOL = AppSingleton(_create_alignment_pool, close=AlignmentPool.shutdown)
+
+
+def init_alignment_pool(app) -> AlignmentPool:
+    return _POOL.init(app)
+
+
+def get_alignment_pool() -> AlignmentPool:
+    return _POOL.get()
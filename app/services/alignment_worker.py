@@ -0,0 +1,64 @@
+import pickle
+import struct
+import sys
+
+from app.services.transcription_correction import TokenSequence
+from app.services.transcription_equivalents import equivalence_class
+from app.services.transcription_service import ALIGNMENT_MODES
+
+# Processo de alinhamento do AlignmentPool (python -m app.services.alignment_worker).
+# Recebe pedidos em pickle pelo stdin e responde pelo stdout, um de cada vez. As tabelas de
+# equivalência são montadas na importação acima, antes do aviso de pronto.
+# Cada mensagem vai num quadro: o tamanho (4 bytes, big-endian) e o pickle. Assim o processo
+# pai lê a resposta aos pedaços, sem bloquear, e só desserializa quando ela chegou inteira.
+FRAME_HEADER = struct.Struct('>I')
+
+
+def write_frame(stream, message):
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(FRAME_HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def read_frame(stream):
+    """
+    Next message from a blocking binary stream. Raises EOFError when the stream ends.
+    """
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        raise EOFError
+    size, = FRAME_HEADER.unpack(header)
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError
+    return pickle.loads(data)
+
+
+def main():
+    requests = sys.stdin.buffer
+    replies = sys.stdout.buffer
+    # Qualquer print perdido vai para o stderr e não corrompe as respostas
+    sys.stdout = sys.stderr
+
+    equivalence_class('warmup')
+    write_frame(replies, ('ready', None))
+
+    while True:
+        try:
+            alignment, user_texts, user_normalized, actual_texts, actual_normalized = read_frame(requests)
+        except EOFError:
+            return
+        try:
+            comparer = ALIGNMENT_MODES[alignment]()
+            # IDs de classe são do processo: as duas sequências são refeitas aqui, a transcrição
+            # primeiro (índice global) e depois o texto do usuário (IDs locais)
+            actual = TokenSequence(actual_texts, actual_normalized)
+            result = comparer.compare(TokenSequence(user_texts, user_normalized, scope={}), actual)
+            reply = ('ok', (result.statuses, result.indexes))
+        except Exception as e:
+            reply = ('error', f"{type(e).__name__}: {e}")
+        write_frame(replies, reply)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+from config import Config
+
+T = TypeVar('T')
+
+
+class AppSingleton(Generic[T]):
+    """
+    Process-wide service built from a config mapping. create_app calls init(app) so the service
+    follows app.config (and a test_config); code that runs outside an app, such as scripts and
+    benchmarks, gets one built from config.Config on the first get().
+    close, if given, is called on an instance that a later init() replaces.
+    """
+    def __init__(self, create: Callable[..., T], close: Optional[Callable[[T], None]] = None):
+        self.create = create
+        self.close = close
+        self.instance: Optional[T] = None
+        self.lock = threading.Lock()
+
+    def init(self, app) -> T:
+        with self.lock:
+            if self.instance is not None and self.close is not None:
+                self.close(self.instance)
+            self.instance = self.create(app.config)
+            return self.instance
+
+    def get(self) -> T:
+        if self.instance is None:
+            with self.lock:
+                if self.instance is None:
+                    self.instance = self.create(vars(Config))
+        return self.instance
@@ -0,0 +1,171 @@
+import bisect
+import contextvars
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Métricas do processo no formato de texto do Prometheus, servidas em /metrics.
+# Cada worker do gunicorn tem as suas: uma coleta vê o worker que atendeu a requisição.
+# Os tempos de cada etapa também viram spans do trace da requisição atual; só as requisições
+# lentas (e só uma amostra delas) têm o trace escrito no log.
+
+# Limites dos buckets, em segundos
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Registry:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.histograms: Dict[str, Dict[tuple, list]] = {}
+        self.counters: Dict[str, Dict[tuple, float]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, value: float, labels: Dict[str, str]):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            entry = series.get(key)
+            if entry is None:
+                # contagem por bucket (o último é +Inf), soma, total
+                entry = series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def inc(self, name: str, labels: Dict[str, str], amount: float = 1):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(self.counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+            for name in sorted(self.histograms):
+                lines.append(f"# TYPE {name} histogram")
+                for key, (counts, total, count) in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets, counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(key, le=f'{bound:g}')} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, le='+Inf')} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(key: tuple, le: Optional[str] = None) -> str:
+    pairs = list(key) + ([('le', le)] if le is not None else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+METRICS = Registry()
+
+
+class Trace:
+    __slots__ = ('name', 'started', 'spans')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[tuple] = []
+
+    def to_dict(self, duration: float) -> Dict:
+        return {
+            'request': self.name,
+            'duration_ms': round(duration * 1000, 2),
+            'spans': [{'name': name, 'start_ms': round((started - self.started) * 1000, 2),
+                       'duration_ms': round(span_duration * 1000, 2), **labels}
+                      for name, started, span_duration, labels in self.spans],
+        }
+
+
+# Trace da requisição atual; as threads que rodam numa cópia do contexto também o veem
+_TRACE = contextvars.ContextVar('trace', default=None)
+
+
+def observe(name: str, seconds: float, **labels):
+    METRICS.observe(name, seconds, labels)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    METRICS.inc(name, labels, amount)
+
+
+def record(name: str, started: float, seconds: float, **labels):
+    """
+    Observe a duration measured from started (a perf_counter value) and add it as a span of the current trace.
+    """
+    METRICS.observe(name, seconds, labels)
+    trace = _TRACE.get()
+    if trace is not None:
+        trace.spans.append((name, started, seconds, labels))
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """
+    Time the block into the name histogram. An 'outcome' label, if given, becomes 'error'
+    when the block raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        if 'outcome' in labels:
+            labels['outcome'] = 'error'
+        raise
+    finally:
+        record(name, started, time.perf_counter() - started, **labels)
+
+
+def init_metrics(app):
+    """
+    Time every request and serve the registry at /metrics. Requests slower than
+    SLOW_REQUEST_SECONDS have their trace logged with probability TRACE_SAMPLE_RATE.
+    """
+    from flask import g, request
+
+    slow_seconds = app.config['SLOW_REQUEST_SECONDS']
+    sample_rate = app.config['TRACE_SAMPLE_RATE']
+
+    @app.before_request
+    def start_trace():
+        g.trace_token = _TRACE.set(Trace(f"{request.method} {request.path}"))
+
+    @app.after_request
+    def finish_trace(response):
+        token = g.pop('trace_token', None)
+        if token is None:
+            return response
+        trace = _TRACE.get()
+        _TRACE.reset(token)
+        duration = time.perf_counter() - trace.started
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe('http_request_seconds', duration, endpoint=endpoint, method=request.method,
+                status=str(response.status_code))
+        if duration >= slow_seconds and random.random() < sample_rate:
+            app.logger.warning(f"Slow request trace: {json.dumps(trace.to_dict(duration))}")
+        return response
+
+    @app.teardown_request
+    def drop_trace(error=None):
+        # Exceção antes do after_request: o trace é descartado
+        token = g.pop('trace_token', None)
+        if token is not None:
+            _TRACE.reset(token)
+
+    @app.route('/metrics')
+    def metrics_route():
+        return app.response_class(METRICS.render(), mimetype='text/plain; version=0.0.4')
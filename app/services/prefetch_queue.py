@@ -0,0 +1,155 @@
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from app.services.upstream_scheduler import background_priority
+
+# Fila de pré-carregamento de transcrições: /api/preload-transcript só enfileira e responde na
+# hora; um pool fixo de threads busca as transcrições em segundo plano e o resultado vai para o
+# cache de transcrições. Pedidos repetidos do mesmo vídeo e idioma reaproveitam o job em andamento.
+
+PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class QueueFull(Exception):
+    pass
+
+
+class PrefetchJob:
+    __slots__ = ('job_id', 'video_id', 'language', 'priority', 'status', 'error', 'created_at', 'finished_at')
+
+    def __init__(self, video_id: str, language: str, priority: int):
+        self.job_id = uuid.uuid4().hex
+        self.video_id = video_id
+        self.language = language
+        self.priority = priority
+        self.status = JOB_QUEUED
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'video_id': self.video_id,
+            'language': self.language,
+            'status': self.status,
+            'error': self.error,
+        }
+
+
+class PrefetchQueue:
+    """
+    Bounded priority queue of transcript loads run by a fixed pool of daemon threads.
+    load(video_id, language) is called inside an app context and should store its result
+    in the transcript cache; a transcript that comes back as a failure message marks the job failed.
+    """
+    def __init__(self, app, load: Callable, workers: int = 2, max_pending: int = 500, job_ttl: float = 600):
+        self.app = app
+        self.load = load
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self.heap = []
+        self.counter = itertools.count()
+        self.jobs: Dict[str, PrefetchJob] = OrderedDict()
+        self.active: Dict[tuple, PrefetchJob] = {}
+        self.pending = 0
+        self.running = 0
+        self.condition = threading.Condition()
+        self.threads: List[threading.Thread] = []
+
+    def submit(self, video_ids: List[str], language: str, priority: str = 'normal') -> List[PrefetchJob]:
+        """
+        Enqueue one job per video, or return the job already queued or running for it.
+        Raises QueueFull if the new jobs do not fit; nothing is enqueued in that case.
+        """
+        rank = PRIORITIES[priority]
+        with self.condition:
+            self._expire_jobs()
+            new_keys = {(video_id, language) for video_id in video_ids} - set(self.active)
+            if self.pending + len(new_keys) > self.max_pending:
+                raise QueueFull(f"Prefetch queue is full ({self.pending} jobs pending)")
+            self._start_workers()
+
+            jobs = []
+            for video_id in video_ids:
+                key = (video_id, language)
+                job = self.active.get(key)
+                if job is None:
+                    job = PrefetchJob(video_id, language, rank)
+                    self.jobs[job.job_id] = job
+                    self.active[key] = job
+                    self.pending += 1
+                    heapq.heappush(self.heap, (rank, next(self.counter), job))
+                    self.condition.notify()
+                elif job.status == JOB_QUEUED and rank < job.priority:
+                    # Sobe a prioridade: a entrada antiga no heap é ignorada quando sair
+                    job.priority = rank
+                    heapq.heappush(self.heap, (rank, next(self.counter), job))
+                jobs.append(job)
+            return jobs
+
+    def get_job(self, job_id: str) -> Optional[PrefetchJob]:
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        with self.condition:
+            return {'pending': self.pending, 'running': self.running, 'workers': self.workers,
+                    'max_pending': self.max_pending, 'jobs': len(self.jobs)}
+
+    def _start_workers(self):
+        # Threads criadas no primeiro uso, já dentro do worker do gunicorn
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._run, name=f"prefetch-{len(self.threads)}", daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                job = None
+                while job is None:
+                    while not self.heap:
+                        self.condition.wait()
+                    rank, _, candidate = heapq.heappop(self.heap)
+                    if candidate.status == JOB_QUEUED and rank == candidate.priority:
+                        job = candidate
+                job.status = JOB_RUNNING
+                self.pending -= 1
+                self.running += 1
+
+            try:
+                # Chamadas ao YouTube daqui cedem a vez às das requisições interativas
+                with self.app.app_context(), background_priority():
+                    transcript, timestamps, _ = self.load(job.video_id, job.language)
+                status, error = (JOB_DONE, None) if timestamps else (JOB_FAILED, transcript)
+            except Exception as e:
+                status, error = JOB_FAILED, str(e)
+
+            with self.condition:
+                job.status = status
+                job.error = error
+                job.finished_at = time.time()
+                self.running -= 1
+                self.active.pop((job.video_id, job.language), None)
+
+    def _expire_jobs(self):
+        # Jobs terminados há mais de job_ttl saem da consulta de status. Os jobs estão em ordem
+        # de criação, então a varredura para no primeiro criado há menos de job_ttl.
+        now = time.time()
+        for job_id, job in list(self.jobs.items()):
+            if now - job.created_at <= self.job_ttl:
+                break
+            if job.finished_at is not None and now - job.finished_at > self.job_ttl:
+                del self.jobs[job_id]
@@ -0,0 +1,236 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+from app.services.app_singleton import AppSingleton
+
+# Pool de proxies para o tráfego do requests (youtube_transcript_api). Cada proxy guarda as
+# latências e erros recentes; depois de uma sequência de falhas o circuito abre e o proxy fica
+# fora por um tempo, voltando com uma única tentativa de teste. Requisições idempotentes que
+# demoram mais que o percentil de latência do proxy ganham uma segunda tentativa por outro proxy
+# e vale a primeira resposta boa.
+
+# Respostas que indicam problema no proxy (ou bloqueio do IP de saída), não no pedido
+PROXY_FAILURE_STATUSES = {407, 429, 502, 503, 504}
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+# Nome usado na configuração para sair sem proxy
+DIRECT = 'direct'
+
+
+class Proxy:
+    def __init__(self, url: str, window: int = 50):
+        self.url = url
+        self.proxies = {} if url == DIRECT else {'http': url, 'https': url}
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = CIRCUIT_CLOSED
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.in_flight = 0
+
+    @property
+    def name(self) -> str:
+        # Sem credenciais nas métricas e logs
+        return self.url.rsplit('@', 1)[-1]
+
+    def error_rate(self) -> float:
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+    def score(self) -> float:
+        # Menor é melhor: latência mediana penalizada pela taxa de erro e pela carga atual
+        median = self.latency_percentile(0.5) or 0.0
+        return (median + 0.05 * self.in_flight) * (1 + 4 * self.error_rate())
+
+
+class ProxyPool:
+    def __init__(self, urls: List[str], failure_threshold: int = 5, open_seconds: float = 30,
+                 hedge_percentile: float = 0.9, hedge_min_delay: float = 0.3, hedge_default_delay: float = 2.0,
+                 max_workers: int = 16):
+        self.proxies = [Proxy(url) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='proxy-attempt')
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def choose(self, exclude=()) -> Optional[Proxy]:
+        """
+        Healthiest available proxy not in exclude. Open circuits past their timeout admit one
+        trial request. When every circuit is open, the one closest to reopening is used.
+        """
+        now = time.monotonic()
+        with self.lock:
+            available = []
+            for proxy in self.proxies:
+                if proxy in exclude:
+                    continue
+                if proxy.state == CIRCUIT_OPEN and now >= proxy.open_until:
+                    proxy.state = CIRCUIT_HALF_OPEN
+                if proxy.state == CIRCUIT_CLOSED or (proxy.state == CIRCUIT_HALF_OPEN and not proxy.trial_in_flight):
+                    available.append(proxy)
+            if available:
+                chosen = min(available, key=Proxy.score)
+                if chosen.state == CIRCUIT_HALF_OPEN:
+                    chosen.trial_in_flight = True
+                return chosen
+            if exclude:
+                return None
+            return min(self.proxies, key=lambda proxy: proxy.open_until)
+
+    def preferred(self) -> Proxy:
+        """
+        Healthiest closed-circuit proxy, without reserving a trial; for clients that keep a proxy.
+        """
+        with self.lock:
+            closed = [proxy for proxy in self.proxies if proxy.state == CIRCUIT_CLOSED]
+            return min(closed, key=Proxy.score) if closed else self.proxies[0]
+
+    def record(self, proxy: Proxy, latency: float, ok: bool):
+        with self.lock:
+            proxy.outcomes.append(ok)
+            proxy.trial_in_flight = False
+            if ok:
+                proxy.latencies.append(latency)
+                proxy.consecutive_failures = 0
+                proxy.state = CIRCUIT_CLOSED
+                return
+            proxy.consecutive_failures += 1
+            if proxy.state == CIRCUIT_HALF_OPEN or proxy.consecutive_failures >= self.failure_threshold:
+                proxy.state = CIRCUIT_OPEN
+                proxy.open_until = time.monotonic() + self.open_seconds
+
+    def hedge_delay(self, proxy: Proxy) -> float:
+        with self.lock:
+            if len(proxy.latencies) < 10:
+                return self.hedge_default_delay
+            return max(self.hedge_min_delay, proxy.latency_percentile(self.hedge_percentile))
+
+    def request(self, send: Callable, hedge: bool = True):
+        """
+        Run send(proxy) -> response on the healthiest proxy. With hedge, a second attempt goes
+        to another proxy once the first has been running for the hedge delay, or right away if
+        the first fails. Returns the first good response, else the last bad response, else
+        raises the last error.
+        """
+        primary = self.choose()
+        attempts = {self._submit(send, primary): primary}
+        tried = {primary}
+        hedged = not hedge or len(self.proxies) < 2
+        hedge_at = time.monotonic() + self.hedge_delay(primary)
+        last_error = None
+        last_response = None
+
+        while attempts:
+            timeout = None if hedged else max(0.0, hedge_at - time.monotonic())
+            done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                self._hedge(send, attempts, tried)
+                continue
+            for future in done:
+                proxy = attempts.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if response.status_code in PROXY_FAILURE_STATUSES:
+                    last_response = response
+                    continue
+                if proxy is not primary:
+                    with self.lock:
+                        self.hedge_wins += 1
+                # A tentativa perdedora termina sozinha; a resposta dela é só fechada
+                for other in attempts:
+                    other.add_done_callback(_close_response)
+                return response
+            if not hedged:
+                # Falhou antes do atraso: tenta outro proxy já
+                hedged = True
+                self._hedge(send, attempts, tried)
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def _hedge(self, send: Callable, attempts: Dict, tried: set):
+        secondary = self.choose(exclude=tried)
+        if secondary is None:
+            return
+        tried.add(secondary)
+        with self.lock:
+            self.hedges += 1
+        attempts[self._submit(send, secondary)] = secondary
+
+    def _submit(self, send: Callable, proxy: Proxy):
+        with self.lock:
+            proxy.in_flight += 1
+        return self.executor.submit(contextvars.copy_context().run, self._attempt, send, proxy)
+
+    def _attempt(self, send: Callable, proxy: Proxy):
+        started = time.monotonic()
+        try:
+            response = send(proxy)
+        except Exception:
+            self.record(proxy, time.monotonic() - started, False)
+            raise
+        finally:
+            with self.lock:
+                proxy.in_flight -= 1
+        self.record(proxy, time.monotonic() - started, response.status_code not in PROXY_FAILURE_STATUSES)
+        return response
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'proxies': [{
+                    'proxy': proxy.name,
+                    'state': proxy.state,
+                    'in_flight': proxy.in_flight,
+                    'error_rate': round(proxy.error_rate(), 3),
+                    'p50_latency': proxy.latency_percentile(0.5),
+                    'p90_latency': proxy.latency_percentile(0.9),
+                    'consecutive_failures': proxy.consecutive_failures,
+                } for proxy in self.proxies],
+            }
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _create_proxy_pool(config) -> ProxyPool:
+    return ProxyPool(config['PROXY_URLS'] or [DIRECT], failure_threshold=config['PROXY_FAILURE_THRESHOLD'],
+                     open_seconds=config['PROXY_OPEN_SECONDS'], hedge_percentile=config['PROXY_HEDGE_PERCENTILE'])
+
+
+_POOL = AppSingleton(_create_proxy_pool)
+
+
+def init_proxy_pool(app) -> ProxyPool:
+    return _POOL.init(app)
+
+
+def get_proxy_pool() -> ProxyPool:
+    return _POOL.get()
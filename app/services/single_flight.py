@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from app.services.metrics import inc
+
+# fcntl só existe em sistemas POSIX; sem ele a coalescência fica restrita ao processo
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Quantidade de arquivos de lock: chaves diferentes podem cair no mesmo arquivo, o que só
+# serializa buscas de vídeos distintos entre workers, nunca mistura os resultados
+LOCK_STRIPES = 256
+# Espera máxima pelo lock de arquivo: um líder travado em outro worker (ou outra chave no mesmo
+# arquivo) não segura a requisição; passado o prazo a busca roda sem coalescência
+LOCK_TIMEOUT = 10
+# Intervalos entre as tentativas do lock: começa curto e dobra até o máximo
+_LOCK_RETRY_MIN = 0.005
+_LOCK_RETRY_MAX = 0.1
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error', 'tag')
+
+    def __init__(self, tag=None):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.tag = tag
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Threads that ask for a key while its call is
+    running wait for it and get the same result or exception. With a lock_dir, the leader
+    also holds a file lock for the key, so leaders in other worker processes run one after
+    another; fn should check the shared cache first to pick up the previous leader's result.
+    A leader that cannot get the file lock within lock_timeout seconds runs fn without it.
+    A thread that joins a running call gets on_join(tag) called with the leader's tag first.
+    """
+    def __init__(self, lock_dir: Optional[str] = None, lock_timeout: float = LOCK_TIMEOUT):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+        self.calls: Dict[str, _Call] = {}
+        self.lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable, tag=None, on_join: Optional[Callable] = None):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call(tag)
+
+        if not leader:
+            if on_join is not None:
+                on_join(call.tag)
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._file_lock(key):
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+
+    def in_flight(self) -> int:
+        with self.lock:
+            return len(self.calls)
+
+    @contextmanager
+    def _file_lock(self, key: str):
+        if not self.lock_dir:
+            yield
+            return
+        stripe = zlib.crc32(key.encode('utf-8')) % LOCK_STRIPES
+        with open(os.path.join(self.lock_dir, f"{stripe:03d}.lock"), 'a+') as lock_file:
+            if not self._acquire(lock_file.fileno()):
+                inc('single_flight_lock_timeouts_total')
+                yield
+                return
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _acquire(self, fd: int) -> bool:
+        # LOCK_NB em laço: um flock bloqueante não tem prazo
+        deadline = time.monotonic() + self.lock_timeout
+        delay = _LOCK_RETRY_MIN
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, _LOCK_RETRY_MAX)
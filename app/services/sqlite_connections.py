@@ -0,0 +1,24 @@
+import os
+import sqlite3
+import threading
+
+
+class ThreadConnections:
+    """
+    One SQLite connection per thread and per process (gunicorn workers are forked), in
+    autocommit mode with WAL journaling so readers never wait for a writer.
+    """
+    def __init__(self, path: str, timeout: float = 10):
+        self.path = path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self.local, 'conn', None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from typing import Dict, Optional, Tuple
+
+from flask import request
+
+# brotli é opcional: sem ele só há a variante gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Arquivos de static/ carregados uma vez na inicialização e servidos da memória, já comprimidos
+# (gzip e, se houver, brotli) conforme o Accept-Encoding. Cada arquivo também responde num nome
+# com o hash do conteúdo (css/styles.<hash>.css), que pode ficar em cache para sempre; a página
+# da SPA sai com as URLs trocadas por esses nomes e é revalidada pela ETag a cada acesso.
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Página da SPA e arquivos pedidos pelo nome sem hash: o navegador revalida com a ETag
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Em ordem de preferência
+ENCODINGS = ('br', 'gzip')
+_COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# Abaixo disso a compressão não compensa
+_MIN_COMPRESS_BYTES = 512
+_SHELL_ASSET_URL = re.compile(r'((?:src|href)=")([^"?#]+)(")')
+
+
+class Asset:
+    """
+    Contents of one file with its precompressed variants, keyed by content coding ('identity'
+    for the original). A variant is kept only if it is smaller than the original.
+    """
+    __slots__ = ('mimetype', 'digest', 'variants')
+
+    def __init__(self, data: bytes, mimetype: str):
+        self.mimetype = mimetype
+        self.digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+        self.variants = {'identity': data}
+        if mimetype.startswith(_COMPRESSIBLE) and len(data) >= _MIN_COMPRESS_BYTES:
+            compressed = {'gzip': gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                compressed['br'] = brotli.compress(data, quality=11)
+            for encoding, body in compressed.items():
+                if len(body) < len(data):
+                    self.variants[encoding] = body
+
+    def negotiate(self) -> Tuple[str, bytes]:
+        for encoding in ENCODINGS:
+            if encoding in self.variants and request.accept_encodings[encoding] > 0:
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+    def response(self, response_class, cache_control: str):
+        encoding, body = self.negotiate()
+        # Uma ETag por codificação: os corpos são diferentes
+        etag = f"{self.digest}-{encoding}"
+        if request.if_none_match.contains_weak(etag):
+            response = response_class(status=304)
+        else:
+            response = response_class(body, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        if len(self.variants) > 1:
+            response.vary.add('Accept-Encoding')
+        return response
+
+
+def fingerprint(filename: str, digest: str) -> str:
+    base, extension = posixpath.splitext(filename)
+    return f"{base}.{digest}{extension}"
+
+
+class StaticAssets:
+    """
+    Files of a static folder served from memory. Every file except the HTML pages answers both
+    at its name and at its fingerprinted name; the shells are HTML pages whose asset URLs are
+    rewritten to the fingerprinted ones.
+    """
+    def __init__(self, folder: str, url_path: str, shells=('index.html',)):
+        self.url_path = url_path.rstrip('/')
+        self.assets: Dict[str, Asset] = {}
+        # nome com hash -> nome
+        self.fingerprinted: Dict[str, str] = {}
+        for root, _, files in os.walk(folder):
+            for name in files:
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, folder).replace(os.sep, '/')
+                mimetype = mimetypes.guess_type(name)[0]
+                if mimetype is None or mimetype == 'text/html':
+                    continue
+                with open(path, 'rb') as f:
+                    asset = Asset(f.read(), mimetype)
+                self.assets[filename] = asset
+                self.fingerprinted[fingerprint(filename, asset.digest)] = filename
+        self.shells: Dict[str, Asset] = {}
+        for shell in shells:
+            with open(os.path.join(folder, shell), 'r', encoding='utf-8') as f:
+                html = _SHELL_ASSET_URL.sub(self._rewrite_url, f.read())
+            self.shells[shell] = Asset(html.encode('utf-8'), 'text/html')
+
+    def url(self, filename: str) -> str:
+        """
+        Fingerprinted URL of a file of the folder (its plain URL if it is not served from memory).
+        """
+        asset = self.assets.get(filename)
+        return f"{self.url_path}/{fingerprint(filename, asset.digest) if asset else filename}"
+
+    def _rewrite_url(self, match) -> str:
+        url = match.group(2)
+        prefix = self.url_path + '/'
+        if not url.startswith(prefix):
+            return match.group(0)
+        return match.group(1) + self.url(url[len(prefix):]) + match.group(3)
+
+    def serve(self, filename: str, response_class):
+        """
+        Response for a file of the folder, or None if it is not served from memory.
+        """
+        if filename in self.fingerprinted:
+            return self.assets[self.fingerprinted[filename]].response(response_class, IMMUTABLE_CACHE_CONTROL)
+        asset = self.assets.get(filename)
+        if asset is None:
+            return None
+        return asset.response(response_class, REVALIDATE_CACHE_CONTROL)
+
+    def serve_shell(self, name: str, response_class):
+        return self.shells[name].response(response_class, REVALIDATE_CACHE_CONTROL)
+
+    def stats(self) -> Dict:
+        return {name: {encoding: len(body) for encoding, body in asset.variants.items()}
+                for name, asset in list(self.assets.items()) + list(self.shells.items())}
+
+
+def init_static_assets(app) -> Optional[StaticAssets]:
+    """
+    Load the static folder once and serve it from memory through the 'static' endpoint. With
+    STATIC_ASSETS_IN_MEMORY off (development), files are read from disk on every request as before.
+    """
+    if not app.config['STATIC_ASSETS_IN_MEMORY']:
+        return None
+    assets = StaticAssets(app.static_folder, app.static_url_path)
+    send_from_disk = app.view_functions['static']
+
+    def static(filename):
+        response = assets.serve(filename, app.response_class)
+        return response if response is not None else send_from_disk(filename=filename)
+
+    app.view_functions['static'] = static
+    app.extensions['static_assets'] = assets
+    return assets
+
+
+def send_shell(app, name: str = 'index.html'):
+    assets = app.extensions.get('static_assets')
+    if assets is None:
+        return app.send_static_file(name)
+    return assets.serve_shell(name, app.response_class)
@@ -0,0 +1,74 @@
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.services.transcript_codec import EncodedTranscript
+from app.services.transcription_correction import TokenSequence
+from app.services.transcription_service import normalize_tokens
+
+# Transcrição já tokenizada, montada uma vez quando a transcrição entra no cache.
+# Os IDs de classe de equivalência são internados por processo, então no cache em disco só
+# vão os tokens normalizados; os IDs são refeitos (uma consulta em dict por token) ao carregar.
+
+
+class TranscriptArtifact(TokenSequence):
+    """
+    Token texts, normalized forms, equivalence-class IDs and timestamps of an actual transcript.
+    """
+    __slots__ = ()
+
+    def to_cache_data(self) -> Dict:
+        return {'normalized': self.normalized}
+
+    def segments(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[float, int, int]]:
+        """
+        Runs of tokens start to end that share a timestamp (one caption line each), as
+        (timestamp, first token, end token).
+        """
+        timestamps = self.timestamps
+        end = len(timestamps) if end is None else min(end, len(timestamps))
+        first = start
+        for index in range(start + 1, end):
+            if timestamps[index] != timestamps[first]:
+                yield timestamps[first], first, index
+                first = index
+        if first < end:
+            yield timestamps[first], first, end
+
+
+def build_transcript_artifact(transcript: str, timestamps: List[float]) -> Optional[TranscriptArtifact]:
+    if not timestamps:
+        return None
+    tokens = transcript.split()[:len(timestamps)]
+    return TranscriptArtifact(tokens, normalize_tokens(tokens, 'artifact'), timestamps[:len(tokens)])
+
+
+def artifact_from_encoded(encoded: EncodedTranscript,
+                          timestamps: Optional[List[float]] = None) -> Optional[TranscriptArtifact]:
+    """
+    Artifact of a binary cache entry, read from the codec's views: tokens from the text blob,
+    timestamps from the runs and normalized forms from their blob, with no JSON-shaped dict.
+    timestamps is encoded.timestamps() when the caller already expanded them.
+    """
+    if not len(encoded):
+        return None
+    tokens = encoded.tokens()
+    normalized = encoded.normalized()
+    if normalized is None:
+        normalized = normalize_tokens(tokens, 'artifact')
+    if timestamps is None:
+        timestamps = encoded.timestamps()
+    return TranscriptArtifact(tokens, normalized, timestamps[:len(tokens)])
+
+
+def artifact_from_cache_data(cache_data: Dict) -> Optional[TranscriptArtifact]:
+    if cache_data.get('encoded') is not None:
+        return artifact_from_encoded(cache_data['encoded'], cache_data.get('timestamps'))
+    transcript = cache_data.get('transcript', '')
+    timestamps = cache_data.get('timestamps') or []
+    normalized = cache_data.get('normalized')
+    if not timestamps:
+        return None
+    tokens = transcript.split()[:len(timestamps)]
+    if normalized is None or len(normalized) != len(tokens):
+        # Cache gravado antes dos artefatos: tokeniza agora
+        return build_transcript_artifact(transcript, timestamps)
+    return TranscriptArtifact(tokens, normalized, timestamps[:len(tokens)])
@@ -0,0 +1,311 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.metrics import inc, timed
+from app.services.single_flight import SingleFlight
+from app.services.sqlite_connections import ThreadConnections
+from app.services.transcript_artifacts import (TranscriptArtifact, build_transcript_artifact, artifact_from_cache_data,
+                                               artifact_from_encoded)
+from app.services.transcript_codec import EncodedTranscript, encode_transcript, is_encoded
+from app.services.upstream_scheduler import INTERACTIVE, current_priority, get_scheduler, priority_handle
+
+# Cache de transcrições em dois níveis, na frente do cache em disco de get_video_transcript:
+#   1. memória do worker: artefatos prontos (os IDs de classe só valem dentro do processo)
+#   2. SQLite no diretório compartilhado: visto por todos os workers do gunicorn no mesmo nó
+# Os dois níveis descartam a entrada usada há mais tempo quando passam do orçamento de bytes.
+# Falhas também são guardadas (mensagem com timestamps vazios), com um TTL para cada tipo de falha.
+
+# Estimativa de memória por token de um artefato: texto e forma normalizada (objetos str e
+# ponteiros nas listas), ID de classe, timestamp em array e o float na lista de timestamps
+_BYTES_PER_TOKEN = 200
+# Leituras do nível compartilhado só gravam last_access se o valor gravado tiver mais que isso:
+# a ordem do LRU fica aproximada, mas um acerto não disputa o lock de escrita do SQLite
+ACCESS_UPDATE_INTERVAL = 60
+
+CachedTranscript = Tuple[str, List[float], Optional[TranscriptArtifact]]
+# Resultado de uma busca: o tipo da falha (None em caso de sucesso) e, para uma falha que já
+# estava gravada, quantos segundos ela ainda vale (None = o TTL inteiro do tipo)
+FetchedTranscript = Tuple[str, List[float], Optional[TranscriptArtifact], Optional[str], Optional[float]]
+
+
+def cache_key(video_id: str, language: str) -> str:
+    return f"{video_id}:{language}"
+
+
+def _promote_flight(leader_priority):
+    # Uma chamada interativa que entra numa busca do pré-carregamento não fica atrás das regras
+    # de segundo plano: a busca inteira passa a ser interativa
+    if leader_priority is not None and current_priority() == INTERACTIVE:
+        get_scheduler().promote(leader_priority)
+
+
+class MemoryTier:
+    """
+    Per-process LRU of transcripts bounded by an estimated byte budget.
+    """
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedTranscript]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: str, value: CachedTranscript, ttl: Optional[float] = None):
+        transcript, timestamps, _ = value
+        size = len(transcript) + len(timestamps) * _BYTES_PER_TOKEN
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.time() + (self.ttl if ttl is None else ttl), size, value)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key: str):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        _, size, _ = self.entries.pop(key)
+        self.bytes -= size
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class SharedTier:
+    """
+    SQLite-backed LRU shared by every worker on the node.
+    Values are in the binary format of transcript_codec (older entries may still be zlib-compressed
+    JSON) and the byte budget is charged on the stored size.
+    Reads take no write lock: last_access is refreshed at most every ACCESS_UPDATE_INTERVAL
+    seconds and the hit and miss counters are per worker.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int, ttl: float):
+        self.path = os.path.join(cache_dir, 'transcripts.sqlite3')
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        os.makedirs(cache_dir, exist_ok=True)
+        self.connections = ThreadConnections(self.path)
+        self.hits = 0
+        self.misses = 0
+        self.counter_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'size INTEGER NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)')
+            conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO counters (name, value) VALUES ('bytes', 0)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return self.connections.get()
+
+    def get(self, key: str, count: bool = True) -> Optional[Tuple[CachedTranscript, float]]:
+        """
+        Cached transcript and the time it expires at, or None.
+        """
+        conn = self._connect()
+        now = time.time()
+        # Autocommit com WAL: o SELECT sozinho não espera nenhum escritor. Entradas expiradas são
+        # removidas pela próxima gravação que passar do orçamento (_evict) ou substituídas por put
+        row = conn.execute('SELECT value, expires_at, last_access FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is not None and row[1] < now:
+            row = None
+        if count:
+            with self.counter_lock:
+                if row is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        if row is None:
+            return None
+        if now - row[2] > ACCESS_UPDATE_INTERVAL:
+            try:
+                conn.execute('UPDATE entries SET last_access = ? WHERE key = ? AND last_access < ?',
+                             (now, key, now - ACCESS_UPDATE_INTERVAL))
+            except sqlite3.OperationalError:
+                # Banco ocupado: o LRU pode esperar a próxima leitura
+                pass
+        if is_encoded(row[0]):
+            encoded = EncodedTranscript(row[0])
+            timestamps = encoded.timestamps()
+            return (encoded.transcript, timestamps, artifact_from_encoded(encoded, timestamps)), row[1]
+        data = json.loads(zlib.decompress(row[0]))
+        return (data['transcript'], data['timestamps'], artifact_from_cache_data(data)), row[1]
+
+    def put(self, key: str, value: CachedTranscript, ttl: Optional[float] = None):
+        transcript, timestamps, artifact = value
+        blob = encode_transcript(transcript, timestamps, artifact.normalized if artifact is not None else None)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            old = conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, size, expires_at, last_access) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         (key, blob, len(blob), now + (self.ttl if ttl is None else ttl), now))
+            total = self._add_bytes(conn, len(blob) - (old[0] if old else 0))
+            if total > self.max_bytes:
+                self._evict(conn, total)
+
+    def _add_bytes(self, conn: sqlite3.Connection, delta: int) -> int:
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = 'bytes'", (delta,))
+        return conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, total: int):
+        # Expiradas primeiro, depois as menos usadas até caber no orçamento
+        now = time.time()
+        freed = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries WHERE expires_at < ?', (now,)).fetchone()[0]
+        conn.execute('DELETE FROM entries WHERE expires_at < ?', (now,))
+        total -= freed
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+            total -= size
+        conn.execute("UPDATE counters SET value = ? WHERE name = 'bytes'", (total,))
+
+    def delete(self, key: str):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                conn.execute("UPDATE counters SET value = value - ? WHERE name = 'bytes'", (row[0],))
+
+    def stats(self) -> Dict:
+        conn = self._connect()
+        total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+        entries = conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        with self.counter_lock:
+            return {'entries': entries, 'bytes': total, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+class TranscriptCache:
+    def __init__(self, cache_dir: str, shared_max_bytes: int, memory_max_bytes: int, ttl: float,
+                 negative_ttls: Optional[Dict[str, float]] = None, memory_negative_ttl: float = 60,
+                 memory_ttl: float = 300):
+        # Na memória de cada worker as entradas vivem pouco, para que uma invalidação feita em
+        # outro worker seja vista em no máximo memory_ttl segundos (memory_negative_ttl para falhas)
+        self.memory_ttl = min(ttl, memory_ttl)
+        self.memory_negative_ttl = memory_negative_ttl
+        self.memory = MemoryTier(memory_max_bytes, self.memory_ttl)
+        self.shared = SharedTier(cache_dir, shared_max_bytes, ttl)
+        self.negative_ttls = negative_ttls or {}
+        # Buscas concorrentes da mesma transcrição viram uma só, entre threads e entre workers
+        self.fetches = SingleFlight(os.path.join(cache_dir, 'locks'))
+
+    def get(self, video_id: str, language: str) -> Optional[CachedTranscript]:
+        key = cache_key(video_id, language)
+        with timed('transcript_cache_lookup_seconds', tier='memory'):
+            cached = self.memory.get(key)
+        inc('transcript_cache_lookups_total', tier='memory', result='miss' if cached is None else 'hit')
+        if cached is not None:
+            return cached
+        with timed('transcript_cache_lookup_seconds', tier='shared'):
+            found = self.shared.get(key)
+        inc('transcript_cache_lookups_total', tier='shared', result='miss' if found is None else 'hit')
+        if found is None:
+            return None
+        return self._promote(key, *found)
+
+    def _promote(self, key: str, cached: CachedTranscript, expires_at: float) -> CachedTranscript:
+        # Copia do nível compartilhado para a memória sem passar da validade de lá nem de
+        # memory_ttl (memory_negative_ttl para uma falha), como as gravadas por este worker
+        ttl = min(expires_at - time.time(), self.memory_ttl if cached[1] else self.memory_negative_ttl)
+        self.memory.put(key, cached, ttl=ttl)
+        return cached
+
+    def get_or_fetch(self, video_id: str, language: str, fetch: Callable[[], FetchedTranscript]) -> CachedTranscript:
+        """
+        Cached transcript, or the result of fetch() run once for all concurrent callers.
+        Failures (a message with empty timestamps) are cached for the TTL of their kind;
+        kinds without a TTL are not cached.
+        """
+        cached = self.get(video_id, language)
+        if cached is not None:
+            return cached
+        key = cache_key(video_id, language)
+
+        def load():
+            # O líder anterior (talvez em outro worker) pode ter acabado de gravar
+            found = self.shared.get(key, count=False)
+            if found is not None:
+                return self._promote(key, *found)
+            transcript, timestamps, artifact, failure, failure_ttl = fetch()
+            if failure:
+                self.put_failure(video_id, language, transcript, failure, failure_ttl)
+            elif timestamps:
+                self.put(video_id, language, transcript, timestamps, artifact)
+            return transcript, timestamps, artifact
+        return self.fetches.do(key, load, tag=priority_handle(), on_join=_promote_flight)
+
+    def put(self, video_id: str, language: str, transcript: str, timestamps: List[float],
+            artifact: Optional[TranscriptArtifact] = None):
+        if artifact is None:
+            artifact = build_transcript_artifact(transcript, timestamps)
+        key = cache_key(video_id, language)
+        self.memory.put(key, (transcript, timestamps, artifact))
+        self.shared.put(key, (transcript, timestamps, artifact))
+
+    def put_failure(self, video_id: str, language: str, message: str, failure: str, ttl: Optional[float] = None):
+        """
+        Cache a failure for the TTL of its kind, or for ttl seconds if that is shorter (a failure
+        read back from the store keeps only what is left of it).
+        """
+        kind_ttl = self.negative_ttls.get(failure)
+        if not kind_ttl:
+            return
+        ttl = kind_ttl if ttl is None else min(ttl, kind_ttl)
+        if ttl <= 0:
+            return
+        key = cache_key(video_id, language)
+        self.memory.put(key, (message, [], None), ttl=min(ttl, self.memory_negative_ttl))
+        self.shared.put(key, (message, [], None), ttl=ttl)
+
+    def delete(self, video_id: str, language: str):
+        key = cache_key(video_id, language)
+        self.memory.delete(key)
+        self.shared.delete(key)
+
+    def stats(self) -> Dict:
+        return {'memory': self.memory.stats(), 'shared': self.shared.stats(), 'fetches_in_flight': self.fetches.in_flight()}
+
+
+def init_transcript_cache(app) -> TranscriptCache:
+    cache = TranscriptCache(app.config['SHARED_CACHE_DIR'], app.config['SHARED_CACHE_MAX_BYTES'],
+                            app.config['MEMORY_CACHE_MAX_BYTES'], app.config['TRANSCRIPT_CACHE_TTL'],
+                            app.config['NEGATIVE_CACHE_TTLS'], app.config['MEMORY_NEGATIVE_CACHE_TTL'],
+                            app.config['MEMORY_CACHE_TTL'])
+    app.extensions['transcript_cache'] = cache
+    return cache
@@ -0,0 +1,183 @@
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+# Formato binário das transcrições em cache. Todas as palavras de uma linha de legenda têm o
+# mesmo timestamp (o início da linha), então os timestamps viram sequências de (valor, repetições).
+# Texto e formas normalizadas ficam em blocos UTF-8 únicos, e o todo é comprimido com zlib.
+#
+#   MAGIC (4) | zlib(
+#       cabeçalho '<IIIIII': tokens, sequências, bytes do texto, bytes das normalizadas, flags,
+#                            início da primeira palavra
+#       valores das sequências   float64 x sequências
+#       repetições               uint32  x sequências
+#       distâncias               uint8 (uint32 com _WIDE_GAPS) x tokens: bytes do início de cada
+#                                palavra até o início da seguinte (na última, até o fim dela)
+#       texto                    UTF-8 da transcrição como está (com as quebras de linha)
+#       normalizadas             UTF-8, separadas por NUL (algumas formas são vazias)
+#   )
+# Os arrays são lidos direto do buffer descomprimido com memoryview.cast, sem cópia. Offsets
+# absolutos quase não comprimem; as distâncias cabem em um byte e comprimem bem, e o array de
+# offsets só é montado quando alguém pede palavras avulsas. O nível de compressão não muda a
+# velocidade de descompressão do zlib, e gravações são raras: o padrão é 6.
+
+MAGIC = b'TRB1'
+_HEADER = struct.Struct('<IIIIII')
+_HAS_NORMALIZED = 1
+_WIDE_GAPS = 2
+_NORMALIZED_SEPARATOR = '\x00'
+# O formato é little-endian; em máquinas big-endian os arrays são copiados e invertidos
+_NATIVE = sys.byteorder == 'little'
+
+
+def is_encoded(blob: bytes) -> bool:
+    return blob[:len(MAGIC)] == MAGIC
+
+
+def encode_transcript(transcript: str, timestamps: List[float], normalized: Optional[List[str]] = None,
+                      level: int = 6) -> bytes:
+    text = transcript.encode('utf-8')
+    tokens = transcript.split()[:len(timestamps)]
+
+    offsets = []
+    ascii_only = text.isascii()
+    position = byte_position = 0
+    for token in tokens:
+        start = transcript.index(token, position)
+        if ascii_only:
+            offsets.append(start)
+        else:
+            # Posição em caracteres -> bytes: só o trecho desde a palavra anterior é recodificado
+            byte_position += len(transcript[position:start + len(token)].encode('utf-8'))
+            offsets.append(byte_position - len(token.encode('utf-8')))
+        position = start + len(token)
+    end = position if ascii_only else byte_position
+    gaps = [following - current for current, following in zip(offsets, offsets[1:] + [end])]
+
+    flags = 0
+    if gaps and max(gaps) > 0xFF:
+        flags |= _WIDE_GAPS
+    gaps = array('I' if flags & _WIDE_GAPS else 'B', gaps)
+
+    values = array('d')
+    counts = array('I')
+    for value in timestamps:
+        if counts and values[-1] == value:
+            counts[-1] += 1
+        else:
+            values.append(value)
+            counts.append(1)
+
+    normalized_bytes = b''
+    if normalized is not None and len(normalized) == len(tokens):
+        flags |= _HAS_NORMALIZED
+        normalized_bytes = _NORMALIZED_SEPARATOR.join(normalized).encode('utf-8')
+
+    arrays = [values, counts, gaps]
+    if not _NATIVE:
+        arrays = [array(a.typecode, a) for a in arrays]
+        for a in arrays:
+            a.byteswap()
+    header = _HEADER.pack(len(tokens), len(values), len(text), len(normalized_bytes), flags,
+                          offsets[0] if offsets else 0)
+    payload = b''.join([header] + [a.tobytes() for a in arrays] + [text, normalized_bytes])
+    return MAGIC + zlib.compress(payload, level)
+
+
+class EncodedTranscript:
+    """
+    Read-only view of a binary transcript. The run and gap arrays are memoryviews over the
+    decompressed buffer; texts, timestamps and token offsets are materialized only when asked for.
+    """
+    __slots__ = ('buffer', 'token_count', 'first_offset', 'run_values', 'run_counts', 'gaps',
+                 '_offsets', '_text', '_normalized', '_transcript')
+
+    def __init__(self, blob: bytes):
+        if not is_encoded(blob):
+            raise ValueError('Not a binary transcript')
+        self.buffer = memoryview(zlib.decompress(memoryview(blob)[len(MAGIC):]))
+        tokens, runs, text_bytes, normalized_bytes, flags, first_offset = _HEADER.unpack_from(self.buffer)
+        self.token_count = tokens
+        self.first_offset = first_offset
+        position = _HEADER.size
+        self.run_values, position = _array_view(self.buffer, position, 'd', runs)
+        self.run_counts, position = _array_view(self.buffer, position, 'I', runs)
+        self.gaps, position = _array_view(self.buffer, position, 'I' if flags & _WIDE_GAPS else 'B', tokens)
+        self._offsets = None
+        self._transcript = None
+        self._text = self.buffer[position:position + text_bytes]
+        position += text_bytes
+        self._normalized = self.buffer[position:position + normalized_bytes] if flags & _HAS_NORMALIZED else None
+
+    def __len__(self):
+        return self.token_count
+
+    @property
+    def offsets(self) -> array:
+        """
+        Byte offset of every token in the text, plus the end of the last one.
+        """
+        if self._offsets is None:
+            self._offsets = array('I', accumulate(self.gaps, initial=self.first_offset))
+        return self._offsets
+
+    @property
+    def transcript(self) -> str:
+        if self._transcript is None:
+            self._transcript = str(self._text, 'utf-8')
+        return self._transcript
+
+    def token(self, index: int) -> str:
+        if not 0 <= index < self.token_count:
+            raise IndexError('token index out of range')
+        # Até o início da próxima palavra, sem o espaço entre as duas
+        return str(self._text[self.offsets[index]:self.offsets[index + 1]], 'utf-8').rstrip()
+
+    def tokens(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """
+        Token texts start to end, decoding only that stretch of the text blob.
+        """
+        end = self.token_count if end is None else min(end, self.token_count)
+        if start >= end:
+            return []
+        if start == 0 and end == self.token_count and self._offsets is None:
+            # Todas as palavras: não vale montar os offsets, o texto inteiro já sai decodificado
+            return self.transcript.split()[:end]
+        offsets = self.offsets
+        return str(self._text[offsets[start]:offsets[end]], 'utf-8').split()
+
+    def timestamps(self) -> List[float]:
+        expanded = []
+        for value, count in zip(self.run_values, self.run_counts):
+            expanded.extend([value] * count)
+        return expanded
+
+    def normalized(self) -> Optional[List[str]]:
+        if self._normalized is None:
+            return None
+        if not self.token_count:
+            return []
+        return str(self._normalized, 'utf-8').split(_NORMALIZED_SEPARATOR)
+
+    def to_cache_data(self) -> Dict:
+        """
+        Same dict as the JSON cache entries: transcript, timestamps and normalized (None if missing).
+        """
+        return {'transcript': self.transcript, 'timestamps': self.timestamps(), 'normalized': self.normalized()}
+
+
+def decode_transcript(blob: bytes) -> Dict:
+    return EncodedTranscript(blob).to_cache_data()
+
+
+def _array_view(buffer: memoryview, position: int, typecode: str, count: int):
+    end = position + count * array(typecode).itemsize
+    view = buffer[position:end]
+    if _NATIVE:
+        return view.cast(typecode), end
+    swapped = array(typecode, view.tobytes())
+    swapped.byteswap()
+    return swapped, end
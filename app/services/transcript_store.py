@@ -0,0 +1,251 @@
+import argparse
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from app.services.app_singleton import AppSingleton
+from app.services.sqlite_connections import ThreadConnections
+from app.services.transcript_codec import EncodedTranscript, encode_transcript
+
+# Armazenamento persistente de transcrições, detalhes de vídeo e resultados de busca em um único
+# arquivo SQLite (WAL).
+# Substitui os arquivos transcript_cache/<id>_<idioma>.json e video_details_cache/<id>.json:
+# cada consulta é uma busca pela chave primária numa conexão já aberta, e cada gravação é uma
+# transação, então uma queda no meio nunca deixa um registro pela metade.
+
+# Transcrições novas ficam só na coluna encoded, no formato binário de transcript_codec, com as
+# colunas transcript e timestamps vazias; as gravadas antes dela continuam lidas do JSON.
+
+# Idioma das transcrições genéricas (antigo transcript_cache/<id>.json), usadas quando não há
+# uma gravada para o idioma pedido
+GENERIC_LANGUAGE = ''
+
+# Comprimento dos IDs de vídeo do YouTube, usado para separar o idioma no nome dos arquivos antigos
+_VIDEO_ID_LENGTH = 11
+
+
+class TranscriptStore:
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connections = ThreadConnections(path)
+        conn = self.connections.get()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self.created = conn.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'transcripts'").fetchone()[0] == 0
+            conn.execute('CREATE TABLE IF NOT EXISTS transcripts (video_id TEXT NOT NULL, language TEXT NOT NULL, '
+                         'transcript TEXT NOT NULL, timestamps TEXT NOT NULL, normalized TEXT, '
+                         'track_language TEXT, fetched_at REAL NOT NULL, encoded BLOB, '
+                         'PRIMARY KEY (video_id, language))')
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(transcripts)')]
+            if 'encoded' not in columns:
+                conn.execute('ALTER TABLE transcripts ADD COLUMN encoded BLOB')
+            conn.execute('CREATE TABLE IF NOT EXISTS transcript_failures (video_id TEXT NOT NULL, '
+                         'language TEXT NOT NULL, kind TEXT NOT NULL, message TEXT NOT NULL, '
+                         'fetched_at REAL NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (video_id, language))')
+            conn.execute('CREATE TABLE IF NOT EXISTS video_details (video_id TEXT PRIMARY KEY, '
+                         'data TEXT NOT NULL, fetched_at REAL NOT NULL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS search_results (query TEXT NOT NULL, max_results INTEGER NOT NULL, '
+                         'results TEXT NOT NULL, fetched_at REAL NOT NULL, PRIMARY KEY (query, max_results))')
+            conn.execute('CREATE INDEX IF NOT EXISTS search_results_fetched_at ON search_results (fetched_at)')
+
+    def get_transcript(self, video_id: str, language: str) -> Optional[Dict]:
+        """
+        Stored transcript for the language, or the generic one, as a dict with transcript,
+        timestamps, normalized (older rows; None if missing), encoded (the EncodedTranscript
+        view of a binary row, for artifact_from_cache_data), language (the track's), and fetched_at.
+        """
+        row = self.connections.get().execute(
+            'SELECT transcript, timestamps, normalized, track_language, fetched_at, encoded FROM transcripts '
+            'WHERE video_id = ? AND language IN (?, ?) ORDER BY language = ? LIMIT 1',
+            (video_id, language, GENERIC_LANGUAGE, GENERIC_LANGUAGE)).fetchone()
+        if row is None:
+            return None
+        if row[5] is not None:
+            encoded = EncodedTranscript(row[5])
+            data = {'transcript': encoded.transcript, 'timestamps': encoded.timestamps(), 'normalized': None,
+                    'encoded': encoded}
+        else:
+            data = {
+                'transcript': row[0],
+                'timestamps': json.loads(row[1]),
+                'normalized': json.loads(row[2]) if row[2] is not None else None,
+                'encoded': None,
+            }
+        data['language'] = row[3]
+        data['fetched_at'] = row[4]
+        return data
+
+    def put_transcript(self, video_id: str, language: str, transcript: str, timestamps: List[float],
+                       normalized: Optional[List[str]] = None, track_language: Optional[str] = None,
+                       fetched_at: Optional[float] = None):
+        conn = self.connections.get()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, language, transcript, timestamps, normalized, "
+                "track_language, fetched_at, encoded) VALUES (?, ?, '', '', NULL, ?, ?, ?)",
+                (video_id, language, track_language, time.time() if fetched_at is None else fetched_at,
+                 encode_transcript(transcript, timestamps, normalized)))
+            conn.execute('DELETE FROM transcript_failures WHERE video_id = ? AND language = ?', (video_id, language))
+
+    def get_failure(self, video_id: str, language: str) -> Optional[Dict]:
+        """
+        Unexpired failure recorded for the video and language, as a dict with kind, message,
+        fetched_at and expires_at.
+        """
+        row = self.connections.get().execute(
+            'SELECT kind, message, fetched_at, expires_at FROM transcript_failures '
+            'WHERE video_id = ? AND language = ? AND expires_at > ?', (video_id, language, time.time())).fetchone()
+        if row is None:
+            return None
+        return {'kind': row[0], 'message': row[1], 'fetched_at': row[2], 'expires_at': row[3]}
+
+    def put_failure(self, video_id: str, language: str, kind: str, message: str, ttl: float):
+        now = time.time()
+        self.connections.get().execute(
+            'INSERT OR REPLACE INTO transcript_failures (video_id, language, kind, message, fetched_at, expires_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)', (video_id, language, kind, message, now, now + ttl))
+
+    def delete_transcript(self, video_id: str, language: str) -> bool:
+        """
+        Drop the stored transcript for the language and the generic one that get_transcript would
+        fall back to. Returns whether anything was deleted.
+        """
+        conn = self.connections.get()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            cursor = conn.execute('DELETE FROM transcripts WHERE video_id = ? AND language IN (?, ?)',
+                                  (video_id, language, GENERIC_LANGUAGE))
+        return cursor.rowcount > 0
+
+    def delete_failure(self, video_id: str, language: str) -> bool:
+        cursor = self.connections.get().execute(
+            'DELETE FROM transcript_failures WHERE video_id = ? AND language = ?', (video_id, language))
+        return cursor.rowcount > 0
+
+    def get_video_details(self, video_id: str) -> Optional[Dict]:
+        row = self.connections.get().execute(
+            'SELECT data FROM video_details WHERE video_id = ?', (video_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put_video_details(self, video_id: str, data: Dict, fetched_at: Optional[float] = None):
+        self.connections.get().execute(
+            'INSERT OR REPLACE INTO video_details (video_id, data, fetched_at) VALUES (?, ?, ?)',
+            (video_id, json.dumps(data), time.time() if fetched_at is None else fetched_at))
+
+    def get_video_details_many(self, video_ids: List[str]) -> Dict[str, Dict]:
+        found = {}
+        conn = self.connections.get()
+        # Limite de parâmetros por consulta do SQLite antigo é 999
+        for start in range(0, len(video_ids), 500):
+            chunk = video_ids[start:start + 500]
+            rows = conn.execute(f"SELECT video_id, data FROM video_details WHERE video_id IN ({','.join('?' * len(chunk))})",
+                                chunk).fetchall()
+            for video_id, data in rows:
+                found[video_id] = json.loads(data)
+        return found
+
+    def put_video_details_many(self, details: Dict[str, Dict], fetched_at: Optional[float] = None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        conn = self.connections.get()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT OR REPLACE INTO video_details (video_id, data, fetched_at) VALUES (?, ?, ?)',
+                             [(video_id, json.dumps(data), fetched_at) for video_id, data in details.items()])
+
+    def get_search(self, query: str, max_results: int) -> Optional[Dict]:
+        """
+        Stored results for a normalized query, as a dict with results and fetched_at.
+        """
+        row = self.connections.get().execute(
+            'SELECT results, fetched_at FROM search_results WHERE query = ? AND max_results = ?',
+            (query, max_results)).fetchone()
+        if row is None:
+            return None
+        return {'results': json.loads(row[0]), 'fetched_at': row[1]}
+
+    def put_search(self, query: str, max_results: int, results: List[Dict], max_age: Optional[float] = None):
+        """
+        Store the results of a normalized query; with max_age, also drop searches older than it.
+        """
+        now = time.time()
+        conn = self.connections.get()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR REPLACE INTO search_results (query, max_results, results, fetched_at) '
+                         'VALUES (?, ?, ?, ?)', (query, max_results, json.dumps(results), now))
+            if max_age is not None:
+                conn.execute('DELETE FROM search_results WHERE fetched_at < ?', (now - max_age,))
+
+    def import_json_cache(self, transcript_dir: str = 'transcript_cache',
+                          details_dir: str = 'video_details_cache') -> Tuple[int, int]:
+        """
+        Import the legacy one-file-per-video JSON caches. Entries already in the store are kept.
+        Returns the number of transcripts and video details imported.
+        """
+        transcripts = details = 0
+        conn = self.connections.get()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for path in sorted(glob.glob(os.path.join(transcript_dir, '*.json'))):
+                stem = os.path.splitext(os.path.basename(path))[0]
+                if len(stem) > _VIDEO_ID_LENGTH and stem[_VIDEO_ID_LENGTH] == '_':
+                    video_id, language = stem[:_VIDEO_ID_LENGTH], stem[_VIDEO_ID_LENGTH + 1:]
+                else:
+                    video_id, language = stem, GENERIC_LANGUAGE
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO transcripts (video_id, language, transcript, timestamps, normalized, "
+                    "track_language, fetched_at, encoded) VALUES (?, ?, '', '', NULL, ?, ?, ?)",
+                    (video_id, language, data.get('language'), os.path.getmtime(path),
+                     encode_transcript(data['transcript'], data['timestamps'], data.get('normalized'))))
+                transcripts += cursor.rowcount
+            for path in sorted(glob.glob(os.path.join(details_dir, '*.json'))):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO video_details (video_id, data, fetched_at) VALUES (?, ?, ?)',
+                    (os.path.splitext(os.path.basename(path))[0], json.dumps(data), os.path.getmtime(path)))
+                details += cursor.rowcount
+        return transcripts, details
+
+
+def _create_store(config) -> TranscriptStore:
+    store = TranscriptStore(config['TRANSCRIPT_STORE_PATH'])
+    # Banco novo: traz as transcrições em JSON que acompanham o repositório
+    if store.created:
+        store.import_json_cache()
+    return store
+
+
+_STORE = AppSingleton(_create_store)
+
+
+def init_store(app) -> TranscriptStore:
+    return _STORE.init(app)
+
+
+def get_store() -> TranscriptStore:
+    return _STORE.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import the legacy JSON transcript and video details caches.')
+    parser.add_argument('--store', default=Config.TRANSCRIPT_STORE_PATH)
+    parser.add_argument('--transcripts', default='transcript_cache')
+    parser.add_argument('--details', default='video_details_cache')
+    args = parser.parse_args()
+    transcripts, details = TranscriptStore(args.store).import_json_cache(args.transcripts, args.details)
+    print(f"Imported {transcripts} transcripts and {details} video details into {args.store}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Alinhamento global em memória linear sobre sequências de IDs de classe de equivalência.
+# As funções devolvem os pares (índice em a, índice em b) de uma subsequência comum.
+
+# Acima deste produto N·M a entrada é fatiada em âncoras únicas antes do Myers
+ANCHOR_MIN_CELLS = 250000
+
+
+def global_matches(a: Sequence[int], b: Sequence[int]) -> List[Tuple[int, int]]:
+    """
+    Matching of a against b for long inputs.
+    Tokens that occur exactly once on each side are used as anchors (patience diff), so the
+    Myers search between two anchors only pays for the local edit distance instead of every
+    untyped word of the transcript. Short inputs go straight to myers_matches.
+    """
+    if len(a) * len(b) <= ANCHOR_MIN_CELLS:
+        return myers_matches(a, b)
+
+    anchors = unique_anchors(a, b)
+    ranges = []
+    a_lo = b_lo = 0
+    for a_idx, b_idx in anchors:
+        ranges.append((a_lo, a_idx, b_lo, b_idx))
+        a_lo, b_lo = a_idx + 1, b_idx + 1
+    ranges.append((a_lo, len(a), b_lo, len(b)))
+
+    matches = list(anchors)
+    for a_lo, a_hi, b_lo, b_hi in ranges:
+        matches.extend(myers_matches(a, b, a_lo, a_hi, b_lo, b_hi))
+    matches.sort()
+    return matches
+
+
+def unique_anchors(a: Sequence[int], b: Sequence[int]) -> List[Tuple[int, int]]:
+    """
+    Longest increasing run of tokens that are unique in both a and b.
+    """
+    counts: Dict[int, int] = {}
+    for token in a:
+        counts[token] = counts.get(token, 0) + 1
+    a_pos = {token: idx for idx, token in enumerate(a) if counts[token] == 1}
+    b_counts: Dict[int, int] = {}
+    for token in b:
+        b_counts[token] = b_counts.get(token, 0) + 1
+    pairs = [(a_pos[token], idx) for idx, token in enumerate(b) if b_counts[token] == 1 and token in a_pos]
+
+    # Patience sorting: maior subsequência crescente pelos índices em a
+    tails: List[int] = []
+    tail_idx: List[int] = []
+    parents = [-1] * len(pairs)
+    for idx, (a_idx, _) in enumerate(pairs):
+        pos = bisect_left(tails, a_idx)
+        if pos == len(tails):
+            tails.append(a_idx)
+            tail_idx.append(idx)
+        else:
+            tails[pos] = a_idx
+            tail_idx[pos] = idx
+        parents[idx] = tail_idx[pos - 1] if pos else -1
+
+    anchors = []
+    idx = tail_idx[-1] if tail_idx else -1
+    while idx != -1:
+        anchors.append(pairs[idx])
+        idx = parents[idx]
+    anchors.reverse()
+    return anchors
+
+
+def myers_matches(a: Sequence[int], b: Sequence[int], a_lo: int = 0, a_hi: Optional[int] = None,
+                  b_lo: int = 0, b_hi: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Optimal (LCS) matching of a[a_lo:a_hi] against b[b_lo:b_hi] in linear memory.
+    Uses Myers' O((N+M)·D) middle-snake bisection; subproblems where one side is much
+    shorter than the other are handed to Hirschberg, whose O(N·M) is cheaper there.
+    """
+    matches = []
+    stack = [(a_lo, len(a) if a_hi is None else a_hi, b_lo, len(b) if b_hi is None else b_hi)]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+
+        # Prefixo e sufixo comuns não precisam de busca
+        while a_lo < a_hi and b_lo < b_hi and a[a_lo] == b[b_lo]:
+            matches.append((a_lo, b_lo))
+            a_lo += 1
+            b_lo += 1
+        while a_lo < a_hi and b_lo < b_hi and a[a_hi - 1] == b[b_hi - 1]:
+            a_hi -= 1
+            b_hi -= 1
+            matches.append((a_hi, b_hi))
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+
+        n, m = a_hi - a_lo, b_hi - b_lo
+        if min(n, m) == 1 or n * m <= (n + m) * abs(n - m):
+            matches.extend(_hirschberg(a, a_lo, a_hi, b, b_lo, b_hi))
+            continue
+
+        split = _middle_snake(a, a_lo, a_hi, b, b_lo, b_hi)
+        if split is None:
+            continue
+        x, y = split
+        stack.append((a_lo + x, a_hi, b_lo + y, b_hi))
+        stack.append((a_lo, a_lo + x, b_lo, b_lo + y))
+
+    matches.sort()
+    return matches
+
+
+def _middle_snake(a, a_lo, a_hi, b, b_lo, b_hi) -> Optional[Tuple[int, int]]:
+    # Busca simultânea para frente e para trás até os caminhos se cruzarem;
+    # retorna o ponto de divisão relativo a (a_lo, b_lo) ou None se não houver nada em comum.
+    len1 = a_hi - a_lo
+    len2 = b_hi - b_lo
+    max_d = (len1 + len2 + 1) // 2
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+    v1 = [-1] * v_length
+    v2 = [-1] * v_length
+    v1[v_offset + 1] = 0
+    v2[v_offset + 1] = 0
+    delta = len1 - len2
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+
+    for d in range(max_d):
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            k1_offset = v_offset + k1
+            if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                x1 = v1[k1_offset + 1]
+            else:
+                x1 = v1[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < len1 and y1 < len2 and a[a_lo + x1] == b[b_lo + y1]:
+                x1 += 1
+                y1 += 1
+            v1[k1_offset] = x1
+            if x1 > len1:
+                k1end += 2
+            elif y1 > len2:
+                k1start += 2
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                    if x1 >= len1 - v2[k2_offset]:
+                        return x1, y1
+
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            k2_offset = v_offset + k2
+            if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                x2 = v2[k2_offset + 1]
+            else:
+                x2 = v2[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < len1 and y2 < len2 and a[a_hi - x2 - 1] == b[b_hi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            v2[k2_offset] = x2
+            if x2 > len1:
+                k2end += 2
+            elif y2 > len2:
+                k2start += 2
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                    x1 = v1[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+                    if x1 >= len1 - x2:
+                        return x1, y1
+    return None
+
+
+def _hirschberg(a, a_lo, a_hi, b, b_lo, b_hi) -> List[Tuple[int, int]]:
+    # Divide sempre a sequência mais curta, então a memória fica O(max(N, M)) e o tempo O(N·M).
+    swapped = (a_hi - a_lo) > (b_hi - b_lo)
+    if swapped:
+        a, a_lo, a_hi, b, b_lo, b_hi = b, b_lo, b_hi, a, a_lo, a_hi
+
+    matches = []
+    stack = [(a_lo, a_hi, b_lo, b_hi)]
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+        if a_lo == a_hi or b_lo == b_hi:
+            continue
+        if a_hi - a_lo == 1:
+            target = a[a_lo]
+            for j in range(b_lo, b_hi):
+                if b[j] == target:
+                    matches.append((a_lo, j))
+                    break
+            continue
+
+        mid = (a_lo + a_hi) // 2
+        forward = _lcs_lengths(a, range(a_lo, mid), b, range(b_lo, b_hi))
+        backward = _lcs_lengths(a, range(a_hi - 1, mid - 1, -1), b, range(b_hi - 1, b_lo - 1, -1))
+        width = b_hi - b_lo
+        split = max(range(width + 1), key=lambda k: forward[k] + backward[width - k])
+        stack.append((mid, a_hi, b_lo + split, b_hi))
+        stack.append((a_lo, mid, b_lo, b_lo + split))
+
+    if swapped:
+        return [(j, i) for i, j in matches]
+    return matches
+
+
+def _lcs_lengths(a, a_range, b, b_range) -> List[int]:
+    # Última linha da tabela de LCS: lengths[k] = LCS(a_range, primeiros k itens de b_range)
+    b_items = [b[j] for j in b_range]
+    prev = [0] * (len(b_items) + 1)
+    for i in a_range:
+        item = a[i]
+        cur = [0]
+        for k, other in enumerate(b_items):
+            if item == other:
+                cur.append(prev[k] + 1)
+            else:
+                cur.append(prev[k + 1] if prev[k + 1] > cur[k] else cur[k])
+        prev = cur
+    return prev
@@ -1,7 +1,13 @@
-from typing import List, Dict
+import sys
+import threading
+import time
+from array import array
+from typing import List, Dict, NamedTuple, Optional, Sequence, Tuple
 from dataclasses import dataclass
-from difflib import SequenceMatcher
-from app.services.transcription_equivalents import are_equivalent
+from app.services.transcription_equivalents import equivalence_class, match_phrase, MAX_PHRASE_TOKENS
+from app.services.transcription_alignment import global_matches
+from app.services.transcription_similarity import is_similar
+from app.services.metrics import observe, record
 
 @dataclass
 class Word:
@@ -9,137 +15,438 @@ class Word:
     timestamp: float
     normalized: str = ""
 
+# Códigos de status do resultado compacto. O índice que acompanha cada status aponta para a
+# palavra do usuário (correct, mistake, wrong) ou para a palavra da transcrição (missing).
+CORRECT = 0
+MISTAKE = 1
+WRONG = 2
+MISSING = 3
+STATUS_NAMES = ('correct', 'mistake', 'wrong', 'missing')
+
+# Horizonte de um passo que dependeu do fim do texto do usuário
+UNBOUNDED_HORIZON = sys.maxsize
+
+class TokenSequence:
+    """
+    Tokenized text as parallel arrays: token texts, normalized forms, interned
+    equivalence-class IDs and, for the actual transcript, start timestamps.
+    Normalized tokens never contain apostrophes, so two of them are equivalent
+    exactly when their class IDs are equal.
+    With scope (user text), words unknown to the global index get IDs local to the sequence, so
+    the sequence it is compared against must be built first.
+    """
+    __slots__ = ('texts', 'normalized', 'classes', 'timestamps', 'scope')
+
+    def __init__(self, texts: List[str], normalized: List[str], timestamps: Optional[Sequence[float]] = None,
+                 scope: Optional[Dict[str, int]] = None):
+        self.texts = texts
+        self.normalized = normalized
+        self.scope = scope
+        self.classes = array('l', [equivalence_class(n, scope) for n in normalized])
+        self.timestamps = array('d', timestamps) if timestamps is not None else None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def append(self, text: str, normalized: str):
+        self.texts.append(text)
+        self.normalized.append(normalized)
+        self.classes.append(equivalence_class(normalized, self.scope))
+
+    def truncate(self, length: int):
+        del self.texts[length:]
+        del self.normalized[length:]
+        del self.classes[length:]
+
+    def slice(self, start: int, end: int) -> 'TokenSequence':
+        """
+        Tokens start to end as a sequence of the same type, reusing the class IDs.
+        """
+        window = type(self).__new__(type(self))
+        window.texts = self.texts[start:end]
+        window.normalized = self.normalized[start:end]
+        window.classes = self.classes[start:end]
+        window.scope = self.scope
+        window.timestamps = self.timestamps[start:end] if self.timestamps is not None else None
+        return window
+
+class AlignmentResult:
+    """
+    Comparer output as a typed status array plus the token index of each entry.
+    """
+    __slots__ = ('statuses', 'indexes')
+
+    def __init__(self):
+        self.statuses = array('b')
+        self.indexes = array('l')
+
+    def __len__(self):
+        return len(self.statuses)
+
+    def append(self, status: int, idx: int):
+        self.statuses.append(status)
+        self.indexes.append(idx)
+
+    def truncate(self, length: int):
+        del self.statuses[length:]
+        del self.indexes[length:]
+
+    def to_dicts(self, user: TokenSequence, actual: TokenSequence, start: int = 0) -> List[Dict[str, str]]:
+        texts = (user.texts, user.texts, user.texts, actual.texts)
+        return [{'text': texts[status][idx], 'type': STATUS_NAMES[status]}
+                for status, idx in zip(self.statuses[start:], self.indexes[start:])]
+
+    def without_missing(self, start: int, end: int) -> 'AlignmentResult':
+        """
+        Copy that keeps 'missing' entries only for actual tokens start to end.
+        """
+        kept = AlignmentResult()
+        for status, idx in zip(self.statuses, self.indexes):
+            if status != MISSING or start <= idx < end:
+                kept.append(status, idx)
+        return kept
+
+    def to_spans(self, actual_offset: int = 0) -> List[List[int]]:
+        """
+        Run-length encoding as [status, start index, length] spans: consecutive entries with
+        the same status and consecutive token indexes collapse into one span. actual_offset
+        is added to the indexes of 'missing' entries.
+        """
+        spans = []
+        last = None
+        for status, idx in zip(self.statuses, self.indexes):
+            if status == MISSING:
+                idx += actual_offset
+            if last is not None and last[0] == status and last[1] + last[2] == idx:
+                last[2] += 1
+            else:
+                last = [status, idx, 1]
+                spans.append(last)
+        return spans
+
+class AlignmentCancelled(Exception):
+    pass
+
+class AlignmentCheckpoint(NamedTuple):
+    """
+    State of the greedy walk before a step. horizon is the exclusive bound of user word
+    indexes read by all earlier steps: edits at or after it cannot change what came before.
+    """
+    user_idx: int
+    actual_idx: int
+    result_len: int
+    matched_once: bool
+    horizon: int
+
 class TranscriptionComparerV4Pro:
     def __init__(self, mistake_threshold: float = 0.75, window_size: int = 20, max_search: int = 200):
         self.mistake_threshold = mistake_threshold
         self.window_size = window_size
         self.max_search = max_search
+        # Tempo gasto em realinhamentos e, dentro deles, no preenchimento de lacunas
+        self.realign_seconds = 0.0
+        self.fill_gap_seconds = 0.0
 
-    def compare(self, user_words: List[Word], actual_words: List[Word]) -> List[Dict[str, str]]:
-        result = []
-        user_idx = 0
-        actual_idx = 0
-        matched_once = False
+    def compare(self, user: TokenSequence, actual: TokenSequence) -> AlignmentResult:
+        started = time.perf_counter()
+        self.realign_seconds = self.fill_gap_seconds = 0.0
+        result = AlignmentResult()
+        user_idx, actual_idx = self.align(user, actual, result)
+        self.emit_tail(user, user_idx, actual, actual_idx, result)
+        record('compare_seconds', started, time.perf_counter() - started, comparer='greedy', stage='total')
+        observe('compare_seconds', self.realign_seconds - self.fill_gap_seconds, comparer='greedy', stage='realign')
+        observe('compare_seconds', self.fill_gap_seconds, comparer='greedy', stage='fill_gap')
+        return result
 
-        while user_idx < len(user_words) and actual_idx < len(actual_words):
-            if are_equivalent(user_words[user_idx].normalized, actual_words[actual_idx].normalized):
+    def align(self, user: TokenSequence, actual: TokenSequence, result: AlignmentResult,
+              start: Optional[AlignmentCheckpoint] = None,
+              checkpoints: Optional[List[AlignmentCheckpoint]] = None,
+              cancel: Optional[threading.Event] = None) -> Tuple[int, int]:
+        """
+        Greedy walk shared by compare and incremental validation sessions.
+        Resumes from start when given and appends a checkpoint to checkpoints before every step.
+        Returns the user and actual indexes where the walk stopped; the tail is left to emit_tail.
+        Raises AlignmentCancelled when cancel is set; the checkpoints appended so far stay valid.
+        """
+        if start is None:
+            start = AlignmentCheckpoint(0, 0, len(result), False, 0)
+        user_idx, actual_idx, matched_once, horizon = start.user_idx, start.actual_idx, start.matched_once, start.horizon
+        user_classes, actual_classes = user.classes, actual.classes
+        user_norms, actual_norms = user.normalized, actual.normalized
+        user_len, actual_len = len(user), len(actual)
+
+        while user_idx < user_len and actual_idx < actual_len:
+            if checkpoints is not None:
+                checkpoints.append(AlignmentCheckpoint(user_idx, actual_idx, len(result), matched_once, horizon))
+            if cancel is not None and cancel.is_set():
+                raise AlignmentCancelled('Alignment cancelled')
+
+            if user_classes[user_idx] == actual_classes[actual_idx]:
                 if not matched_once and actual_idx > 0:
                     for idx in range(actual_idx):
-                        result.append({'text': actual_words[idx].text, 'type': 'missing'})
+                        result.append(MISSING, idx)
                 matched_once = True
-                result.append({'text': user_words[user_idx].text, 'type': 'correct'})
+                result.append(CORRECT, user_idx)
                 user_idx += 1
                 actual_idx += 1
+                horizon = max(horizon, user_idx)
+                continue
+
+            # A busca de frases pode olhar até MAX_PHRASE_TOKENS palavras à frente
+            horizon = max(horizon, user_idx + MAX_PHRASE_TOKENS)
+            phrase_user, phrase_actual = self.phrase_span(user_norms, user_idx, actual_norms, actual_idx)
+            if phrase_user:
+                if not matched_once and actual_idx > 0:
+                    for idx in range(actual_idx):
+                        result.append(MISSING, idx)
+                matched_once = True
+                for idx in range(user_idx, user_idx + phrase_user):
+                    result.append(CORRECT, idx)
+                user_idx += phrase_user
+                actual_idx += phrase_actual
                 continue
 
-            if self.is_mistake(user_words[user_idx].normalized, actual_words[actual_idx].normalized):
+            if self.is_mistake(user_norms[user_idx], actual_norms[actual_idx]):
                 if not matched_once and actual_idx > 0:
                     for idx in range(actual_idx):
-                        result.append({'text': actual_words[idx].text, 'type': 'missing'})
+                        result.append(MISSING, idx)
                 matched_once = True
-                result.append({'text': user_words[user_idx].text, 'type': 'mistake'})
+                result.append(MISTAKE, user_idx)
                 user_idx += 1
                 actual_idx += 1
                 continue
 
             last_result_len = len(result)
-            user_idx, actual_idx = self.realign_with_dubles(user_words, user_idx, actual_words, actual_idx, result, matched_once)
+            last_user_idx = user_idx
+            realign_started = time.perf_counter()
+            user_idx, actual_idx = self.realign_with_dubles(user, user_idx, actual, actual_idx, result, matched_once)
+            self.realign_seconds += time.perf_counter() - realign_started
+            # Achar um par só depende das palavras até ele; cair no fallback palavra a palavra
+            # depende de não existir par em todo o resto do texto do usuário
+            horizon = max(horizon, user_idx if user_idx - last_user_idx >= 2 else UNBOUNDED_HORIZON)
 
             if len(result) == last_result_len:
-                result.append({'text': user_words[user_idx].text, 'type': 'wrong'})
-                result.append({'text': actual_words[actual_idx].text, 'type': 'missing'})
+                result.append(WRONG, user_idx)
+                result.append(MISSING, actual_idx)
                 user_idx += 1
                 actual_idx += 1
 
-        while user_idx < len(user_words):
-            result.append({'text': user_words[user_idx].text, 'type': 'wrong'})
-            user_idx += 1
-
-        while actual_idx < len(actual_words):
-            result.append({'text': actual_words[actual_idx].text, 'type': 'missing'})
-            actual_idx += 1
-
-        return result
+        if checkpoints is not None:
+            checkpoints.append(AlignmentCheckpoint(user_idx, actual_idx, len(result), matched_once, horizon))
+        return user_idx, actual_idx
 
-    def realign_with_dubles(self, user_words, user_start_idx, actual_words, actual_start_idx, result, matched_once):
-        user_new_world = user_words[user_start_idx:]
-        actual_target = actual_words[actual_start_idx:]
+    def emit_tail(self, user: TokenSequence, user_idx: int, actual: TokenSequence, actual_idx: int, result: AlignmentResult):
+        for idx in range(user_idx, len(user)):
+            result.append(WRONG, idx)
+        for idx in range(actual_idx, len(actual)):
+            result.append(MISSING, idx)
 
-        user_dubles = self.generate_dubles(user_new_world)
+    def realign_with_dubles(self, user: TokenSequence, user_start_idx: int, actual: TokenSequence, actual_start_idx: int,
+                            result: AlignmentResult, matched_once: bool) -> Tuple[int, int]:
+        user_classes, actual_classes = user.classes, actual.classes
+        actual_remaining = len(actual) - actual_start_idx
 
-        for user_offset, duble_user in enumerate(user_dubles):
-            for window_start in range(0, min(len(actual_target), self.max_search), self.window_size):
-                window_end = min(window_start + self.window_size, len(actual_target))
-                window = actual_target[window_start:window_end]
-                target_dubles = self.generate_dubles(window)
+        # Pares da transcrição dentro da área de busca -> primeira posição em que aparecem.
+        # Pares que atravessam o limite de uma janela não contam, como na busca por janelas.
+        target_dubles = {}
+        for window_start in range(0, min(actual_remaining, self.max_search), self.window_size):
+            window_end = min(window_start + self.window_size, actual_remaining)
+            for idx in range(actual_start_idx + window_start, actual_start_idx + window_end - 1):
+                target_dubles.setdefault((actual_classes[idx], actual_classes[idx + 1]), idx)
 
-                for target_offset, duble_target in enumerate(target_dubles):
-                    if self.are_dubles_equivalent(duble_user, duble_target):
-                        full_target_start_idx = actual_start_idx + window_start + target_offset
+        for user_pos in range(user_start_idx, len(user) - 1):
+            full_target_start_idx = target_dubles.get((user_classes[user_pos], user_classes[user_pos + 1]))
+            if full_target_start_idx is None:
+                continue
 
-                        if not matched_once and full_target_start_idx > 0:
-                            for idx in range(actual_start_idx, full_target_start_idx):
-                                result.append({'text': actual_words[idx].text, 'type': 'missing'})
+            if not matched_once and full_target_start_idx > 0:
+                for idx in range(actual_start_idx, full_target_start_idx):
+                    result.append(MISSING, idx)
 
-                        self.fill_field_gaps(
-                            user_words[user_start_idx:user_start_idx + user_offset],
-                            actual_words[actual_start_idx:full_target_start_idx],
-                            result
-                        )
+            fill_started = time.perf_counter()
+            self.fill_field_gaps(user, user_start_idx, user_pos, actual, actual_start_idx, full_target_start_idx, result)
+            self.fill_gap_seconds += time.perf_counter() - fill_started
 
-                        for w in duble_user:
-                            result.append({'text': w.text, 'type': 'correct'})
-                        return user_start_idx + user_offset + 2, full_target_start_idx + 2
+            result.append(CORRECT, user_pos)
+            result.append(CORRECT, user_pos + 1)
+            return user_pos + 2, full_target_start_idx + 2
 
         # fallback palavra a palavra
+        user_norms, actual_norms = user.normalized, actual.normalized
         user_idx, actual_idx = user_start_idx, actual_start_idx
-        while user_idx < len(user_words) and actual_idx < len(actual_words):
-            if are_equivalent(user_words[user_idx].normalized, actual_words[actual_idx].normalized):
+        while user_idx < len(user) and actual_idx < len(actual):
+            if user_classes[user_idx] == actual_classes[actual_idx]:
                 if not matched_once and actual_idx > 0:
                     for idx in range(actual_start_idx, actual_idx):
-                        result.append({'text': actual_words[idx].text, 'type': 'missing'})
-                result.append({'text': user_words[user_idx].text, 'type': 'correct'})
+                        result.append(MISSING, idx)
+                result.append(CORRECT, user_idx)
                 return user_idx + 1, actual_idx + 1
-            if self.is_mistake(user_words[user_idx].normalized, actual_words[actual_idx].normalized):
+            if self.is_mistake(user_norms[user_idx], actual_norms[actual_idx]):
                 if not matched_once and actual_idx > 0:
                     for idx in range(actual_start_idx, actual_idx):
-                        result.append({'text': actual_words[idx].text, 'type': 'missing'})
-                result.append({'text': user_words[user_idx].text, 'type': 'mistake'})
+                        result.append(MISSING, idx)
+                result.append(MISTAKE, user_idx)
                 return user_idx + 1, actual_idx + 1
             actual_idx += 1
 
         return user_start_idx, actual_start_idx
 
-    def generate_dubles(self, words: List[Word]) -> List[List[Word]]:
-        return [[words[i], words[i + 1]] for i in range(len(words) - 1)]
-
-    def are_dubles_equivalent(self, duble1: List[Word], duble2: List[Word]) -> bool:
-        return all(are_equivalent(w1.normalized, w2.normalized) for w1, w2 in zip(duble1, duble2))
+    def phrase_span(self, user_norms: Sequence[str], user_idx: int, actual_norms: Sequence[str], actual_idx: int) -> Tuple[int, int]:
+        """
+        Match multi-word equivalents across token boundaries ("I'm" vs "I am", "100" vs "one hundred").
+        Returns the number of user and actual tokens covered, or (0, 0).
+        """
+        user_class, user_len = match_phrase(user_norms, user_idx)
+        if user_class is None:
+            return 0, 0
+        actual_class, actual_len = match_phrase(actual_norms, actual_idx)
+        if actual_class != user_class or (user_len == 1 and actual_len == 1):
+            return 0, 0
+        return user_len, actual_len
 
-    def fill_field_gaps(self, user_gap: List[Word], actual_gap: List[Word], result: List[Dict[str, str]]):
-        user_used = [False] * len(user_gap)
+    def fill_field_gaps(self, user: TokenSequence, user_lo: int, user_hi: int,
+                        actual: TokenSequence, actual_lo: int, actual_hi: int, result: AlignmentResult):
+        user_classes, actual_classes = user.classes, actual.classes
+        user_norms, actual_norms = user.normalized, actual.normalized
+        user_used = [False] * (user_hi - user_lo)
 
-        for aw in actual_gap:
+        for actual_idx in range(actual_lo, actual_hi):
             matched = False
-            for i, uw in enumerate(user_gap):
-                if not user_used[i] and are_equivalent(uw.normalized, aw.normalized):
-                    result.append({'text': uw.text, 'type': 'correct'})
+            for i in range(user_hi - user_lo):
+                if not user_used[i] and user_classes[user_lo + i] == actual_classes[actual_idx]:
+                    result.append(CORRECT, user_lo + i)
                     user_used[i] = True
                     matched = True
                     break
             if not matched:
-                for i, uw in enumerate(user_gap):
-                    if not user_used[i] and self.is_mistake(uw.normalized, aw.normalized):
-                        result.append({'text': uw.text, 'type': 'mistake'})
+                for i in range(user_hi - user_lo):
+                    if not user_used[i] and self.is_mistake(user_norms[user_lo + i], actual_norms[actual_idx]):
+                        result.append(MISTAKE, user_lo + i)
                         user_used[i] = True
                         matched = True
                         break
             if not matched:
-                result.append({'text': aw.text, 'type': 'missing'})
+                result.append(MISSING, actual_idx)
 
         for i, used in enumerate(user_used):
             if not used:
-                result.append({'text': user_gap[i].text, 'type': 'wrong'})
+                result.append(WRONG, user_lo + i)
 
     def is_mistake(self, user_norm: str, actual_norm: str) -> bool:
-        return SequenceMatcher(None, user_norm, actual_norm).ratio() >= self.mistake_threshold
\ No newline at end of file
+        return is_similar(user_norm, actual_norm, self.mistake_threshold)
+
+
+class TranscriptionComparerGlobal(TranscriptionComparerV4Pro):
+    """
+    Optimal global alignment instead of the greedy walk of TranscriptionComparerV4Pro.
+    Exact matches come from a linear-memory Myers/Hirschberg alignment over equivalence-class
+    IDs; the unmatched hunks between them are then paired as mistakes (similarity above
+    mistake_threshold) or phrase equivalents, and emitted in the same result stream.
+    """
+    def __init__(self, mistake_threshold: float = 0.75, window_size: int = 20, max_hunk_cells: int = 10000):
+        super().__init__(mistake_threshold=mistake_threshold, window_size=window_size)
+        self.max_hunk_cells = max_hunk_cells
+
+    def compare(self, user: TokenSequence, actual: TokenSequence) -> AlignmentResult:
+        started = time.perf_counter()
+        result = AlignmentResult()
+        user_idx = 0
+        actual_idx = 0
+        for match_actual, match_user in global_matches(actual.classes, user.classes):
+            self.resolve_hunk(user, user_idx, match_user, actual, actual_idx, match_actual, result)
+            result.append(CORRECT, match_user)
+            user_idx = match_user + 1
+            actual_idx = match_actual + 1
+        self.resolve_hunk(user, user_idx, len(user), actual, actual_idx, len(actual), result)
+        record('compare_seconds', started, time.perf_counter() - started, comparer='global', stage='total')
+        return result
+
+    def resolve_hunk(self, user: TokenSequence, user_lo: int, user_hi: int,
+                     actual: TokenSequence, actual_lo: int, actual_hi: int, result: AlignmentResult):
+        user_len = user_hi - user_lo
+        actual_len = actual_hi - actual_lo
+        if not user_len or not actual_len:
+            for idx in range(actual_lo, actual_hi):
+                result.append(MISSING, idx)
+            for idx in range(user_lo, user_hi):
+                result.append(WRONG, idx)
+            return
+        if user_len * actual_len > self.max_hunk_cells:
+            self.resolve_hunk_windowed(user, user_lo, user_hi, actual, actual_lo, actual_hi, result)
+            return
+
+        # best[i][j]: melhor pontuação alinhando actual[actual_lo + i:] com user[user_lo + j:]
+        # (erro parecido vale 1, frase equivalente vale a quantidade de tokens cobertos)
+        user_norms, actual_norms = user.normalized, actual.normalized
+        user_phrases = [match_phrase(user_norms, user_lo + j) for j in range(user_len)]
+        actual_phrases = [match_phrase(actual_norms, actual_lo + i) for i in range(actual_len)]
+        best = [[0] * (user_len + 1) for _ in range(actual_len + 1)]
+        step = [[None] * (user_len + 1) for _ in range(actual_len + 1)]
+        for i in range(actual_len - 1, -1, -1):
+            actual_class, phrase_actual = actual_phrases[i]
+            for j in range(user_len - 1, -1, -1):
+                score, move = best[i + 1][j + 1], ('skip', 1, 1)
+                if best[i][j + 1] > score:
+                    score, move = best[i][j + 1], ('wrong', 0, 1)
+                if best[i + 1][j] > score:
+                    score, move = best[i + 1][j], ('missing', 1, 0)
+                if best[i + 1][j + 1] + 1 > score and self.is_mistake(user_norms[user_lo + j], actual_norms[actual_lo + i]):
+                    score, move = best[i + 1][j + 1] + 1, ('mistake', 1, 1)
+                user_class, phrase_user = user_phrases[j]
+                if (actual_class is not None and user_class == actual_class and phrase_user + phrase_actual > 2
+                        and j + phrase_user <= user_len and i + phrase_actual <= actual_len):
+                    phrase_score = best[i + phrase_actual][j + phrase_user] + phrase_user + phrase_actual
+                    if phrase_score > score:
+                        score, move = phrase_score, ('phrase', phrase_actual, phrase_user)
+                best[i][j] = score
+                step[i][j] = move
+
+        i = j = 0
+        while i < actual_len and j < user_len:
+            kind, di, dj = step[i][j]
+            if kind == 'skip':
+                result.append(WRONG, user_lo + j)
+                result.append(MISSING, actual_lo + i)
+            elif kind == 'wrong':
+                result.append(WRONG, user_lo + j)
+            elif kind == 'missing':
+                result.append(MISSING, actual_lo + i)
+            elif kind == 'mistake':
+                result.append(MISTAKE, user_lo + j)
+            else:
+                for idx in range(user_lo + j, user_lo + j + dj):
+                    result.append(CORRECT, idx)
+            i += di
+            j += dj
+        self.resolve_hunk(user, user_lo + j, user_hi, actual, actual_lo + i, actual_hi, result)
+
+    def resolve_hunk_windowed(self, user: TokenSequence, user_lo: int, user_hi: int,
+                              actual: TokenSequence, actual_lo: int, actual_hi: int, result: AlignmentResult):
+        # Hunks grandes demais para a tabela: cada palavra do usuário procura um erro
+        # parecido nas próximas window_size palavras ainda não usadas da transcrição
+        user_norms, actual_norms = user.normalized, actual.normalized
+        user_idx = user_lo
+        actual_idx = actual_lo
+        while user_idx < user_hi:
+            phrase_user, phrase_actual = (0, 0)
+            if actual_idx < actual_hi:
+                phrase_user, phrase_actual = self.phrase_span(user_norms, user_idx, actual_norms, actual_idx)
+            if phrase_user and user_idx + phrase_user <= user_hi and actual_idx + phrase_actual <= actual_hi:
+                for idx in range(user_idx, user_idx + phrase_user):
+                    result.append(CORRECT, idx)
+                user_idx += phrase_user
+                actual_idx += phrase_actual
+                continue
+            window_end = min(actual_idx + self.window_size, actual_hi)
+            for idx in range(actual_idx, window_end):
+                if self.is_mistake(user_norms[user_idx], actual_norms[idx]):
+                    for skipped in range(actual_idx, idx):
+                        result.append(MISSING, skipped)
+                    result.append(MISTAKE, user_idx)
+                    actual_idx = idx + 1
+                    break
+            else:
+                result.append(WRONG, user_idx)
+            user_idx += 1
+        for idx in range(actual_idx, actual_hi):
+            result.append(MISSING, idx)
@@ -1,4 +1,7 @@
 # Equivalências de abreviações e números para transcrição
+import itertools
+import re
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
 
 # Lista de abreviações comuns e equivalências
 ABBREVIATION_EQUIVALENTS = {
@@ -68,20 +71,132 @@ for i in range(1, 101):
     NUMBERS_EQUIVALENTS[number_words[i-1]] = [str(i), number_words[i-1]]
 
 
+# Índice de classes de equivalência, montado na importação.
+# Cada forma de superfície (minúscula) aponta para um ID inteiro de classe, de modo
+# que comparar duas palavras é uma consulta em dict seguida de comparação de inteiros.
+# Palavras fora das tabelas recebem um ID novo na primeira vez em que aparecem: as das
+# transcrições no índice global, as digitadas pelo usuário num dict da sequência (IDs
+# negativos), para que texto arbitrário de clientes não faça o índice crescer sem limite.
+_CLASS_INDEX: Dict[str, int] = {}
+_next_class_id = itertools.count()
+
+# Formas ambíguas ("'s" vale para is/has/us) têm classe própria e apontam para as
+# classes de cada grupo em que aparecem, preservando a equivalência não transitiva.
+_CROSS_CLASS: Dict[int, FrozenSet[int]] = {}
+
+# Formas sem apóstrofo que já são palavras comuns ("we're" -> "were", "we'll" -> "well")
+# e não podem ser tratadas como contração.
+_AMBIGUOUS_STRIPPED = frozenset({"were", "well", "ill", "hell", "shell", "its"})
+
+# Trie de frases por tokens normalizados ("i am", "one hundred", "im", "100").
+# Cada nó é um dict token -> nó; a chave None guarda o ID da classe da frase.
+_PHRASE_TRIE: Dict = {}
+MAX_PHRASE_TOKENS = 1
+
+_STRIP_RE = re.compile(r'[^\w\s]')
+
+
+def _phrase_tokens(form: str) -> List[str]:
+    # Mesmo formato produzido por transcription_service.normalize_text
+    return _STRIP_RE.sub('', form.lower()).split()
+
+
+def _add_phrase(tokens: List[str], class_id: int):
+    global MAX_PHRASE_TOKENS
+    node = _PHRASE_TRIE
+    for token in tokens:
+        node = node.setdefault(token, {})
+    node.setdefault(None, class_id)
+    MAX_PHRASE_TOKENS = max(MAX_PHRASE_TOKENS, len(tokens))
+
+
+def _build_index():
+    groups = []
+    seen = set()
+    for forms in list(ABBREVIATION_EQUIVALENTS.values()) + list(NUMBERS_EQUIVALENTS.values()):
+        key = tuple(sorted(f.lower() for f in forms))
+        if key not in seen:
+            seen.add(key)
+            groups.append([f.lower() for f in forms])
+
+    membership: Dict[str, List[int]] = {}
+    group_ids = []
+    for forms in groups:
+        class_id = next(_next_class_id)
+        group_ids.append(class_id)
+        for form in forms:
+            membership.setdefault(form, []).append(class_id)
+
+    for form, class_ids in membership.items():
+        if len(class_ids) == 1:
+            _CLASS_INDEX[form] = class_ids[0]
+            continue
+        own_id = next(_next_class_id)
+        _CLASS_INDEX[form] = own_id
+        _CROSS_CLASS[own_id] = frozenset(class_ids)
+        for class_id in class_ids:
+            _CROSS_CLASS[class_id] = _CROSS_CLASS.get(class_id, frozenset()) | {own_id}
+
+    for forms, class_id in zip(groups, group_ids):
+        for form in forms:
+            if form.startswith("'") or len(membership[form]) > 1:
+                continue
+            variants = [form, form.replace('-', ' ')] if '-' in form else [form]
+            for variant in variants:
+                tokens = _phrase_tokens(variant)
+                if not tokens or (len(tokens) == 1 and tokens[0] in _AMBIGUOUS_STRIPPED):
+                    continue
+                _add_phrase(tokens, class_id)
+                if len(tokens) == 1:
+                    _CLASS_INDEX.setdefault(tokens[0], class_id)
+
+
+_build_index()
+
+
+def equivalence_class(word: str, scope: Optional[Dict[str, int]] = None) -> int:
+    """
+    Retorna o ID da classe de equivalência de word, internando palavras novas no índice
+    global ou, com scope, só em scope, com IDs negativos que nunca colidem com os globais.
+    """
+    class_id = _CLASS_INDEX.get(word)
+    if class_id is not None:
+        return class_id
+    lowered = word.lower()
+    class_id = _CLASS_INDEX.get(lowered)
+    if class_id is None:
+        if scope is not None:
+            return scope.setdefault(lowered, -len(scope) - 1)
+        class_id = _CLASS_INDEX.setdefault(lowered, next(_next_class_id))
+    if scope is None:
+        _CLASS_INDEX.setdefault(word, class_id)
+    return class_id
+
+
+def match_phrase(tokens: Sequence[str], start: int) -> Tuple[Optional[int], int]:
+    """
+    Procura a frase equivalente mais longa em tokens (já normalizados) a partir de start.
+    Retorna (ID da classe, quantidade de tokens) ou (None, 0) se nada casar.
+    """
+    node = _PHRASE_TRIE
+    best_class, best_len = None, 0
+    idx = start
+    while idx < len(tokens):
+        node = node.get(tokens[idx])
+        if node is None:
+            break
+        idx += 1
+        class_id = node.get(None)
+        if class_id is not None:
+            best_class, best_len = class_id, idx - start
+    return best_class, best_len
+
+
 def are_equivalent(word1: str, word2: str) -> bool:
     """
     Retorna True se word1 e word2 forem equivalentes considerando abreviações e números.
     """
-    w1 = word1.lower()
-    w2 = word2.lower()
-    # Abreviações
-    for group in ABBREVIATION_EQUIVALENTS.values():
-        if w1 in group and w2 in group:
-            return True
-    # Números
-    if w1 in NUMBERS_EQUIVALENTS and w2 in NUMBERS_EQUIVALENTS[w1]:
-        return True
-    if w2 in NUMBERS_EQUIVALENTS and w1 in NUMBERS_EQUIVALENTS[w2]:
-        return True
-    # Igualdade direta
-    return w1 == w2 
\ No newline at end of file
+    scope = {}
+    class1 = equivalence_class(word1, scope)
+    class2 = equivalence_class(word2, scope)
+    return class1 == class2 or class2 in _CROSS_CLASS.get(class1, ())
@@ -1,6 +1,18 @@
 import re
-from typing import Dict, List, Tuple, Union
-from app.services.transcription_correction import Word, TranscriptionComparerV4Pro
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+from app.services.transcription_correction import TokenSequence, AlignmentResult, TranscriptionComparerV4Pro, TranscriptionComparerGlobal
+from app.services.metrics import record
+
+# Modos de alinhamento aceitos por validate_transcription
+ALIGNMENT_MODES = {
+    'greedy': TranscriptionComparerV4Pro,
+    'global': TranscriptionComparerGlobal,
+}
+
+# Palavras digitadas pelo usuário (mantém contrações como "don't")
+USER_WORD_RE = re.compile(r'\b\w+[\w\']*\b')
 
 def normalize_text(text):
     text = re.sub(r'\[.*?\]', '', text)
@@ -8,21 +20,74 @@ def normalize_text(text):
     text = re.sub(r'\s+', ' ', text).strip().lower()
     return text
 
-def validate_transcription(user_input: str, actual_transcript: str, timestamps: List[float] = None) -> List[Dict[str, str]]:
+def validate_transcription(user_input: str, actual_transcript: str, timestamps: List[float] = None, alignment: str = 'greedy', artifact=None) -> List[Dict[str, str]]:
     """
     Validate user transcription against actual transcript with optional timestamps.
     If timestamps are not provided, words will be assumed to be evenly distributed.
+    alignment selects the comparer: 'greedy' (default) or 'global' (optimal alignment).
+    artifact is the cached TranscriptArtifact of actual_transcript; when given, the actual
+    side is used as is instead of being tokenized again.
+    """
+    result, user_tokens, actual_tokens = align_transcription(user_input, actual_transcript, timestamps, alignment, artifact)
+    return result.to_dicts(user_tokens, actual_tokens)
+
+def align_transcription(user_input: str, actual_transcript: str, timestamps: List[float] = None, alignment: str = 'greedy',
+                        artifact=None) -> Tuple[AlignmentResult, TokenSequence, TokenSequence]:
     """
+    Same as validate_transcription, but returns the compact AlignmentResult together with the
+    user and actual token sequences it indexes into. Routes convert it to JSON at the edge.
+    """
+    if alignment not in ALIGNMENT_MODES:
+        raise ValueError(f"Unknown alignment mode: {alignment}")
+
+    # A transcrição antes do texto do usuário: as palavras dela vão para o índice global de classes
+    actual_tokens = artifact if artifact is not None else build_actual_tokens(actual_transcript, timestamps)
+    user_tokens = build_user_tokens(user_input)
+    comparer = ALIGNMENT_MODES[alignment]()
+    return comparer.compare(user_tokens, actual_tokens), user_tokens, actual_tokens
+
+def build_actual_tokens(actual_transcript: str, timestamps: List[float] = None) -> TokenSequence:
+    started = time.perf_counter()
+    words = actual_transcript.split()
+    record('tokenize_seconds', started, time.perf_counter() - started, side='actual')
     if timestamps is None:
         # If no timestamps provided, create artificial ones spaced evenly
-        words = actual_transcript.split()
         total_duration = len(words) / 2  # Assume average of 2 words per second
         timestamps = [i * (total_duration / len(words)) for i in range(len(words))]
-    
-    # Create list of Word objects for actual transcript
-    actual_words = [Word(text=text, timestamp=ts, normalized=normalize_text(text)) for text, ts in zip(actual_transcript.split(), timestamps)]
-    # Create list of Word objects for user input (timestamp 0.0, normalizado)
-    user_words = [Word(text=w, timestamp=0.0, normalized=normalize_text(w)) for w in re.findall(r'\b\w+[\w\']*\b', user_input)]
-    
-    comparer = TranscriptionComparerV4Pro()
-    return comparer.compare(user_words, actual_words)
+
+    texts = words[:len(timestamps)]
+    return TokenSequence(texts, normalize_tokens(texts, 'actual'), timestamps[:len(texts)])
+
+def build_user_tokens(user_input: str) -> TokenSequence:
+    started = time.perf_counter()
+    texts = USER_WORD_RE.findall(user_input)
+    record('tokenize_seconds', started, time.perf_counter() - started, side='user')
+    return TokenSequence(texts, normalize_tokens(texts, 'user'), scope={})
+
+def normalize_tokens(texts: List[str], side: str) -> List[str]:
+    started = time.perf_counter()
+    normalized = [normalize_text(text) for text in texts]
+    record('normalize_text_seconds', started, time.perf_counter() - started, side=side)
+    return normalized
+
+class TranscriptWindow(NamedTuple):
+    """
+    Token bounds of a time window: start/end include the margin, core_start/core_end do not.
+    """
+    start: int
+    end: int
+    core_start: int
+    core_end: int
+
+def find_window(timestamps: Sequence[float], start: Optional[float] = None, end: Optional[float] = None,
+                margin: float = 0.0) -> TranscriptWindow:
+    """
+    Bisect the per-word start times for the words said between start and end seconds
+    (either may be None for an open end), widened by margin seconds on each side.
+    """
+    total = len(timestamps)
+    core_start = bisect_left(timestamps, start) if start is not None else 0
+    core_end = bisect_right(timestamps, end) if end is not None else total
+    window_start = bisect_left(timestamps, start - margin) if start is not None else 0
+    window_end = bisect_right(timestamps, end + margin) if end is not None else total
+    return TranscriptWindow(window_start, window_end, max(core_start, window_start), min(core_end, window_end))
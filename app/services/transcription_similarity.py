@@ -0,0 +1,94 @@
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+# Núcleo de similaridade usado por is_mistake.
+# Mantém exatamente a semântica SequenceMatcher(None, a, b).ratio() >= threshold, mas descarta
+# a maioria dos pares com limites baratos antes de construir um SequenceMatcher.
+
+# Quantidade de pares (a, b, threshold) mantidos no cache LRU
+SIMILARITY_CACHE_SIZE = 65536
+
+
+def is_similar(a: str, b: str, threshold: float) -> bool:
+    """
+    Return True if SequenceMatcher(None, a, b).ratio() >= threshold.
+    """
+    if a == b:
+        return 1.0 >= threshold
+    # ratio = 2·M / total e M (caracteres casados) nunca passa do menor comprimento;
+    # pares descartados aqui nem chegam a ocupar o cache
+    len_a, len_b = len(a), len(b)
+    if 2.0 * (len_a if len_a < len_b else len_b) / (len_a + len_b) < threshold:
+        return False
+    return _is_similar_cached(a, b, threshold)
+
+
+@lru_cache(maxsize=SIMILARITY_CACHE_SIZE)
+def _is_similar_cached(a: str, b: str, threshold: float) -> bool:
+    total = len(a) + len(b)
+
+    # M também não passa da interseção dos multiconjuntos de caracteres
+    counts = {}
+    for ch in b:
+        counts[ch] = counts.get(ch, 0) + 1
+    common = 0
+    for ch in a:
+        available = counts.get(ch, 0)
+        if available:
+            counts[ch] = available - 1
+            common += 1
+    if 2.0 * common / total < threshold:
+        return False
+
+    # Os blocos do SequenceMatcher formam uma subsequência comum, logo M <= LCS
+    needed = int(threshold * total / 2)
+    while 2.0 * needed / total < threshold:
+        needed += 1
+    if not _lcs_at_least(a, b, needed):
+        return False
+
+    return SequenceMatcher(None, a, b).ratio() >= threshold
+
+
+def _lcs_at_least(a: str, b: str, needed: int) -> bool:
+    # Distância de inserção/remoção em faixa: LCS >= needed equivale a
+    # distância <= len(a) + len(b) - 2·needed. Para assim que a linha inteira passa do limite.
+    max_dist = len(a) + len(b) - 2 * needed
+    if max_dist < 0:
+        return False
+    if abs(len(a) - len(b)) > max_dist:
+        return False
+
+    inf = max_dist + 1
+    width = len(b)
+    prev = [j if j <= max_dist else inf for j in range(width + 1)]
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - max_dist)
+        hi = min(width, i + max_dist)
+        cur = [inf] * (width + 1)
+        if i <= max_dist:
+            cur[0] = i
+        row_min = cur[0]
+        ch = a[i - 1]
+        for j in range(lo, hi + 1):
+            if ch == b[j - 1]:
+                dist = prev[j - 1]
+            else:
+                dist = min(prev[j], cur[j - 1]) + 1
+            if dist > inf:
+                dist = inf
+            cur[j] = dist
+            if dist < row_min:
+                row_min = dist
+        if row_min > max_dist:
+            return False
+        prev = cur
+    return prev[width] <= max_dist
+
+
+def clear_similarity_cache():
+    _is_similar_cached.cache_clear()
+
+
+def similarity_cache_info():
+    return _is_similar_cached.cache_info()
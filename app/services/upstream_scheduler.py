@@ -0,0 +1,239 @@
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from app.services.app_singleton import AppSingleton
+from app.services.sqlite_connections import ThreadConnections
+from app.services.metrics import timed
+
+# Agendador das chamadas ao YouTube. Cada classe de chamada tem um token bucket (taxa por
+# segundo e rajada, por worker) e as chamadas da Data API descontam o custo na cota diária,
+# contada no SQLite compartilhado para valer para todos os workers. Chamadas em segundo plano
+# (pré-carregamento, renovação de buscas) esperam enquanto houver chamadas interativas na fila
+# e não usam a parte da cota reservada para as interativas. Um trabalho em segundo plano pelo
+# qual uma chamada interativa passa a esperar (a mesma busca de transcrição) é promovido.
+
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# Custo em unidades de cota da Data API; o proxy não consome cota
+QUOTA_COSTS = {
+    'search': 100,
+    'videos': 1,
+    'captions': 50,
+    'proxy': 0,
+}
+
+# Prioridade das chamadas feitas no contexto atual (thread ou tarefa); None é interativa.
+# É um objeto mutável, e as cópias do contexto (sondagem de idiomas) compartilham a promoção
+_PRIORITY = contextvars.ContextVar('upstream_priority', default=None)
+
+
+class UpstreamBusy(Exception):
+    """
+    The call was not made: its rate limit would make the caller wait longer than allowed.
+    """
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaExceeded(UpstreamBusy):
+    pass
+
+
+class Priority:
+    """
+    Priority of a piece of work. Calls already waiting in a bucket follow a promotion.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: str):
+        self.value = value
+
+    def promote(self):
+        self.value = INTERACTIVE
+
+
+@contextmanager
+def background_priority():
+    token = _PRIORITY.set(Priority(BACKGROUND))
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def current_priority() -> str:
+    priority = _PRIORITY.get()
+    return INTERACTIVE if priority is None else priority.value
+
+
+def priority_handle() -> Optional[Priority]:
+    """
+    Priority of the work running in the current context, or None if it is interactive.
+    """
+    return _PRIORITY.get()
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float, background_reserve: float):
+        self.rate = rate
+        self.burst = burst
+        # Fichas que as chamadas em segundo plano deixam para as interativas
+        self.background_reserve = background_reserve
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.granted = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.rejected = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.condition = threading.Condition()
+
+    def acquire(self, priority: Priority, max_wait: float):
+        deadline = time.monotonic() + max_wait
+        with self.condition:
+            waiting_as = priority.value
+            self.waiting[waiting_as] += 1
+            try:
+                while True:
+                    if priority.value != waiting_as:
+                        # Promovida enquanto esperava: passa a contar (e a ser atendida) como interativa
+                        self.waiting[waiting_as] -= 1
+                        waiting_as = priority.value
+                        self.waiting[waiting_as] += 1
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    needed = 1 if waiting_as == INTERACTIVE else min(1 + self.background_reserve, self.burst)
+                    yields = waiting_as == BACKGROUND and self.waiting[INTERACTIVE] > 0
+                    if not yields and self.tokens >= needed:
+                        self.tokens -= 1
+                        self.granted[waiting_as] += 1
+                        return
+                    wait = max((needed - self.tokens) / self.rate, 0.01)
+                    if now + wait > deadline:
+                        self.rejected[waiting_as] += 1
+                        raise UpstreamBusy('Upstream rate limit reached, try again later', wait)
+                    # Uma promoção acorda quem espera (notify), sem esperar a próxima ficha
+                    self.condition.wait(wait)
+            finally:
+                self.waiting[waiting_as] -= 1
+                self.condition.notify_all()
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def stats(self) -> Dict:
+        with self.condition:
+            tokens = min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate)
+            return {'rate': self.rate, 'burst': self.burst, 'tokens': round(tokens, 2),
+                    'waiting': dict(self.waiting), 'granted': dict(self.granted), 'rejected': dict(self.rejected)}
+
+
+class QuotaLedger:
+    """
+    Data API units spent per quota day, shared by the workers through SQLite.
+    The quota resets at midnight Pacific time.
+    """
+    def __init__(self, path: str, daily_limit: int, interactive_reserve: float):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.daily_limit = daily_limit
+        # Fração da cota que só chamadas interativas podem usar
+        self.interactive_reserve = interactive_reserve
+        self.connections = ThreadConnections(path)
+        self.connections.get().execute('CREATE TABLE IF NOT EXISTS quota_usage (day TEXT PRIMARY KEY, units INTEGER NOT NULL)')
+
+    @staticmethod
+    def quota_day() -> str:
+        # Horário do Pacífico sem horário de verão: basta para separar os dias de cota
+        return (datetime.now(timezone.utc) - timedelta(hours=8)).strftime('%Y-%m-%d')
+
+    def reserve(self, cost: int, priority: str):
+        limit = self.daily_limit
+        if priority == BACKGROUND:
+            limit = int(limit * (1 - self.interactive_reserve))
+        day = self.quota_day()
+        conn = self.connections.get()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('INSERT OR IGNORE INTO quota_usage (day, units) VALUES (?, 0)', (day,))
+            cursor = conn.execute('UPDATE quota_usage SET units = units + ? WHERE day = ? AND units + ? <= ?',
+                                  (cost, day, cost, limit))
+            if cursor.rowcount == 0:
+                raise QuotaExceeded('YouTube API quota exhausted for today', self._seconds_to_reset())
+
+    def used(self) -> int:
+        row = self.connections.get().execute('SELECT units FROM quota_usage WHERE day = ?',
+                                             (self.quota_day(),)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _seconds_to_reset() -> float:
+        now = datetime.now(timezone.utc) - timedelta(hours=8)
+        midnight = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (midnight - now).total_seconds()
+
+
+class UpstreamScheduler:
+    def __init__(self, rates: Dict[str, float], bursts: Dict[str, float], quota: QuotaLedger,
+                 max_wait: Dict[str, float], background_reserve: float = 1):
+        self.buckets = {name: TokenBucket(rate, bursts.get(name, rate), background_reserve)
+                        for name, rate in rates.items()}
+        self.quota = quota
+        self.max_wait = max_wait
+
+    def acquire(self, endpoint: str, priority: Optional[str] = None):
+        """
+        Block until a call of the endpoint class may go out, charging its quota cost.
+        Raises UpstreamBusy when the wait would exceed the priority's max_wait, and
+        QuotaExceeded when the call does not fit in today's quota.
+        """
+        handle = Priority(priority) if priority else (priority_handle() or Priority(INTERACTIVE))
+        with timed('upstream_wait_seconds', endpoint=endpoint, priority=handle.value, outcome='ok'):
+            self.buckets[endpoint].acquire(handle, self.max_wait[handle.value])
+        cost = QUOTA_COSTS.get(endpoint, 0)
+        if cost:
+            self.quota.reserve(cost, handle.value)
+
+    def promote(self, priority: Priority):
+        """
+        Raise background work to interactive priority, including its calls already waiting.
+        """
+        if priority.value == INTERACTIVE:
+            return
+        priority.promote()
+        for bucket in self.buckets.values():
+            bucket.wake()
+
+    def stats(self) -> Dict:
+        return {
+            'buckets': {name: bucket.stats() for name, bucket in self.buckets.items()},
+            'quota': {'day': self.quota.quota_day(), 'used': self.quota.used(), 'limit': self.quota.daily_limit,
+                      'interactive_reserve': self.quota.interactive_reserve},
+        }
+
+
+def _create_scheduler(config) -> UpstreamScheduler:
+    quota = QuotaLedger(os.path.join(config['SHARED_CACHE_DIR'], 'quota.sqlite3'),
+                        config['DATA_API_DAILY_QUOTA'], config['DATA_API_INTERACTIVE_RESERVE'])
+    return UpstreamScheduler(config['UPSTREAM_RATES'], config['UPSTREAM_BURSTS'], quota,
+                             {INTERACTIVE: config['UPSTREAM_MAX_WAIT'],
+                              BACKGROUND: config['UPSTREAM_BACKGROUND_MAX_WAIT']})
+
+
+_SCHEDULER = AppSingleton(_create_scheduler)
+
+
+def init_scheduler(app) -> UpstreamScheduler:
+    return _SCHEDULER.init(app)
+
+
+def get_scheduler() -> UpstreamScheduler:
+    return _SCHEDULER.get()
@@ -0,0 +1,175 @@
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.services.transcription_correction import (AlignmentCancelled, AlignmentCheckpoint, AlignmentResult,
+                                                   TokenSequence, TranscriptionComparerV4Pro, STATUS_NAMES,
+                                                   WRONG, MISSING)
+from app.services.transcription_service import USER_WORD_RE, normalize_text, build_actual_tokens
+
+# Sessões de validação incremental: o cliente abre uma sessão para um vídeo e depois envia só
+# o texto acrescentado ou editado. O alinhamento é retomado do último ponto estável em vez de
+# recomeçar da primeira palavra. As sessões ficam na memória do processo, então sob gunicorn
+# com vários workers as requisições de uma sessão precisam cair no mesmo worker.
+SESSION_TTL = 30 * 60
+SESSION_LIMIT = 1000
+_SESSIONS = OrderedDict()
+_SESSIONS_LOCK = threading.Lock()
+
+# Caracteres que podem fazer parte de uma palavra em USER_WORD_RE
+_WORD_CHAR = re.compile(r"[\w']")
+
+
+class ValidationSession:
+    def __init__(self, video_id: str, language: str, actual_transcript: str, timestamps: List[float], artifact=None):
+        self.session_id = uuid.uuid4().hex
+        self.video_id = video_id
+        self.language = language
+        self.actual = artifact if artifact is not None else build_actual_tokens(actual_transcript, timestamps)
+        self.comparer = TranscriptionComparerV4Pro()
+        self.user_text = ''
+        self.user = TokenSequence([], [], scope={})
+        self.token_starts: List[int] = []
+        # result guarda o alinhamento até onde o walk parou; as palavras do usuário a partir de
+        # tail_from sobraram ('wrong') e as da transcrição a partir de missing_from faltam
+        self.result = AlignmentResult()
+        self.tail_from = 0
+        self.missing_from = 0
+        self.checkpoints: List[AlignmentCheckpoint] = []
+        # Uma atualização cancelada não chegou ao cliente: a próxima responde a partir de
+        # resync_from, o início do que ela mudou, em vez de comparar com o estado da sessão
+        self.resync_from: Optional[int] = None
+        self.lock = threading.Lock()
+        # Evento da atualização mais recente; uma nova cancela a anterior, que o cliente descarta
+        self.latest: Optional[threading.Event] = None
+        self.latest_lock = threading.Lock()
+        self.last_access = time.time()
+
+    def update(self, text: str, offset: Optional[int] = None) -> Dict:
+        """
+        Replace user_text[offset:] with text (append when offset is omitted) and realign.
+        Returns the changes: the client keeps its results[:from] and replaces the rest with
+        results; words of the actual transcript from missing_from on are still missing.
+        Raises AlignmentCancelled when a newer update arrives first: its text is kept (the
+        client counts offsets on it) and the newer answer covers both.
+        """
+        cancel = threading.Event()
+        with self.latest_lock:
+            if self.latest is not None:
+                self.latest.set()
+            self.latest = cancel
+        with self.lock:
+            self.last_access = time.time()
+            if offset is None:
+                offset = len(self.user_text)
+            if not 0 <= offset <= len(self.user_text):
+                raise ValueError('Offset is outside the current transcription')
+            self.user_text = self.user_text[:offset] + text
+
+            # Uma palavra nunca atravessa um caractere fora de [\w'], então basta refazer os
+            # tokens a partir do início da sequência de caracteres que contém offset
+            restart = offset
+            while restart > 0 and _WORD_CHAR.match(self.user_text[restart - 1]):
+                restart -= 1
+            edited = bisect_left(self.token_starts, restart)
+            old_user_len = len(self.user)
+            old_texts = self.user.texts[edited:]
+            self.user.truncate(edited)
+            del self.token_starts[edited:]
+            for match in USER_WORD_RE.finditer(self.user_text, restart):
+                self.token_starts.append(match.start())
+                self.user.append(match.group(), normalize_text(match.group()))
+
+            # Último checkpoint cujos passos anteriores não leram nada a partir da palavra editada
+            start = None
+            if self.checkpoints:
+                idx = len(self.checkpoints) - 1
+                while self.checkpoints[idx].horizon > edited:
+                    idx -= 1
+                start = self.checkpoints[idx]
+                del self.checkpoints[idx:]
+            stable_len = start.result_len if start else 0
+
+            if self.resync_from is None:
+                report_from = stable_len
+
+                def user_text_at(idx):
+                    return self.user.texts[idx] if idx < edited else old_texts[idx - edited]
+                previous = self._entries(stable_len, self.tail_from, old_user_len, user_text_at)
+            else:
+                report_from = min(stable_len, self.resync_from)
+                previous = []
+
+            self.result.truncate(stable_len)
+            try:
+                user_idx, actual_idx = self.comparer.align(self.user, self.actual, self.result, start=start,
+                                                           checkpoints=self.checkpoints, cancel=cancel)
+            except AlignmentCancelled:
+                self.resync_from = report_from
+                raise
+            self.resync_from = None
+            self.tail_from = user_idx
+            self.missing_from = actual_idx
+
+            current = self._entries(report_from, self.tail_from, len(self.user), self.user.texts.__getitem__)
+            unchanged = 0
+            while unchanged < len(previous) and unchanged < len(current) and previous[unchanged] == current[unchanged]:
+                unchanged += 1
+
+            return {
+                'session_id': self.session_id,
+                'from': report_from + unchanged,
+                'results': [{'text': text, 'type': STATUS_NAMES[status]} for status, text in current[unchanged:]],
+                'missing_from': self.missing_from,
+                'total_results': len(self.result) + len(self.user) - self.tail_from,
+            }
+
+    def _entries(self, start: int, tail_from: int, user_len: int, user_text_at) -> List[Tuple[int, str]]:
+        # (status, texto) de result[start:] seguido da cauda de palavras do usuário que sobraram
+        entries = []
+        for status, idx in zip(self.result.statuses[start:], self.result.indexes[start:]):
+            entries.append((status, self.actual.texts[idx] if status == MISSING else user_text_at(idx)))
+        for idx in range(tail_from, user_len):
+            entries.append((WRONG, user_text_at(idx)))
+        return entries
+
+
+def create_session(video_id: str, language: str, actual_transcript: str, timestamps: List[float], artifact=None) -> ValidationSession:
+    session = ValidationSession(video_id, language, actual_transcript, timestamps, artifact)
+    with _SESSIONS_LOCK:
+        _expire_sessions()
+        _SESSIONS[session.session_id] = session
+        while len(_SESSIONS) > SESSION_LIMIT:
+            _SESSIONS.popitem(last=False)
+    return session
+
+
+def get_session(session_id: str) -> Optional[ValidationSession]:
+    with _SESSIONS_LOCK:
+        session = _SESSIONS.get(session_id)
+        if session is None:
+            return None
+        if time.time() - session.last_access > SESSION_TTL:
+            del _SESSIONS[session_id]
+            return None
+        _SESSIONS.move_to_end(session_id)
+        return session
+
+
+def close_session(session_id: str) -> bool:
+    with _SESSIONS_LOCK:
+        return _SESSIONS.pop(session_id, None) is not None
+
+
+def _expire_sessions():
+    # Mais antigas primeiro: para no primeiro que ainda está dentro do TTL
+    now = time.time()
+    while _SESSIONS:
+        session_id, session = next(iter(_SESSIONS.items()))
+        if now - session.last_access <= SESSION_TTL:
+            break
+        del _SESSIONS[session_id]
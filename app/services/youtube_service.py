@@ -1,47 +1,145 @@
+import contextvars
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import httplib2
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from flask import current_app
 import requests
+from requests.adapters import HTTPAdapter
 import youtube_transcript_api._api
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
+from youtube_transcript_api import (YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound,
+                                    NoTranscriptAvailable, VideoUnavailable)
 import json
+from app.services.transcript_artifacts import build_transcript_artifact, artifact_from_cache_data
+from app.services.transcript_store import get_store
+from app.services.upstream_scheduler import get_scheduler, background_priority, UpstreamBusy
+from app.services.proxy_pool import get_proxy_pool
+from app.services.metrics import timed
 
-# Configuração do proxy Decodo
-proxy_host = 'gate.decodo.com:10001'
-proxy_user = 'spxue5efd5'
-proxy_pass = 'zaPhlkz9_d9Z4P4xoH'
+# Monkey patch para forçar o uso do pool de proxies (PROXY_URLS) em todas as requisições do requests
+original_request = requests.Session.request
 
-proxies = {
-    'http': f'http://{proxy_user}:{proxy_pass}@{proxy_host}',
-    'https': f'http://{proxy_user}:{proxy_pass}@{proxy_host}',
-}
+# Tempo máximo de cada requisição HTTP (a youtube_transcript_api não define nenhum)
+REQUEST_TIMEOUT = 10
 
-# Monkey patch para forçar o uso do proxy em todas as requisições do requests
-original_request = requests.Session.request
+# Pool de conexões do processo. A youtube_transcript_api abre e fecha uma Session por chamada,
+# o que jogava fora a conexão (e o handshake TLS e do proxy) a cada busca. Todas as Sessions
+# passam a usar o mesmo adapter, que mantém as conexões abertas entre uma Session e outra.
+HTTP_POOL_CONNECTIONS = 8   # pools por host/proxy
+HTTP_POOL_MAXSIZE = 32      # conexões mantidas por host, ~ threads que fazem requisições ao mesmo tempo
+
+class SharedHTTPAdapter(HTTPAdapter):
+    def close(self):
+        # Session.close() fecha os adapters montados; o compartilhado continua aberto
+        pass
+
+_SHARED_ADAPTER = SharedHTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
 
 def proxied_request(self, method, url, *args, **kwargs):
-    kwargs['proxies'] = proxies
-    return original_request(self, method, url, *args, **kwargs)
+    if self.adapters.get('https://') is not _SHARED_ADAPTER:
+        self.mount('https://', _SHARED_ADAPTER)
+        self.mount('http://', _SHARED_ADAPTER)
+    kwargs.setdefault('timeout', REQUEST_TIMEOUT)
+    get_scheduler().acquire('proxy')
+    # Proxy escolhido pelo pool a cada tentativa; GETs podem ganhar uma segunda tentativa por outro proxy
+    return get_proxy_pool().request(
+        lambda proxy: original_request(self, method, url, *args, **dict(kwargs, proxies=proxy.proxies)),
+        hedge=method.upper() in ('GET', 'HEAD'))
 
 requests.Session.request = proxied_request
 
+# Tipos de falha na busca de transcrições, cada um com seu TTL em NEGATIVE_CACHE_TTLS
+FAILURE_DISABLED = 'disabled'                    # vídeo sem legendas ou indisponível
+FAILURE_NO_LANGUAGE_MATCH = 'no_language_match'  # há legendas, mas em nenhum idioma aceito
+FAILURE_UPSTREAM_ERROR = 'upstream_error'        # YouTube ou proxy falharam antes de responder
+
+# Sondagem de idiomas quando a listagem de faixas falha: pool compartilhado e limitado, para que
+# muitas buscas simultâneas não abram threads sem limite contra o proxy
+PROBE_WORKERS = 4
+PROBE_TIMEOUT = 15
+_PROBE_POOL = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix='transcript-probe')
+
+# Um cliente da Data API por thread: o httplib2.Http por trás dele não é thread-safe, mas
+# reaproveita a conexão com googleapis.com entre as chamadas da mesma thread
+_YOUTUBE_CLIENTS = threading.local()
+
 def get_youtube_client():
     api_key = current_app.config['YOUTUBE_API_KEY']
-    current_app.logger.info(f"[DEBUG] YOUTUBE_API_KEY: {str(api_key)[:6]}... (len={len(str(api_key)) if api_key else 0})")
-    return build('youtube', 'v3', developerKey=api_key)
+    client = getattr(_YOUTUBE_CLIENTS, 'client', None)
+    if client is None or _YOUTUBE_CLIENTS.api_key != api_key:
+        current_app.logger.info(f"[DEBUG] YOUTUBE_API_KEY: {str(api_key)[:6]}... (len={len(str(api_key)) if api_key else 0})")
+        # Documento de discovery embutido na biblioteca, sem buscar nem gravar cache de discovery
+        http = None
+        if current_app.config.get('DATA_API_USE_PROXY'):
+            # O googleapiclient usa httplib2, que não passa pelo patch do requests acima
+            proxy = get_proxy_pool().preferred()
+            if proxy.proxies:
+                http = httplib2.Http(proxy_info=httplib2.proxy_info_from_url(proxy.url), timeout=REQUEST_TIMEOUT)
+        client = build('youtube', 'v3', developerKey=api_key, static_discovery=True, cache_discovery=False,
+                       http=http)
+        _YOUTUBE_CLIENTS.client = client
+        _YOUTUBE_CLIENTS.api_key = api_key
+    return client
+
+# Buscas em cache: frescas por SEARCH_CACHE_TTL; depois disso, por até SEARCH_CACHE_STALE_TTL,
+# a resposta antiga é servida na hora enquanto uma thread em segundo plano a renova
+_SEARCH_REFRESH_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='search-refresh')
+_SEARCH_REFRESHING = set()
+_SEARCH_REFRESHING_LOCK = threading.Lock()
+
+# Máximo de IDs por chamada de videos.list
+VIDEOS_LIST_BATCH = 50
+
+def normalize_query(query):
+    return ' '.join(query.lower().split())
 
 def search_videos(query, max_results=10):
+    query = normalize_query(query)
+    cached = get_store().get_search(query, max_results)
+    if cached is not None:
+        age = time.time() - cached['fetched_at']
+        if age < current_app.config['SEARCH_CACHE_TTL']:
+            return cached['results']
+        if age < current_app.config['SEARCH_CACHE_TTL'] + current_app.config['SEARCH_CACHE_STALE_TTL']:
+            _schedule_search_refresh(query, max_results)
+            return cached['results']
+    return _fetch_search(query, max_results)
+
+def _schedule_search_refresh(query, max_results):
+    key = (query, max_results)
+    with _SEARCH_REFRESHING_LOCK:
+        if key in _SEARCH_REFRESHING:
+            return
+        _SEARCH_REFRESHING.add(key)
+    app = current_app._get_current_object()
+
+    def refresh():
+        try:
+            with app.app_context(), background_priority():
+                _fetch_search(query, max_results)
+        except Exception as e:
+            app.logger.warning(f"Search refresh failed for '{query}': {str(e)}")
+        finally:
+            with _SEARCH_REFRESHING_LOCK:
+                _SEARCH_REFRESHING.discard(key)
+    _SEARCH_REFRESH_POOL.submit(refresh)
+
+def _fetch_search(query, max_results):
     youtube = get_youtube_client()
     
     try:
-        search_response = youtube.search().list(
-            q=query,
-            part='snippet',
-            maxResults=max_results,
-            type='video'
-        ).execute()
+        get_scheduler().acquire('search')
+        with timed('upstream_request_seconds', method='search.list', outcome='ok'):
+            search_response = youtube.search().list(
+                q=query,
+                part='snippet',
+                maxResults=max_results,
+                type='video'
+            ).execute()
         
         videos = []
         for item in search_response.get('items', []):
@@ -53,56 +151,68 @@ def search_videos(query, max_results=10):
                 'published_at': item['snippet']['publishedAt']
             }
             videos.append(video_data)
-            
+        
+        get_store().put_search(query, max_results, videos,
+                               max_age=current_app.config['SEARCH_CACHE_TTL'] + current_app.config['SEARCH_CACHE_STALE_TTL'])
         return videos
     except HttpError as e:
         current_app.logger.error(f"[DEBUG] YouTube API error: {str(e)} | content: {getattr(e, 'content', None)}")
         raise Exception("Failed to search for videos")
 
 def get_video_details(video_id):
-    cache_dir = 'video_details_cache'
-    os.makedirs(cache_dir, exist_ok=True)
-    cache_file = os.path.join(cache_dir, f"{video_id}.json")
+    video_data = get_videos_details([video_id]).get(video_id)
+    if video_data is None:
+        raise Exception("Video not found")
+    return video_data
 
-    # Tenta carregar do cache primeiro
-    if os.path.exists(cache_file):
-        with open(cache_file, 'r', encoding='utf-8') as f:
-            cached_data = json.load(f)
-            return cached_data
+def get_videos_details(video_ids):
+    """
+    Details of several videos, keyed by video ID. Stored details are read in one query and the
+    rest are fetched with one videos.list call per VIDEOS_LIST_BATCH IDs and stored together.
+    IDs that YouTube does not know are left out.
+    """
+    video_ids = list(dict.fromkeys(video_ids))
+    # Tenta carregar do armazenamento primeiro
+    details = get_store().get_video_details_many(video_ids)
+    missing = [video_id for video_id in video_ids if video_id not in details]
+    if not missing:
+        return details
 
     youtube = get_youtube_client()
 
     try:
-        video_response = youtube.videos().list(
-            part='snippet,contentDetails',
-            id=video_id
-        ).execute()
-
-        if not video_response.get('items'):
-            raise Exception("Video not found")
-
-        video = video_response['items'][0]
+        fetched = {}
+        for start in range(0, len(missing), VIDEOS_LIST_BATCH):
+            get_scheduler().acquire('videos')
+            with timed('upstream_request_seconds', method='videos.list', outcome='ok'):
+                video_response = youtube.videos().list(
+                    part='snippet,contentDetails',
+                    id=','.join(missing[start:start + VIDEOS_LIST_BATCH]),
+                    maxResults=VIDEOS_LIST_BATCH
+                ).execute()
 
-        video_data = {
-            'video_id': video_id,
-            'title': video['snippet']['title'],
-            'channel': video['snippet']['channelTitle'],
-            'description': video['snippet']['description'],
-            'embed_url': f"https://www.youtube.com/embed/{video_id}",
-            'duration': video['contentDetails']['duration']
-        }
+            for video in video_response.get('items', []):
+                video_id = video['id']
+                fetched[video_id] = {
+                    'video_id': video_id,
+                    'title': video['snippet']['title'],
+                    'channel': video['snippet']['channelTitle'],
+                    'description': video['snippet']['description'],
+                    'embed_url': f"https://www.youtube.com/embed/{video_id}",
+                    'duration': video['contentDetails']['duration']
+                }
 
-        # Salva no cache
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(video_data, f)
-
-        return video_data
+        # Salva no armazenamento
+        if fetched:
+            get_store().put_video_details_many(fetched)
+        details.update(fetched)
+        return details
 
     except HttpError as e:
         current_app.logger.error(f"YouTube API error: {str(e)}")
         raise Exception("Failed to get video details")
 
-def get_video_transcript(video_id, language_preference='en', debug_mode=True):
+def get_video_transcript(video_id, language_preference='en', debug_mode=None, detailed=False):
     """
     Get video transcript using the YouTube Transcript API.
     Returns a tuple of (text, timestamps) where timestamps is a list of start times for each word.
@@ -110,8 +220,76 @@ def get_video_transcript(video_id, language_preference='en', debug_mode=True):
     Args:
         video_id (str): YouTube video ID
         language_preference (str): Preferred language for the transcript ('en', 'es', etc.)
-        debug_mode (bool): If True, logs detailed debug information
+        debug_mode (bool): If True, logs detailed debug information (default: TRANSCRIPT_DEBUG_LOG)
+        detailed (bool): If True, returns (text, timestamps, artifact, failure, failure_ttl) where
+            artifact is the pre-tokenized TranscriptArtifact (None when nothing was found), failure
+            is None on success or one of the FAILURE_* kinds, with text holding the message for
+            the user, and failure_ttl is the seconds left of a failure read from the store (None
+            for a new one)
+    """
+    if debug_mode is None:
+        debug_mode = current_app.config.get('TRANSCRIPT_DEBUG_LOG', False)
+    transcript, timestamps, artifact, failure, failure_ttl = _get_video_transcript(video_id, language_preference, debug_mode)
+    if detailed:
+        return transcript, timestamps, artifact, failure, failure_ttl
+    return transcript, timestamps
+
+def rank_transcripts(available_transcripts, languages_to_try):
+    """
+    Tracks of a TranscriptList in preference order: for each language code (a trailing '*'
+    matches any variant), manually created tracks before generated ones. Empty codes are skipped.
+    """
+    ranked = []
+    for lang_code in languages_to_try:
+        if not lang_code:  # Pula string vazia
+            continue
+        has_wildcard = '*' in lang_code
+        for transcript in available_transcripts:
+            current_lang = transcript.language_code
+            # Verifica se é o idioma exato ou se corresponde a um padrão com wildcard
+            if current_lang == lang_code or (has_wildcard and current_lang.startswith(lang_code.replace('*', ''))):
+                if transcript not in ranked:
+                    ranked.append(transcript)
+    return ranked
+
+def probe_transcript_languages(video_id, languages, on_error=None, timeout=PROBE_TIMEOUT):
+    """
+    Fetch the transcript of each language concurrently on the shared probe pool; an empty
+    code takes the first track the video lists, whatever its language.
+    Returns (track language, transcript_data) for the best-ranked language that succeeds within
+    timeout seconds, or None. on_error(language, error) is called for the failed attempts
+    ranked above the winner; attempts still queued are cancelled.
     """
+    # Cada tentativa roda numa cópia do contexto, para herdar a prioridade de quem chamou
+    futures = [_PROBE_POOL.submit(contextvars.copy_context().run, _probe_language, video_id, lang)
+               for lang in languages]
+    deadline = time.monotonic() + timeout
+    try:
+        for lang, future in zip(languages, futures):
+            try:
+                return future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                if on_error:
+                    on_error(lang, TimeoutError(f"No response within {timeout}s"))
+            except Exception as e:
+                if on_error:
+                    on_error(lang, e)
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _probe_language(video_id, lang):
+    with timed('upstream_request_seconds', method='get_transcript', outcome='ok'):
+        if lang:
+            return lang, YouTubeTranscriptApi.get_transcript(video_id, languages=[lang])
+        # Padrão automático: a primeira faixa listada (as manuais vêm antes das geradas);
+        # sem nenhuma, find_transcript levanta NoTranscriptFound
+        transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+        transcript = transcripts.find_transcript([t.language_code for t in transcripts])
+        return transcript.language_code, transcript.fetch()
+
+def _get_video_transcript(video_id, language_preference, debug_mode):
     import re
     import sys
     import os
@@ -147,28 +325,58 @@ def get_video_transcript(video_id, language_preference='en', debug_mode=True):
     
     log_debug(f">>> INICIANDO BUSCA DE TRANSCRIÇÃO PARA VÍDEO {video_id} (Idioma preferido: {language_preference}) <<<")
     
-    # VERIFICAÇÃO DE TRANSCRIÇÃO ARMAZENADA EM CACHE
-    # Isso permite criar um sistema de cache de transcrições para desenvolvedores
+    # VERIFICAÇÃO DE TRANSCRIÇÃO ARMAZENADA
+    # Procura a transcrição do idioma pedido e, se não houver, a genérica do vídeo
     try:
-        cache_dir = 'transcript_cache'
-        os.makedirs(cache_dir, exist_ok=True)
-        cache_file = os.path.join(cache_dir, f"{video_id}_{language_preference}.json")
-        
-        if os.path.exists(cache_file):
-            log_debug(f"Cache encontrado para {video_id} no idioma {language_preference}")
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache_data = json.load(f)
-                return cache_data['transcript'], cache_data['timestamps']
-        else:
-            # Tenta cache genérico se não encontrar específico do idioma
-            generic_cache_file = os.path.join(cache_dir, f"{video_id}.json")
-            if os.path.exists(generic_cache_file):
-                log_debug(f"Cache genérico encontrado para {video_id}")
-                with open(generic_cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                    return cache_data['transcript'], cache_data['timestamps']
+        cache_data = get_store().get_transcript(video_id, language_preference)
+        if cache_data is not None:
+            log_debug(f"Transcrição armazenada encontrada para {video_id} (idioma: {cache_data['language']})")
+            return cache_data['transcript'], cache_data['timestamps'], artifact_from_cache_data(cache_data), None, None
+        failure = get_store().get_failure(video_id, language_preference)
+        if failure is not None:
+            log_debug(f"Falha armazenada para {video_id} (tipo: {failure['kind']})")
+            # Só o que resta da validade gravada, para o cache não renovar a falha
+            return failure['message'], [], None, failure['kind'], failure['expires_at'] - time.time()
     except Exception as e:
-        log_debug(f"Erro ao verificar cache: {str(e)}")
+        log_debug(f"Erro ao verificar armazenamento: {str(e)}")
+
+    def save_transcript(transcript_text, timestamps, artifact, track_language):
+        # Armazena para uso futuro
+        try:
+            get_store().put_transcript(video_id, language_preference, transcript_text, timestamps,
+                                       artifact.normalized if artifact else None, track_language)
+            log_debug(f"Transcrição armazenada (idioma: {track_language})")
+        except Exception as store_err:
+            log_debug(f"Não foi possível armazenar a transcrição: {str(store_err)}")
+
+    # Respostas que já dizem por que não há transcrição; sem nenhuma delas a falha é do YouTube/proxy
+    failure_evidence = set()
+
+    def record_failure(error):
+        if isinstance(error, (TranscriptsDisabled, NoTranscriptAvailable, VideoUnavailable)):
+            failure_evidence.add(FAILURE_DISABLED)
+        elif isinstance(error, NoTranscriptFound):
+            failure_evidence.add(FAILURE_NO_LANGUAGE_MATCH)
+        elif isinstance(error, UpstreamBusy):
+            # Sem ficha para o proxy as outras tentativas também esperariam, e a consulta à Data API
+            # que escolhe a mensagem gastaria cota: desiste e o chamador responde 503 com Retry-After
+            raise error
+
+    def fail(message):
+        if FAILURE_DISABLED in failure_evidence:
+            kind = FAILURE_DISABLED
+        elif FAILURE_NO_LANGUAGE_MATCH in failure_evidence:
+            kind = FAILURE_NO_LANGUAGE_MATCH
+        else:
+            kind = FAILURE_UPSTREAM_ERROR
+        log_debug(f"Falha do tipo {kind}")
+        try:
+            ttl = current_app.config['NEGATIVE_CACHE_TTLS'].get(kind)
+            if ttl:
+                get_store().put_failure(video_id, language_preference, kind, message, ttl)
+        except Exception as store_err:
+            log_debug(f"Não foi possível armazenar a falha: {str(store_err)}")
+        return message, [], None, kind, None
     
     # MÉTODO TEMPORÁRIO: SOLUCÃO DE COMPATIBILIDADE PARA PRODUÇÃO
     # Este método permite uso temporário mesmo quando não é possível obter transcrições
@@ -184,24 +392,86 @@ def get_video_transcript(video_id, language_preference='en', debug_mode=True):
         dummy_transcript = "This is a dummy transcript for demonstration purposes. This allows users to practice transcription while technical issues are resolved. You can type this sentence to test the system functionality. Hopefully the real transcript functionality will be restored soon."
         dummy_timestamps = [i * 2 for i in range(len(dummy_transcript.split()))]
         
-        return dummy_transcript, dummy_timestamps
+        return dummy_transcript, dummy_timestamps, build_transcript_artifact(dummy_transcript, dummy_timestamps), None, None
+    
+    # MÉTODO PRINCIPAL: uma única listagem das faixas decide qual transcrição buscar
+    # Define a ordem de preferência de idiomas baseada na escolha do usuário
+    if language_preference == 'en':
+        languages_to_try = ['en', 'en-US', 'en-GB', 'en-CA', 'en-AU', '', 'en-IN', 'en-IE']
+    elif language_preference == 'es':
+        languages_to_try = ['es', 'es-ES', 'es-MX', 'es-AR', 'es-CO', '', 'es-US', 'es-CL']
+    else:
+        # Caso outros idiomas sejam adicionados no futuro, formato padrão
+        languages_to_try = [language_preference, f"{language_preference}-*", '']
+    
+    log_debug(f"Ordem de preferência de idiomas: {languages_to_try}")
+    
+    try:
+        with timed('upstream_request_seconds', method='list_transcripts', outcome='ok'):
+            available_transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
+        log_debug(f"Transcrições disponíveis: {[t.language_code for t in available_transcripts]}")
+        listed = True
+    except Exception as e:
+        log_debug(f"Falha ao listar transcrições disponíveis: {str(e)}")
+        record_failure(e)
+        listed = False
+    
+    if listed:
+        candidates = rank_transcripts(available_transcripts, languages_to_try)
+        if not candidates:
+            log_debug("Nenhuma transcrição no idioma preferido encontrada")
+            failure_evidence.add(FAILURE_NO_LANGUAGE_MATCH)
+        # A melhor faixa primeiro; a seguinte só se o download desta falhar
+        for transcript in candidates:
+            current_lang = transcript.language_code
+            try:
+                log_debug(f"Encontrada transcrição no idioma preferido: {current_lang}")
+                with timed('upstream_request_seconds', method='fetch_transcript', outcome='ok'):
+                    transcript_data = transcript.fetch()
+                transcript_text, timestamps = process_transcript(transcript_data)
+                artifact = build_transcript_artifact(transcript_text, timestamps)
+                save_transcript(transcript_text, timestamps, artifact, current_lang)
+                return transcript_text, timestamps, artifact, None, None
+            except Exception as e:
+                log_debug(f"Falha ao baixar a transcrição {current_lang}: {str(e)}")
+                record_failure(e)
+    elif not failure_evidence:
+        # A listagem falhou sem dizer que não há legendas: sonda os idiomas em paralelo.
+        # Curingas só fazem sentido com a listagem e ficam de fora; o vazio (padrão automático,
+        # qualquer faixa) é a última opção, depois de todos os idiomas pedidos
+        def log_probe_error(lang, error):
+            log_debug(f"Falha com idioma {lang or 'padrão automático'}: {str(error)}")
+            record_failure(error)
+        probe_languages = [lang for lang in languages_to_try if lang and '*' not in lang]
+        if '' in languages_to_try:
+            probe_languages.append('')
+        probed = probe_transcript_languages(video_id, probe_languages, on_error=log_probe_error)
+        if probed is not None:
+            lang, transcript_data = probed
+            log_debug(f"Sucesso com idioma {lang}")
+            transcript_text, timestamps = process_transcript(transcript_data)
+            artifact = build_transcript_artifact(transcript_text, timestamps)
+            save_transcript(transcript_text, timestamps, artifact, lang)
+            return transcript_text, timestamps, artifact, None, None
     
     # MÉTODO 0: YouTube Data API direta sem depender de bibliotecas externas
+    # Só usado para escolher a mensagem de erro, então roda apenas depois que tudo falhou
     try:
         log_debug("Método 0: Tentando API direta do YouTube")
         youtube = get_youtube_client()
         
         # Solicitar as legendas através da API V3 do YouTube
-        captions_response = youtube.captions().list(
-            part="snippet",
-            videoId=video_id
-        ).execute()
+        get_scheduler().acquire('captions')
+        with timed('upstream_request_seconds', method='captions.list', outcome='ok'):
+            captions_response = youtube.captions().list(
+                part="snippet",
+                videoId=video_id
+            ).execute()
         
         # Se encontrou legendas, sabemos que elas existem
         if 'items' in captions_response and captions_response['items']:
             log_debug(f"Método 0: {len(captions_response['items'])} legendas encontradas via API")
             has_captions = True
-            # Mas não continuamos aqui, prosseguimos para outros métodos
         else:
             log_debug("Método 0: Nenhuma legenda encontrada via API")
             has_captions = False
@@ -209,123 +479,27 @@ def get_video_transcript(video_id, language_preference='en', debug_mode=True):
         log_debug(f"Método 0 falhou: {str(e)}")
         has_captions = None  # Não sabemos
     
-    # MÉTODO SIMPLIFICADO PARA PRODUÇÃO
-    # Este é um método mais simplificado que tenta apenas o essencial
-    # Pode ter melhor compatibilidade com ambientes restritos
-    try:
-        log_debug("Método simplificado para produção")
-        
-        # Define a ordem de preferência de idiomas baseada na escolha do usuário
-        if language_preference == 'en':
-            languages_to_try = ['en', 'en-US', 'en-GB', 'en-CA', 'en-AU', '', 'en-IN', 'en-IE']
-        elif language_preference == 'es':
-            languages_to_try = ['es', 'es-ES', 'es-MX', 'es-AR', 'es-CO', '', 'es-US', 'es-CL']
-        else:
-            # Caso outros idiomas sejam adicionados no futuro, formato padrão
-            languages_to_try = [language_preference, f"{language_preference}-*", '']
-        
-        log_debug(f"Ordem de preferência de idiomas: {languages_to_try}")
-        
-        transcript_results = {}
-        found_preferred_language = False
-        
-        # Primeiro tenta obter todas as transcrições disponíveis
-        try:
-            available_transcripts = YouTubeTranscriptApi.list_transcripts(video_id)
-            log_debug(f"Transcrições disponíveis: {[t.language_code for t in available_transcripts]}")
-            
-            # Procura por uma transcrição no idioma preferido ou próximo
-            for lang_code in languages_to_try:
-                if not lang_code:  # Pula string vazia
-                    continue
-                    
-                has_wildcard = '*' in lang_code
-                for transcript in available_transcripts:
-                    current_lang = transcript.language_code
-                    
-                    # Verifica se é o idioma exato ou se corresponde a um padrão com wildcard
-                    if current_lang == lang_code or (has_wildcard and current_lang.startswith(lang_code.replace('*', ''))):
-                        log_debug(f"Encontrada transcrição no idioma preferido: {current_lang}")
-                        transcript_data = transcript.fetch()
-                        transcript_text, timestamps = process_transcript(transcript_data)
-                        
-                        # Armazena em cache para uso futuro
-                        try:
-                            cache_data = {
-                                'transcript': transcript_text,
-                                'timestamps': timestamps,
-                                'language': current_lang
-                            }
-                            with open(cache_file, 'w', encoding='utf-8') as f:
-                                json.dump(cache_data, f)
-                            log_debug(f"Transcrição armazenada em cache (idioma: {current_lang})")
-                        except Exception as cache_err:
-                            log_debug(f"Não foi possível armazenar em cache: {str(cache_err)}")
-                        
-                        return transcript_text, timestamps
-            
-            # Se nenhum idioma preferido foi encontrado, prossiga com o método antigo
-            log_debug("Nenhuma transcrição no idioma preferido encontrada")
-            
-        except Exception as e:
-            log_debug(f"Falha ao listar transcrições disponíveis: {str(e)}")
-        
-        # Tenta o método antigo como fallback
-        for lang in languages_to_try:
-            try:
-                if not lang:  # String vazia será tratada como padrão automático
-                    lang_param = None
-                    log_debug("Tentando idioma: padrão automático")
-                else:
-                    lang_param = [lang]
-                    log_debug(f"Tentando idioma: {lang}")
-                
-                transcript_data = YouTubeTranscriptApi.get_transcript(
-                    video_id, 
-                    languages=lang_param
-                )
-                
-                transcript_text, timestamps = process_transcript(transcript_data)
-                log_debug(f"Sucesso com idioma {lang if lang else 'default'}")
-                
-                # Armazena em cache para uso futuro em desenvolvimento
-                try:
-                    cache_data = {
-                        'transcript': transcript_text,
-                        'timestamps': timestamps,
-                        'language': lang if lang else 'default'
-                    }
-                    with open(cache_file, 'w', encoding='utf-8') as f:
-                        json.dump(cache_data, f)
-                    log_debug("Transcrição armazenada em cache")
-                except Exception as cache_err:
-                    log_debug(f"Não foi possível armazenar em cache: {str(cache_err)}")
-                
-                return transcript_text, timestamps
-            except Exception as e:
-                log_debug(f"Falha com idioma {lang if lang else 'default'}: {str(e)}")
-    except Exception as e:
-        log_debug(f"Método simplificado falhou: {str(e)}")
-    
     # Se chegamos aqui e sabemos que há legendas (via API), informamos isso
     if has_captions:
         log_debug("Legendas existem, mas não conseguimos extrair")
         # Tenta criar uma transcrição fictícia baseada no título do vídeo
         try:
             youtube = get_youtube_client()
-            video_response = youtube.videos().list(
-                part='snippet',
-                id=video_id
-            ).execute()
+            get_scheduler().acquire('videos')
+            with timed('upstream_request_seconds', method='videos.list', outcome='ok'):
+                video_response = youtube.videos().list(
+                    part='snippet',
+                    id=video_id
+                ).execute()
             
             if 'items' in video_response and video_response['items']:
                 title = video_response['items'][0]['snippet']['title']
                 log_debug(f"Título do vídeo: {title}")
-                return f"This video has captions, but they could not be retrieved. Video title: {title}", []
+                return fail(f"This video has captions, but they could not be retrieved. Video title: {title}")
         except:
             pass
         
-        return "This video has captions available, but they could not be retrieved. Please try a different video or access it directly on YouTube.", []
+        return fail("This video has captions available, but they could not be retrieved. Please try a different video or access it directly on YouTube.")
     
     # Informações de depuração para o ambiente de produção
     if debug_mode:
@@ -339,4 +513,4 @@ def get_video_transcript(video_id, language_preference='en', debug_mode=True):
     
     # Se tudo falhar, retorne uma mensagem clara
     log_debug("TODOS OS MÉTODOS FALHARAM")
-    return "No transcript is available for this video. Please try a different video with captions.", []
+    return fail("No transcript is available for this video. Please try a different video with captions.")
@@ -0,0 +1,298 @@
+"""
+Benchmark for the transcription comparers (align_transcription with a cached artifact, as the
+validation route runs it).
+
+Actual transcripts are the ones in transcript_cache/ plus synthetic ones of the requested
+lengths, stitched from slices of the real transcripts. User inputs come from error profiles
+(perfect, typos, skipped, junk, reordered, variants) and from adversarial inputs aimed at the
+worst cases of realign_with_dubles and fill_field_gaps. For every case it reports calls/s,
+words/s, p50/p99 per call and peak traced memory of one call.
+
+Run from the repository root:
+    python -m benchmarks.comparer
+    python -m benchmarks.comparer --lengths 1000 5000 --output before.json
+    python -m benchmarks.comparer --output after.json --baseline before.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from app.services.transcript_artifacts import build_transcript_artifact
+from app.services.transcription_equivalents import ABBREVIATION_EQUIVALENTS, NUMBERS_EQUIVALENTS
+from app.services.transcription_service import ALIGNMENT_MODES, align_transcription
+
+
+def load_transcripts():
+    transcripts = {}
+    for path in sorted(glob.glob('transcript_cache/*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        name = os.path.splitext(os.path.basename(path))[0]
+        words = data['transcript'].split()[:len(data['timestamps'])]
+        transcripts[name] = (words, data['timestamps'][:len(words)])
+    return transcripts
+
+
+def synthetic_transcript(sources, length, rng):
+    # Trechos de 20 a 80 palavras das transcrições reais, na ordem em que forem sorteados
+    pool = [words for words, _ in sources.values() if words]
+    words = []
+    while len(words) < length:
+        source = rng.choice(pool)
+        start = rng.randrange(len(source))
+        words.extend(source[start:start + rng.randint(20, 80)])
+    words = words[:length]
+    return words, [i * 0.4 for i in range(len(words))]
+
+
+def _typo(word, rng):
+    if len(word) < 3:
+        return word + rng.choice(string.ascii_lowercase)
+    pos = rng.randrange(len(word) - 1)
+    edit = rng.randrange(3)
+    if edit == 0:  # troca
+        return word[:pos] + rng.choice(string.ascii_lowercase) + word[pos + 1:]
+    if edit == 1:  # apaga
+        return word[:pos] + word[pos + 1:]
+    return word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]  # inverte
+
+
+def _junk_word(rng):
+    return ''.join(rng.choice('qxzjkvw') for _ in range(rng.randint(4, 8)))
+
+
+def _variant_table():
+    # forma em minúsculas (uma ou duas palavras) -> forma equivalente a digitar
+    table = {}
+    for forms in list(ABBREVIATION_EQUIVALENTS.values()) + list(NUMBERS_EQUIVALENTS.values()):
+        if len(forms) == 2 and forms[0].lower() != forms[1].lower():
+            table[forms[0].lower()] = forms[1]
+            table[forms[1].lower()] = forms[0]
+    return table
+
+
+VARIANTS = _variant_table()
+
+
+def profile_perfect(words, rng):
+    return list(words)
+
+
+def profile_typos(words, rng):
+    return [_typo(w, rng) if rng.random() < 0.3 else w for w in words]
+
+
+def profile_skipped(words, rng):
+    # Pula trechos de 8 a 20 palavras, como frases que o usuário não ouviu
+    out, idx = [], 0
+    while idx < len(words):
+        if rng.random() < 0.04:
+            idx += rng.randint(8, 20)
+            continue
+        out.append(words[idx])
+        idx += 1
+    return out
+
+
+def profile_junk(words, rng):
+    out = []
+    for w in words:
+        out.append(w)
+        if rng.random() < 0.1:
+            out.extend(_junk_word(rng) for _ in range(rng.randint(1, 3)))
+    return out
+
+
+def profile_reordered(words, rng):
+    # Troca blocos vizinhos de 3 a 6 palavras
+    out, idx = [], 0
+    while idx < len(words):
+        size = rng.randint(3, 6)
+        first, second = words[idx:idx + size], words[idx + size:idx + 2 * size]
+        out.extend(second + first if rng.random() < 0.2 else first + second)
+        idx += 2 * size
+    return out
+
+
+def profile_variants(words, rng):
+    out, idx = [], 0
+    while idx < len(words):
+        pair = ' '.join(words[idx:idx + 2]).lower()
+        if idx + 1 < len(words) and pair in VARIANTS:
+            out.extend(VARIANTS[pair].split())
+            idx += 2
+        elif words[idx].lower() in VARIANTS:
+            out.extend(VARIANTS[words[idx].lower()].split())
+            idx += 1
+        else:
+            out.append(words[idx])
+            idx += 1
+    return out
+
+
+def adversarial_realign(words, rng):
+    # Nenhuma palavra casa nem é parecida: cada passo cai em realign_with_dubles, que procura
+    # pares no resto todo do texto do usuário e depois percorre a transcrição palavra a palavra
+    return ['zq%dxv' % i for i in range(len(words))]
+
+
+def adversarial_fill_gaps(words, rng):
+    # Blocos de lixo seguidos do par que aparece perto do fim da janela de busca: cada bloco
+    # gera uma lacuna de ~190 x 190 palavras para fill_field_gaps
+    out, idx = [], 0
+    while idx + 192 < len(words):
+        out.extend(_junk_word(rng) for _ in range(190))
+        out.extend(words[idx + 190:idx + 192])
+        idx += 192
+    return out
+
+
+PROFILES = {
+    'perfect': profile_perfect,
+    'typos': profile_typos,
+    'skipped': profile_skipped,
+    'junk': profile_junk,
+    'reordered': profile_reordered,
+    'variants': profile_variants,
+}
+
+ADVERSARIAL = {
+    'adversarial_realign': adversarial_realign,
+    'adversarial_fill_gaps': adversarial_fill_gaps,
+}
+
+
+def measure(user_text, transcript, timestamps, artifact, alignment, repeat, max_seconds):
+    durations = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        align_transcription(user_text, transcript, timestamps, alignment, artifact)
+        durations.append(time.perf_counter() - t0)
+        if time.perf_counter() - started > max_seconds:
+            break
+
+    # Memória de pico em uma chamada separada: o tracemalloc deixa tudo mais lento
+    tracemalloc.start()
+    align_transcription(user_text, transcript, timestamps, alignment, artifact)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return durations, peak
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    transcripts = load_transcripts()
+    corpora = dict(transcripts)
+    for length in args.lengths:
+        corpora[f"synthetic-{length}"] = synthetic_transcript(transcripts, length, rng)
+
+    cases = []
+    for corpus, (words, timestamps) in corpora.items():
+        for name, profile in PROFILES.items():
+            cases.append((corpus, name, words, timestamps, profile))
+        if len(words) <= args.adversarial_max_words:
+            for name, profile in ADVERSARIAL.items():
+                cases.append((corpus, name, words, timestamps, profile))
+
+    results = []
+    for corpus, name, words, timestamps, profile in cases:
+        transcript = ' '.join(words)
+        artifact = build_transcript_artifact(transcript, timestamps)
+        user_words = profile(words, random.Random(f"{args.seed}-{corpus}-{name}"))
+        user_text = ' '.join(user_words)
+        for alignment in args.alignment:
+            durations, peak = measure(user_text, transcript, timestamps, artifact, alignment, args.repeat, args.max_seconds)
+            total = sum(durations)
+            result = {
+                'corpus': corpus,
+                'profile': name,
+                'alignment': alignment,
+                'words': len(words),
+                'user_words': len(user_words),
+                'calls': len(durations),
+                'calls_per_s': round(len(durations) / total, 2),
+                'words_per_s': round(len(durations) * (len(words) + len(user_words)) / total),
+                'mean_ms': round(statistics.mean(durations) * 1000, 3),
+                'p50_ms': round(percentile(durations, 0.5) * 1000, 3),
+                'p99_ms': round(percentile(durations, 0.99) * 1000, 3),
+                'peak_kib': round(peak / 1024, 1),
+            }
+            results.append(result)
+            print(f"{corpus:<18} {name:<22} {alignment:<7} {len(words):>6} words  "
+                  f"p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+                  f"{result['words_per_s']:>10,} words/s  peak {result['peak_kib']:>9.1f} KiB", file=sys.stderr)
+    return results
+
+
+def compare_with_baseline(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['corpus'], r['profile'], r['alignment']): r for r in json.load(f)['results']}
+    print(f"\nChange in p50 against {baseline_path}:", file=sys.stderr)
+    for result in results:
+        before = baseline.get((result['corpus'], result['profile'], result['alignment']))
+        if before is None or not before['p50_ms']:
+            continue
+        ratio = result['p50_ms'] / before['p50_ms']
+        flag = '  <-- slower' if ratio > 1.1 else ''
+        print(f"{result['corpus']:<18} {result['profile']:<22} {result['alignment']:<7} x{ratio:5.2f}{flag}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the transcription comparers.')
+    parser.add_argument('--lengths', type=int, nargs='*', default=[1000, 5000, 20000],
+                        help='word counts of the synthetic transcripts')
+    parser.add_argument('--alignment', nargs='*', default=['greedy'], choices=sorted(ALIGNMENT_MODES))
+    parser.add_argument('--repeat', type=int, default=20, help='calls per case')
+    parser.add_argument('--max-seconds', type=float, default=10, help='stop repeating a case after this long')
+    parser.add_argument('--adversarial-max-words', type=int, default=2000,
+                        help='skip adversarial inputs for longer transcripts (they are quadratic)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the results as JSON to this file (default: stdout)')
+    parser.add_argument('--baseline', help='JSON output of an earlier run to compare p50 against')
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
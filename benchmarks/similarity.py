@@ -0,0 +1,65 @@
+"""
+Micro-benchmark for is_mistake: difflib.SequenceMatcher vs transcription_similarity.is_similar.
+
+Run from the repository root:
+    python -m benchmarks.similarity
+"""
+import glob
+import json
+import random
+import time
+from difflib import SequenceMatcher
+
+from app.services.transcription_service import normalize_text
+from app.services.transcription_similarity import is_similar, clear_similarity_cache, similarity_cache_info
+
+THRESHOLD = 0.75
+
+
+def load_vocabulary():
+    words = []
+    for path in sorted(glob.glob('transcript_cache/*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            words.extend(normalize_text(w) for w in json.load(f)['transcript'].split())
+    return [w for w in words if w]
+
+
+def make_pairs(words, count, rng):
+    # Mistura parecida com a de fill_field_gaps: a maior parte dos pares não tem relação,
+    # uma parte é a mesma palavra com um erro de digitação
+    pairs = []
+    for _ in range(count):
+        actual = rng.choice(words)
+        if rng.random() < 0.2 and len(actual) > 2:
+            pos = rng.randrange(len(actual))
+            user = actual[:pos] + rng.choice('aeiourst') + actual[pos + 1:]
+        else:
+            user = rng.choice(words)
+        pairs.append((user, actual))
+    return pairs
+
+
+def run(label, fn, pairs):
+    start = time.perf_counter()
+    hits = sum(1 for a, b in pairs if fn(a, b))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms  {len(pairs) / elapsed:12,.0f} pairs/s  ({hits} similar)")
+    return elapsed
+
+
+def main(count=200000, seed=42):
+    rng = random.Random(seed)
+    pairs = make_pairs(load_vocabulary(), count, rng)
+
+    baseline = run('SequenceMatcher.ratio', lambda a, b: SequenceMatcher(None, a, b).ratio() >= THRESHOLD, pairs)
+    clear_similarity_cache()
+    cold = run('is_similar (cold cache)', lambda a, b: is_similar(a, b, THRESHOLD), pairs)
+    warm = run('is_similar (warm cache)', lambda a, b: is_similar(a, b, THRESHOLD), pairs)
+
+    mismatches = sum(1 for a, b in pairs if is_similar(a, b, THRESHOLD) != (SequenceMatcher(None, a, b).ratio() >= THRESHOLD))
+    print(f"speedup cold x{baseline / cold:.1f}, warm x{baseline / warm:.1f}, mismatches: {mismatches}")
+    print(similarity_cache_info())
+
+
+if __name__ == '__main__':
+    main()
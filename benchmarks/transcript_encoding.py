@@ -0,0 +1,89 @@
+"""
+Size and load time of the cached transcripts in each storage format: the JSON files of
+transcript_cache/, the zlib-compressed JSON the shared cache tier used to store, and the binary
+format of transcript_codec. Load means getting back transcript, timestamps and normalized forms;
+the binary format is also timed for just opening the view (what a slice of the clip routes needs)
+and for building the tokenized artifact from the view (what a cache read does).
+
+Run from the repository root:
+    python -m benchmarks.transcript_encoding
+    python -m benchmarks.transcript_encoding --repeat 500 --output encoding.json
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+import zlib
+
+from app.services.transcript_artifacts import artifact_from_encoded, build_transcript_artifact
+from app.services.transcript_codec import EncodedTranscript, decode_transcript, encode_transcript
+
+
+def load_entries():
+    entries = {}
+    for path in sorted(glob.glob('transcript_cache/*.json')):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        artifact = build_transcript_artifact(data['transcript'], data['timestamps'])
+        data['normalized'] = artifact.normalized if artifact is not None else None
+        entries[os.path.splitext(os.path.basename(path))[0]] = data
+    return entries
+
+
+def time_load(load, blob, repeat):
+    durations = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        load(blob)
+        durations.append(time.perf_counter() - t0)
+    return statistics.median(durations)
+
+
+def run(args):
+    results = []
+    for name, data in load_entries().items():
+        formats = {
+            'json': (json.dumps(data).encode('utf-8'), json.loads),
+            'json+zlib': (zlib.compress(json.dumps(data).encode('utf-8')),
+                          lambda blob: json.loads(zlib.decompress(blob))),
+            'binary': (encode_transcript(data['transcript'], data['timestamps'], data['normalized']),
+                       decode_transcript),
+            'binary-view': (encode_transcript(data['transcript'], data['timestamps'], data['normalized']),
+                            EncodedTranscript),
+            'binary-artifact': (encode_transcript(data['transcript'], data['timestamps'], data['normalized']),
+                                lambda blob: artifact_from_encoded(EncodedTranscript(blob))),
+        }
+        for fmt, (blob, load) in formats.items():
+            result = {
+                'transcript': name,
+                'format': fmt,
+                'words': len(data['timestamps']),
+                'bytes': len(blob),
+                'load_us': round(time_load(load, blob, args.repeat) * 1e6, 1),
+            }
+            results.append(result)
+            print(f"{name:<18} {fmt:<16} {result['words']:>6} words  {result['bytes']:>8,} bytes  "
+                  f"load {result['load_us']:>9.1f} us", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the storage formats of cached transcripts.')
+    parser.add_argument('--repeat', type=int, default=200, help='loads per transcript and format (median is reported)')
+    parser.add_argument('--output', help='write the results as JSON to this file (default: stdout)')
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'results': results}, f, indent=2)
+            f.write('\n')
+    else:
+        print(json.dumps({'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
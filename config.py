@@ -1,4 +1,88 @@
 import os
 
 class Config:
-    YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY') 
\ No newline at end of file
+    YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY')
+
+    # Transcrições e detalhes de vídeo persistidos (SQLite)
+    TRANSCRIPT_STORE_PATH = os.environ.get('TRANSCRIPT_STORE_PATH', 'transcript_store.sqlite3')
+
+    # Cache de transcrições compartilhado entre os workers do gunicorn (SQLite no diretório abaixo)
+    SHARED_CACHE_DIR = os.environ.get('SHARED_CACHE_DIR', 'shared_cache')
+    SHARED_CACHE_MAX_BYTES = int(os.environ.get('SHARED_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+    # Cache em memória de cada worker, na frente do compartilhado
+    MEMORY_CACHE_MAX_BYTES = int(os.environ.get('MEMORY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    TRANSCRIPT_CACHE_TTL = int(os.environ.get('TRANSCRIPT_CACHE_TTL', 7 * 24 * 60 * 60))
+
+    # Falhas de transcrição ficam em cache por um tempo que depende do tipo: legendas desativadas
+    # raramente mudam, já um erro do YouTube ou do proxy deve ser tentado de novo logo
+    NEGATIVE_CACHE_TTLS = {
+        'disabled': int(os.environ.get('NEGATIVE_TTL_DISABLED', 24 * 60 * 60)),
+        'no_language_match': int(os.environ.get('NEGATIVE_TTL_NO_LANGUAGE_MATCH', 6 * 60 * 60)),
+        'upstream_error': int(os.environ.get('NEGATIVE_TTL_UPSTREAM_ERROR', 2 * 60)),
+    }
+    MEMORY_NEGATIVE_CACHE_TTL = int(os.environ.get('MEMORY_NEGATIVE_CACHE_TTL', 60))
+    # Validade das transcrições na memória de cada worker: uma invalidação (DELETE /api/transcript)
+    # feita em outro worker só apaga o nível compartilhado
+    MEMORY_CACHE_TTL = int(os.environ.get('MEMORY_CACHE_TTL', 5 * 60))
+
+    # Resultados de busca: frescos por SEARCH_CACHE_TTL e servidos velhos (com renovação em
+    # segundo plano) por mais SEARCH_CACHE_STALE_TTL segundos
+    SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 60 * 60))
+    SEARCH_CACHE_STALE_TTL = int(os.environ.get('SEARCH_CACHE_STALE_TTL', 24 * 60 * 60))
+
+    # Fila de pré-carregamento de transcrições em segundo plano
+    PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))
+    PREFETCH_QUEUE_LIMIT = int(os.environ.get('PREFETCH_QUEUE_LIMIT', 500))
+
+    # Agendador das chamadas ao YouTube: fichas por segundo e rajada de cada classe (por worker),
+    # cota diária da Data API e quanto dela fica reservado para requisições interativas
+    UPSTREAM_RATES = {'search': 2, 'videos': 10, 'captions': 2, 'proxy': 5}
+    UPSTREAM_BURSTS = {'search': 5, 'videos': 20, 'captions': 5, 'proxy': 10}
+    DATA_API_DAILY_QUOTA = int(os.environ.get('DATA_API_DAILY_QUOTA', 10000))
+    DATA_API_INTERACTIVE_RESERVE = float(os.environ.get('DATA_API_INTERACTIVE_RESERVE', 0.2))
+    # Espera máxima por uma ficha antes de recusar a chamada (UpstreamBusy)
+    UPSTREAM_MAX_WAIT = float(os.environ.get('UPSTREAM_MAX_WAIT', 5))
+    UPSTREAM_BACKGROUND_MAX_WAIT = float(os.environ.get('UPSTREAM_BACKGROUND_MAX_WAIT', 60))
+
+    # Proxies de saída do tráfego do youtube_transcript_api, separados por vírgula ('direct' = sem
+    # proxy). As URLs levam as credenciais do proxy, então só vêm do ambiente (.env)
+    PROXY_URLS = [url.strip() for url in os.environ.get('PROXY_URLS', 'direct').split(',') if url.strip()]
+    # Falhas seguidas que abrem o circuito de um proxy e por quantos segundos ele fica fora
+    PROXY_FAILURE_THRESHOLD = int(os.environ.get('PROXY_FAILURE_THRESHOLD', 5))
+    PROXY_OPEN_SECONDS = float(os.environ.get('PROXY_OPEN_SECONDS', 30))
+    # Percentil de latência do proxy depois do qual uma requisição GET ganha uma segunda
+    # tentativa por outro proxy (só com dois ou mais proxies)
+    PROXY_HEDGE_PERCENTILE = float(os.environ.get('PROXY_HEDGE_PERCENTILE', 0.9))
+    # A Data API usa chave própria e não precisa do proxy; com 1, o cliente dela sai pelo pool
+    DATA_API_USE_PROXY = os.environ.get('DATA_API_USE_PROXY', '0') == '1'
+
+    # Métricas e traces: requisições mais lentas que SLOW_REQUEST_SECONDS têm o trace escrito no
+    # log com probabilidade TRACE_SAMPLE_RATE
+    SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', 2))
+    TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.1))
+    # Log detalhado de cada tentativa de busca de transcrição
+    TRANSCRIPT_DEBUG_LOG = os.environ.get('TRANSCRIPT_DEBUG_LOG', '0') == '1'
+
+    # Alinhamentos com pelo menos ALIGNMENT_POOL_THRESHOLD tokens (usuário + transcrição) rodam
+    # em processos separados, para não segurar o GIL do worker; 0 processos = tudo na thread
+    ALIGNMENT_POOL_WORKERS = int(os.environ.get('ALIGNMENT_POOL_WORKERS', 2))
+    ALIGNMENT_POOL_THRESHOLD = int(os.environ.get('ALIGNMENT_POOL_THRESHOLD', 4000))
+    ALIGNMENT_TIMEOUT = float(os.environ.get('ALIGNMENT_TIMEOUT', 30))
+
+    # Folga, em segundos, em volta de uma janela start/end de /api/transcript e
+    # /api/validate-transcription: os timestamps são o início da legenda, não de cada palavra
+    TRANSCRIPT_WINDOW_MARGIN = float(os.environ.get('TRANSCRIPT_WINDOW_MARGIN', 2))
+
+    # Cache-Control de /api/transcript e /api/video-details, que também mandam ETag. Falhas de
+    # transcrição (sem timestamps) valem pouco tempo, para uma nova tentativa ser vista logo
+    TRANSCRIPT_CACHE_CONTROL = os.environ.get('TRANSCRIPT_CACHE_CONTROL', 'public, max-age=3600')
+    TRANSCRIPT_NEGATIVE_CACHE_CONTROL = os.environ.get('TRANSCRIPT_NEGATIVE_CACHE_CONTROL', 'public, max-age=60')
+    VIDEO_DETAILS_CACHE_CONTROL = os.environ.get('VIDEO_DETAILS_CACHE_CONTROL', 'public, max-age=86400')
+
+    # Token das rotas de administração (DELETE /api/transcript/<id>), enviado como
+    # 'Authorization: Bearer <token>'; sem ele essas rotas ficam desligadas
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+    # Arquivos de static/ lidos e comprimidos uma vez na inicialização e servidos da memória, com
+    # URLs com hash em cache permanente; 0 em desenvolvimento, para ver as edições sem reiniciar
+    STATIC_ASSETS_IN_MEMORY = os.environ.get('STATIC_ASSETS_IN_MEMORY', '1') == '1'
@@ -0,0 +1,20 @@
+import pytest
+
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'TRANSCRIPT_STORE_PATH': str(tmp_path / 'store.sqlite3'),
+        'SHARED_CACHE_DIR': str(tmp_path / 'shared_cache'),
+        'ADMIN_TOKEN': 'admin-secret',
+        'PROXY_URLS': ['direct'],
+    })
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
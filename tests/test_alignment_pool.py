@@ -0,0 +1,105 @@
+import json
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from app.services.alignment_pool import AlignmentCancelled, AlignmentPool, AlignmentTimeout
+from app.services.transcription_service import validate_transcription
+
+TRANSCRIPT_PATH = os.path.join(os.path.dirname(__file__), '..', 'transcript_cache', 'ezmsrB59mj8.json')
+
+
+@pytest.fixture(scope='module')
+def transcript():
+    with open(TRANSCRIPT_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def pool():
+    # threshold=0: tudo passa pelos processos
+    pool = AlignmentPool(workers=1, threshold=0, timeout=30)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture(scope='module')
+def slow_input(transcript):
+    # Alinhamento global de um texto aleatório contra a transcrição repetida: leva minutos
+    rng = random.Random(0)
+    words = transcript['transcript'].split()
+    return ' '.join(rng.choice(words) for _ in range(len(words) * 40)), ' '.join(words * 40)
+
+
+def pid(pool):
+    return pool.idle[0].process.pid
+
+
+def check_result(pool, transcript):
+    user = ' '.join(transcript['transcript'].split()[:50])
+    result, user_tokens, actual_tokens = pool.align(user, transcript['transcript'], transcript['timestamps'])
+    assert result.to_dicts(user_tokens, actual_tokens) == validate_transcription(
+        user, transcript['transcript'], transcript['timestamps'])
+
+
+def test_pooled_alignment_matches_inline(pool, transcript):
+    check_result(pool, transcript)
+    check_result(pool, transcript)
+
+    assert pool.stats()['started'] == 1
+
+
+def test_reply_larger_than_the_pipe_buffer_is_read_whole(pool, slow_input):
+    user, actual = slow_input
+    timestamps = [0.0] * len(actual.split())
+
+    result, _, _ = pool.align(user, actual, timestamps)
+    inline, _, _ = AlignmentPool(workers=0).align(user, actual, timestamps)
+
+    assert len(result) > 10000
+    assert (result.statuses, result.indexes) == (inline.statuses, inline.indexes)
+
+
+def test_timeout_kills_the_worker_and_the_next_alignment_gets_a_new_one(pool, transcript, slow_input):
+    check_result(pool, transcript)
+    first = pid(pool)
+    user, actual = slow_input
+
+    started = time.monotonic()
+    with pytest.raises(AlignmentTimeout):
+        pool.align(user, actual, [0.0] * len(actual.split()), 'global', timeout=0.5)
+
+    assert time.monotonic() - started < 5
+    assert pool.stats()['started'] == 0
+    check_result(pool, transcript)
+    assert pid(pool) != first
+
+
+def test_cancel_kills_the_worker(pool, transcript, slow_input):
+    check_result(pool, transcript)
+    user, actual = slow_input
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+
+    started = time.monotonic()
+    with pytest.raises(AlignmentCancelled):
+        pool.align(user, actual, [0.0] * len(actual.split()), 'global', cancel=cancel)
+
+    assert time.monotonic() - started < 5
+    assert pool.stats()['started'] == 0
+    check_result(pool, transcript)
+
+
+def test_worker_that_died_while_idle_is_replaced(pool, transcript):
+    check_result(pool, transcript)
+    dead = pool.idle[0].process
+    dead.kill()
+    dead.wait()
+
+    check_result(pool, transcript)
+
+    assert pid(pool) != dead.pid
+    assert pool.stats()['started'] == 1
@@ -0,0 +1,119 @@
+import pytest
+
+from app.api import youtube_routes
+from app.services.transcript_store import get_store
+from app.services.upstream_scheduler import UpstreamBusy
+
+DETAILS = {'id': 'vid', 'title': 'A video'}
+
+
+@pytest.fixture
+def cached_client(app, client):
+    app.extensions['transcript_cache'].put('vid', 'en', 'hello world', [0.0, 1.0])
+    get_store().put_video_details('vid', DETAILS)
+    return client
+
+
+def etag_of(client, url, **kwargs):
+    response = client.get(url, **kwargs)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+@pytest.mark.parametrize('url', ['/api/transcript/vid', '/api/video-details/vid'])
+def test_matching_if_none_match_answers_304(app, cached_client, url):
+    etag = etag_of(cached_client, url)
+
+    response = cached_client.get(url, headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    assert response.headers['Cache-Control'] == cached_client.get(url).headers['Cache-Control']
+
+
+def test_stale_etag_gets_the_full_response(cached_client):
+    response = cached_client.get('/api/transcript/vid', headers={'If-None-Match': '"0123456789abcdef"'})
+
+    assert response.status_code == 200
+    assert response.get_json()['transcript'] == 'hello world'
+
+
+def test_weak_etag_matches(cached_client):
+    etag = etag_of(cached_client, '/api/transcript/vid')
+
+    response = cached_client.get('/api/transcript/vid', headers={'If-None-Match': 'W/' + etag})
+
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize('header', ['"other", {etag}', '"other",{etag} , W/"third"', '*'])
+def test_one_of_several_etags_matches(cached_client, header):
+    etag = etag_of(cached_client, '/api/transcript/vid')
+
+    response = cached_client.get('/api/transcript/vid', headers={'If-None-Match': header.format(etag=etag)})
+
+    assert response.status_code == 304
+
+
+def test_transcript_varies_on_accept(cached_client):
+    json_response = cached_client.get('/api/transcript/vid')
+    stream_response = cached_client.get('/api/transcript/vid', headers={'Accept': 'application/x-ndjson'})
+
+    assert 'Accept' in json_response.headers['Vary']
+    assert 'Accept' in stream_response.headers['Vary']
+    assert stream_response.mimetype == 'application/x-ndjson'
+    # A ETag de uma representação não valida a outra
+    assert json_response.headers['ETag'] != stream_response.headers['ETag']
+    not_modified = cached_client.get('/api/transcript/vid', headers={
+        'Accept': 'application/x-ndjson', 'If-None-Match': json_response.headers['ETag']})
+    assert not_modified.status_code == 200
+    assert 'Accept' in cached_client.get('/api/transcript/vid', headers={
+        'If-None-Match': json_response.headers['ETag']}).headers['Vary']
+
+
+def test_clip_has_its_own_etag(cached_client):
+    whole = etag_of(cached_client, '/api/transcript/vid')
+    clip = etag_of(cached_client, '/api/transcript/vid?start=1')
+
+    assert whole != clip
+
+
+def test_cached_failure_gets_the_negative_policy(app, client):
+    app.extensions['transcript_cache'].put_failure('vid', 'en', 'No transcript', 'disabled')
+
+    response = client.get('/api/transcript/vid')
+
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == app.config['TRANSCRIPT_NEGATIVE_CACHE_CONTROL']
+
+
+def test_bad_request_is_not_cached(cached_client):
+    response = cached_client.get('/api/transcript/vid?start=5&end=1')
+
+    assert response.status_code == 400
+    assert response.headers['Cache-Control'] == 'no-store'
+    assert 'ETag' not in response.headers
+
+
+def test_throttled_request_is_not_cached(cached_client, monkeypatch):
+    def busy(video_id):
+        raise UpstreamBusy('Rate limited', retry_after=2.5)
+    monkeypatch.setattr(youtube_routes, 'get_video_details', busy)
+
+    response = cached_client.get('/api/video-details/other')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
+    assert response.headers['Cache-Control'] == 'no-store'
+
+
+def test_server_error_is_not_cached(cached_client, monkeypatch):
+    def broken(video_id):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(youtube_routes, 'get_video_details', broken)
+
+    response = cached_client.get('/api/video-details/vid')
+
+    assert response.status_code == 500
+    assert response.headers['Cache-Control'] == 'no-store'
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from app.services.proxy_pool import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, DIRECT, ProxyPool
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=''):
+        self.status_code = status_code
+        self.body = body
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def by_url(pool, url):
+    return next(proxy for proxy in pool.proxies if proxy.url == url)
+
+
+def test_circuit_opens_after_consecutive_failures():
+    pool = ProxyPool(['http://a', 'http://b'], failure_threshold=3, open_seconds=60)
+    a = by_url(pool, 'http://a')
+
+    for _ in range(2):
+        pool.record(a, 0.1, False)
+    assert a.state == CIRCUIT_CLOSED
+    pool.record(a, 0.1, False)
+
+    assert a.state == CIRCUIT_OPEN
+    assert all(pool.choose() is by_url(pool, 'http://b') for _ in range(5))
+
+
+def test_open_circuit_admits_a_single_trial_after_the_timeout():
+    pool = ProxyPool(['http://a', 'http://b'], failure_threshold=1, open_seconds=0.05)
+    a, b = by_url(pool, 'http://a'), by_url(pool, 'http://b')
+    pool.record(a, 0.1, False)
+    # b mais lento: sem o teste de a, ele seria sempre o escolhido
+    pool.record(b, 5.0, True)
+    time.sleep(0.06)
+
+    assert pool.choose() is a
+    assert a.state == CIRCUIT_HALF_OPEN
+    assert pool.choose() is b
+
+    pool.record(a, 0.1, False)
+    assert a.state == CIRCUIT_OPEN
+    time.sleep(0.06)
+    assert pool.choose() is a
+    pool.record(a, 0.1, True)
+    assert a.state == CIRCUIT_CLOSED
+
+
+def test_failed_status_counts_against_the_proxy():
+    pool = ProxyPool([DIRECT], failure_threshold=2, open_seconds=60)
+
+    for _ in range(2):
+        response = pool.request(lambda proxy: FakeResponse(503))
+        assert response.status_code == 503
+
+    assert pool.proxies[0].state == CIRCUIT_OPEN
+
+
+def test_slow_request_is_hedged_on_another_proxy():
+    pool = ProxyPool(['http://slow', 'http://fast'], hedge_default_delay=0.05)
+    slow = by_url(pool, 'http://slow')
+    # Histórico que faz o slow ser o primeiro escolhido
+    pool.record(slow, 0.01, True)
+    pool.record(by_url(pool, 'http://fast'), 0.02, True)
+    release = threading.Event()
+    slow_response = FakeResponse(body='slow')
+
+    def send(proxy):
+        if proxy is slow:
+            release.wait(5)
+            return slow_response
+        return FakeResponse(body='fast')
+
+    started = time.monotonic()
+    response = pool.request(send)
+    elapsed = time.monotonic() - started
+    release.set()
+
+    assert response.body == 'fast'
+    assert elapsed < 1
+    assert pool.stats()['hedges'] == 1
+    assert pool.stats()['hedge_wins'] == 1
+    # A resposta perdedora é fechada quando chega
+    deadline = time.monotonic() + 1
+    while not slow_response.closed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert slow_response.closed
+
+
+def test_failed_attempt_is_retried_on_another_proxy_without_waiting():
+    pool = ProxyPool(['http://a', 'http://b'], hedge_default_delay=10)
+    pool.record(by_url(pool, 'http://a'), 0.01, True)
+
+    def send(proxy):
+        if proxy.url == 'http://a':
+            raise ConnectionError('proxy refused')
+        return FakeResponse(body=proxy.url)
+
+    started = time.monotonic()
+    assert pool.request(send).body == 'http://b'
+    assert time.monotonic() - started < 1
+
+
+def test_without_hedge_the_error_of_the_only_attempt_is_raised():
+    pool = ProxyPool(['http://a', 'http://b'])
+
+    def send(proxy):
+        raise ConnectionError('proxy refused')
+
+    with pytest.raises(ConnectionError):
+        pool.request(send, hedge=False)
+    assert pool.stats()['hedges'] == 0
@@ -0,0 +1,159 @@
+import threading
+import time
+import zlib
+
+import pytest
+
+from app.services.single_flight import LOCK_STRIPES, SingleFlight
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    errors = [None] * count
+
+    def worker(index):
+        try:
+            results[index] = target()
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+@pytest.mark.parametrize('lock_dir', [None, 'locks'])
+def test_concurrent_callers_share_one_call(tmp_path, lock_dir):
+    flights = SingleFlight(str(tmp_path / lock_dir) if lock_dir else None)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'transcript'
+
+    results, errors = run_concurrently(8, lambda: flights.do('video:en', fetch))
+
+    assert results == ['transcript'] * 8
+    assert errors == [None] * 8
+    assert len(calls) == 1
+    assert flights.in_flight() == 0
+
+
+def test_error_reaches_every_caller_and_is_not_kept():
+    flights = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        raise RuntimeError('upstream down')
+
+    _, errors = run_concurrently(4, lambda: flights.do('video:en', fetch))
+
+    assert all(isinstance(e, RuntimeError) for e in errors)
+    assert len(calls) == 1
+    assert flights.do('video:en', lambda: 'retried') == 'retried'
+
+
+def test_different_keys_run_in_parallel():
+    flights = SingleFlight()
+    barrier = threading.Barrier(2, timeout=2)
+
+    def fetch():
+        # Só passa se as duas chaves estiverem rodando ao mesmo tempo
+        barrier.wait()
+        return 'ok'
+
+    results, errors = run_concurrently(2, lambda: flights.do(threading.current_thread().name, fetch))
+
+    assert results == ['ok', 'ok']
+    assert errors == [None, None]
+
+
+def test_joining_caller_gets_the_leader_tag():
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    joined = []
+
+    def fetch():
+        started.set()
+        release.wait(2)
+        return 'done'
+
+    leader = threading.Thread(target=flights.do, args=('key', fetch), kwargs={'tag': 'leader-tag'})
+    leader.start()
+    started.wait(2)
+    follower = threading.Thread(target=flights.do, args=('key', fetch), kwargs={'on_join': joined.append})
+    follower.start()
+    while not joined and follower.is_alive():
+        time.sleep(0.01)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert joined == ['leader-tag']
+
+
+def keys_in_one_stripe():
+    stripes = {}
+    for number in range(10 * LOCK_STRIPES):
+        key = f"video{number}:en"
+        stripe = zlib.crc32(key.encode('utf-8')) % LOCK_STRIPES
+        if stripe in stripes:
+            return stripes[stripe], key
+        stripes[stripe] = key
+
+
+def test_key_sharing_a_busy_lock_stripe_runs_without_it_after_the_timeout(tmp_path):
+    first_key, second_key = keys_in_one_stripe()
+    # Duas instâncias fazem o papel de dois workers com o mesmo diretório de locks
+    leader = SingleFlight(str(tmp_path), lock_timeout=10)
+    other = SingleFlight(str(tmp_path), lock_timeout=0.2)
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_fetch():
+        started.set()
+        release.wait(5)
+        return 'first'
+
+    thread = threading.Thread(target=leader.do, args=(first_key, slow_fetch))
+    thread.start()
+    assert started.wait(2)
+
+    began = time.monotonic()
+    assert other.do(second_key, lambda: 'second') == 'second'
+    waited = time.monotonic() - began
+    release.set()
+    thread.join()
+
+    # Esperou o prazo do lock, não o fim da outra busca
+    assert 0.2 <= waited < 2
+
+
+def test_key_sharing_a_lock_stripe_gets_it_once_released(tmp_path):
+    first_key, second_key = keys_in_one_stripe()
+    leader = SingleFlight(str(tmp_path))
+    other = SingleFlight(str(tmp_path), lock_timeout=5)
+    started = threading.Event()
+    order = []
+
+    def slow_fetch():
+        started.set()
+        time.sleep(0.2)
+        order.append('first')
+        return 'first'
+
+    thread = threading.Thread(target=leader.do, args=(first_key, slow_fetch))
+    thread.start()
+    assert started.wait(2)
+
+    assert other.do(second_key, lambda: order.append('second') or 'second') == 'second'
+    thread.join()
+
+    assert order == ['first', 'second']
@@ -0,0 +1,146 @@
+import gzip
+
+import pytest
+from flask import Flask
+
+from app.services import static_assets
+from app.services.static_assets import (IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, StaticAssets,
+                                        fingerprint)
+
+CSS = ('body { color: #333; }\n' * 100).encode('utf-8')
+SHELL = '''<html><head>
+<link rel="stylesheet" href="/static/css/site.css">
+<link rel="icon" href="/static/img/logo.png">
+<script src="/static/js/missing.js"></script>
+<script src="https://cdn.example.com/lib.js"></script>
+</head></html>'''
+needs_brotli = pytest.mark.skipif(static_assets.brotli is None, reason='brotli is not installed')
+
+
+def write(folder, name, data):
+    path = folder / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    write(tmp_path, 'css/site.css', CSS)
+    write(tmp_path, 'css/tiny.css', b'a { }')
+    write(tmp_path, 'img/logo.png', b'\x89PNG' + bytes(2000))
+    write(tmp_path, 'index.html', SHELL.encode('utf-8'))
+    return tmp_path
+
+
+@pytest.fixture
+def flask_app():
+    return Flask(__name__)
+
+
+def serve(flask_app, assets, filename, **headers):
+    with flask_app.test_request_context(headers=headers):
+        return assets.serve(filename, flask_app.response_class)
+
+
+@needs_brotli
+def test_brotli_is_preferred_and_gzip_is_the_fallback(folder, flask_app):
+    assets = StaticAssets(str(folder), '/static')
+
+    assert serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': 'gzip, br'}).headers[
+        'Content-Encoding'] == 'br'
+    response = serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == CSS
+    response = serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': 'br;q=0, gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    response = serve(flask_app, assets, 'css/site.css')
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == CSS
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+
+def test_small_and_binary_files_are_not_compressed(folder, flask_app):
+    assets = StaticAssets(str(folder), '/static')
+
+    for name in ('css/tiny.css', 'img/logo.png'):
+        response = serve(flask_app, assets, name, **{'Accept-Encoding': 'gzip, br'})
+        assert 'Content-Encoding' not in response.headers
+        assert 'Vary' not in response.headers
+
+
+@needs_brotli
+def test_each_encoding_has_its_own_etag(folder, flask_app):
+    assets = StaticAssets(str(folder), '/static')
+    etags = {encoding: serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': encoding}).headers['ETag']
+             for encoding in ('br', 'gzip', 'identity')}
+
+    assert len(set(etags.values())) == 3
+    response = serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': 'gzip', 'If-None-Match': etags['gzip']})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etags['gzip']
+    # A ETag do corpo gzip não vale para o corpo brotli
+    response = serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': 'br', 'If-None-Match': etags['gzip']})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'br'
+
+
+def test_fingerprinted_name_is_immutable_and_plain_name_revalidates(folder, flask_app):
+    assets = StaticAssets(str(folder), '/static')
+    url = assets.url('css/site.css')
+    assert url.startswith('/static/css/site.') and url.endswith('.css') and url != '/static/css/site.css'
+
+    immutable = serve(flask_app, assets, url[len('/static/'):])
+    plain = serve(flask_app, assets, 'css/site.css')
+
+    assert immutable.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert plain.headers['Cache-Control'] == REVALIDATE_CACHE_CONTROL
+    assert immutable.get_data() == plain.get_data() == CSS
+    assert serve(flask_app, assets, 'css/other.css') is None
+    assert serve(flask_app, assets, 'index.html') is None
+
+
+def test_shell_urls_are_rewritten_to_fingerprinted_names(folder, flask_app):
+    assets = StaticAssets(str(folder), '/static')
+    with flask_app.test_request_context():
+        html = assets.serve_shell('index.html', flask_app.response_class).get_data(as_text=True)
+
+    assert f'href="{assets.url("css/site.css")}"' in html
+    assert f'href="{assets.url("img/logo.png")}"' in html
+    assert 'href="/static/css/site.css"' not in html
+    # Arquivos que não estão na pasta e URLs de fora ficam como estão
+    assert 'src="/static/js/missing.js"' in html
+    assert 'src="https://cdn.example.com/lib.js"' in html
+
+
+def test_fingerprint_changes_with_the_content(folder):
+    before = StaticAssets(str(folder), '/static').url('css/site.css')
+    write(folder, 'css/site.css', CSS + b'p { }\n')
+    after = StaticAssets(str(folder), '/static').url('css/site.css')
+
+    assert before != after
+    assert fingerprint('css/site.css', 'abc') == 'css/site.abc.css'
+
+
+def test_without_brotli_only_gzip_is_offered(folder, flask_app, monkeypatch):
+    monkeypatch.setattr(static_assets, 'brotli', None)
+    assets = StaticAssets(str(folder), '/static')
+
+    assert set(assets.stats()['css/site.css']) == {'identity', 'gzip'}
+    assert serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': 'gzip, br'}).headers[
+        'Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in serve(flask_app, assets, 'css/site.css', **{'Accept-Encoding': 'br'}).headers
+
+
+def test_app_serves_the_shell_and_its_assets_from_memory(client):
+    shell = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert shell.status_code == 200
+    assert shell.headers['Cache-Control'] == REVALIDATE_CACHE_CONTROL
+    html = gzip.decompress(shell.get_data()).decode('utf-8')
+    url = client.application.extensions['static_assets'].url('css/styles.css')
+    assert f'href="{url}"' in html
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from app.services.transcript_cache import TranscriptCache, cache_key
+
+NEGATIVE_TTLS = {'disabled': 3600, 'upstream_error': 120}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return TranscriptCache(str(tmp_path), 10 ** 7, 10 ** 7, 7 * 24 * 3600, NEGATIVE_TTLS, memory_negative_ttl=60)
+
+
+def memory_ttl(cache, key):
+    return cache.memory.entries[key][0] - time.time()
+
+
+def shared_ttl(cache, key):
+    return cache.shared.get(key, count=False)[1] - time.time()
+
+
+def failing_fetch(kind, failure_ttl=None, calls=None):
+    def fetch():
+        if calls is not None:
+            calls.append(kind)
+        return 'No transcript', [], None, kind, failure_ttl
+    return fetch
+
+
+def test_failure_is_cached_for_the_ttl_of_its_kind(cache):
+    calls = []
+    fetch = failing_fetch('disabled', calls=calls)
+
+    assert cache.get_or_fetch('vid', 'en', fetch) == ('No transcript', [], None)
+    assert cache.get_or_fetch('vid', 'en', fetch) == ('No transcript', [], None)
+
+    key = cache_key('vid', 'en')
+    assert calls == ['disabled']
+    assert shared_ttl(cache, key) == pytest.approx(3600, abs=5)
+    # Na memória do worker a falha vive pouco, para ver logo uma invalidação feita em outro worker
+    assert memory_ttl(cache, key) == pytest.approx(60, abs=5)
+
+
+def test_kind_without_ttl_is_not_cached(cache):
+    calls = []
+    fetch = failing_fetch('no_language_match', calls=calls)
+
+    cache.get_or_fetch('vid', 'en', fetch)
+    cache.get_or_fetch('vid', 'en', fetch)
+
+    assert calls == ['no_language_match', 'no_language_match']
+    assert cache.get('vid', 'en') is None
+
+
+def test_failure_read_from_the_store_keeps_only_its_remaining_ttl(cache):
+    cache.get_or_fetch('vid', 'en', failing_fetch('disabled', failure_ttl=30))
+
+    key = cache_key('vid', 'en')
+    assert shared_ttl(cache, key) == pytest.approx(30, abs=5)
+    assert memory_ttl(cache, key) == pytest.approx(30, abs=5)
+
+
+def test_failure_copied_from_the_shared_tier_does_not_outlive_it(tmp_path):
+    writer = TranscriptCache(str(tmp_path), 10 ** 7, 10 ** 7, 3600, NEGATIVE_TTLS, memory_negative_ttl=60)
+    reader = TranscriptCache(str(tmp_path), 10 ** 7, 10 ** 7, 3600, NEGATIVE_TTLS, memory_negative_ttl=60)
+    key = cache_key('vid', 'en')
+
+    writer.put_failure('vid', 'en', 'No transcript', 'upstream_error', ttl=20)
+    assert reader.get('vid', 'en') == ('No transcript', [], None)
+    assert memory_ttl(reader, key) == pytest.approx(20, abs=5)
+
+    writer.put_failure('other', 'en', 'No transcript', 'disabled')
+    reader.get('other', 'en')
+    assert memory_ttl(reader, cache_key('other', 'en')) == pytest.approx(60, abs=5)
+
+
+def test_expired_failure_is_fetched_again(cache):
+    calls = []
+    cache.put_failure('vid', 'en', 'No transcript', 'upstream_error', ttl=0.05)
+    time.sleep(0.1)
+
+    result = cache.get_or_fetch('vid', 'en', lambda: calls.append(1) or ('hello world', [0.0, 1.0], None, None, None))
+
+    assert calls == [1]
+    assert result[0] == 'hello world'
+
+
+def test_spent_ttl_is_not_cached(cache):
+    cache.put_failure('vid', 'en', 'No transcript', 'disabled', ttl=0)
+
+    assert cache.get('vid', 'en') is None
+
+
+def test_transcript_in_memory_expires_before_the_shared_copy(tmp_path):
+    # Uma invalidação apaga o nível compartilhado; os outros workers largam a cópia em memória
+    # em até memory_ttl segundos
+    writer = TranscriptCache(str(tmp_path), 10 ** 7, 10 ** 7, 3600, NEGATIVE_TTLS, memory_ttl=300)
+    reader = TranscriptCache(str(tmp_path), 10 ** 7, 10 ** 7, 3600, NEGATIVE_TTLS, memory_ttl=300)
+    key = cache_key('vid', 'en')
+
+    writer.put('vid', 'en', 'hello world', [0.0, 1.0])
+    assert reader.get('vid', 'en')[0] == 'hello world'
+    assert memory_ttl(writer, key) == pytest.approx(300, abs=5)
+    assert memory_ttl(reader, key) == pytest.approx(300, abs=5)
+    assert shared_ttl(writer, key) == pytest.approx(3600, abs=5)
+
+    writer.delete('vid', 'en')
+    reader.memory.entries[key] = (time.time() - 1,) + reader.memory.entries[key][1:]
+    assert reader.get('vid', 'en') is None
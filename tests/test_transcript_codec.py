@@ -0,0 +1,77 @@
+import zlib
+
+import pytest
+
+from app.services.transcript_artifacts import artifact_from_encoded, build_transcript_artifact
+from app.services.transcript_codec import EncodedTranscript, decode_transcript, encode_transcript, is_encoded
+
+TRANSCRIPT = "Hello world, this is\na test of the\ncodec. Ça va? Très bien!"
+TIMESTAMPS = [0.0, 0.0, 0.0, 0.0, 1.5, 1.5, 1.5, 1.5, 3.25, 3.25, 3.25, 3.25, 3.25]
+
+
+def test_round_trip_keeps_text_timestamps_and_normalized_forms():
+    artifact = build_transcript_artifact(TRANSCRIPT, TIMESTAMPS)
+    blob = encode_transcript(TRANSCRIPT, TIMESTAMPS, artifact.normalized)
+
+    assert is_encoded(blob)
+    assert decode_transcript(blob) == {'transcript': TRANSCRIPT, 'timestamps': TIMESTAMPS,
+                                       'normalized': artifact.normalized}
+
+
+def test_view_reads_tokens_and_runs():
+    encoded = EncodedTranscript(encode_transcript(TRANSCRIPT, TIMESTAMPS))
+    tokens = TRANSCRIPT.split()
+
+    assert len(encoded) == len(tokens)
+    assert list(encoded.run_values) == [0.0, 1.5, 3.25]
+    assert list(encoded.run_counts) == [4, 4, 5]
+    assert encoded.tokens() == tokens
+    assert encoded.tokens(3, 9) == tokens[3:9]
+    assert [encoded.token(i) for i in range(len(tokens))] == tokens
+    assert encoded.normalized() is None
+    with pytest.raises(IndexError):
+        encoded.token(len(tokens))
+
+
+def test_more_timestamps_than_words_keeps_every_timestamp():
+    encoded = EncodedTranscript(encode_transcript('two words', [0.0, 1.0, 2.0]))
+
+    assert encoded.tokens() == ['two', 'words']
+    assert encoded.timestamps() == [0.0, 1.0, 2.0]
+
+
+def test_wide_gaps_and_leading_whitespace():
+    transcript = '   first' + ' ' * 300 + 'second\n\nthird'
+    encoded = EncodedTranscript(encode_transcript(transcript, [0.0, 1.0, 2.0]))
+
+    assert encoded.transcript == transcript
+    assert encoded.tokens(1) == ['second', 'third']
+    assert encoded.token(0) == 'first'
+
+
+def test_empty_transcript():
+    encoded = EncodedTranscript(encode_transcript('No transcript available', []))
+
+    assert len(encoded) == 0
+    assert encoded.tokens() == []
+    assert encoded.timestamps() == []
+    assert artifact_from_encoded(encoded) is None
+
+
+def test_artifact_from_the_view_matches_a_fresh_one():
+    fresh = build_transcript_artifact(TRANSCRIPT, TIMESTAMPS)
+    for normalized in (fresh.normalized, None):
+        artifact = artifact_from_encoded(EncodedTranscript(encode_transcript(TRANSCRIPT, TIMESTAMPS, normalized)))
+
+        assert artifact.texts == fresh.texts
+        assert artifact.normalized == fresh.normalized
+        assert artifact.classes == fresh.classes
+        assert artifact.timestamps == fresh.timestamps
+
+
+def test_legacy_blob_is_not_taken_for_the_binary_format():
+    legacy = zlib.compress(b'{"transcript": "", "timestamps": []}')
+
+    assert not is_encoded(legacy)
+    with pytest.raises(ValueError):
+        EncodedTranscript(legacy)
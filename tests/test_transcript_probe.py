@@ -0,0 +1,68 @@
+from youtube_transcript_api import NoTranscriptFound
+
+from app.services import youtube_service
+from app.services.youtube_service import probe_transcript_languages
+
+
+class FakeTrack:
+    def __init__(self, language_code):
+        self.language_code = language_code
+
+    def fetch(self):
+        return [{'text': f'hello in {self.language_code}', 'start': 0.0, 'duration': 1.0}]
+
+
+class FakeTrackList:
+    def __init__(self, video_id, codes):
+        self.video_id = video_id
+        self.tracks = [FakeTrack(code) for code in codes]
+
+    def __iter__(self):
+        return iter(self.tracks)
+
+    def find_transcript(self, codes):
+        for code in codes:
+            for track in self.tracks:
+                if track.language_code == code:
+                    return track
+        raise NoTranscriptFound(self.video_id, codes, None)
+
+
+def fake_api(monkeypatch, codes):
+    class FakeApi:
+        @staticmethod
+        def list_transcripts(video_id):
+            return FakeTrackList(video_id, codes)
+
+        @staticmethod
+        def get_transcript(video_id, languages):
+            return FakeTrackList(video_id, codes).find_transcript(languages).fetch()
+    monkeypatch.setattr(youtube_service, 'YouTubeTranscriptApi', FakeApi)
+
+
+def test_requested_language_wins_over_the_automatic_default(monkeypatch):
+    fake_api(monkeypatch, ['pt', 'en-GB'])
+
+    lang, data = probe_transcript_languages('vid', ['en', 'en-GB', ''])
+
+    assert lang == 'en-GB'
+    assert data[0]['text'] == 'hello in en-GB'
+
+
+def test_automatic_default_takes_the_first_listed_track(monkeypatch):
+    fake_api(monkeypatch, ['pt', 'fr'])
+    errors = []
+
+    lang, data = probe_transcript_languages('vid', ['en', 'en-US', ''], on_error=lambda lang, e: errors.append(lang))
+
+    assert lang == 'pt'
+    assert data[0]['text'] == 'hello in pt'
+    assert errors == ['en', 'en-US']
+
+
+def test_no_track_at_all(monkeypatch):
+    fake_api(monkeypatch, [])
+    errors = []
+
+    assert probe_transcript_languages('vid', ['en', ''], on_error=lambda lang, e: errors.append((lang, type(e)))) is None
+    assert errors == [('en', NoTranscriptFound), ('', NoTranscriptFound)]
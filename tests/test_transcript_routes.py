@@ -0,0 +1,128 @@
+import pytest
+
+from app.services.transcript_store import GENERIC_LANGUAGE, get_store
+
+ADMIN = {'Authorization': 'Bearer admin-secret'}
+
+
+def test_invalidation_drops_the_stored_and_the_cached_transcript(app, client):
+    cache = app.extensions['transcript_cache']
+    get_store().put_transcript('vid', 'en', 'hello world', [0.0, 1.0])
+    get_store().put_transcript('vid', GENERIC_LANGUAGE, 'old hello', [0.0, 1.0])
+    cache.put('vid', 'en', 'hello world', [0.0, 1.0])
+
+    response = client.delete('/api/transcript/vid?language=en', headers=ADMIN)
+
+    assert response.status_code == 200
+    assert response.get_json() == {'success': True, 'transcript_deleted': True, 'failure_cleared': False}
+    assert cache.get('vid', 'en') is None
+    # Sem isso a próxima busca acharia a transcrição no banco e a gravaria de volta no cache
+    assert get_store().get_transcript('vid', 'en') is None
+
+
+def test_invalidation_clears_a_stored_failure(app, client):
+    get_store().put_failure('vid', 'en', 'disabled', 'No transcript', ttl=3600)
+    app.extensions['transcript_cache'].put_failure('vid', 'en', 'No transcript', 'disabled')
+
+    response = client.delete('/api/transcript/vid?language=en', headers=ADMIN)
+
+    assert response.get_json() == {'success': True, 'transcript_deleted': False, 'failure_cleared': True}
+    assert get_store().get_failure('vid', 'en') is None
+    assert app.extensions['transcript_cache'].get('vid', 'en') is None
+
+
+def test_invalidation_requires_the_admin_token(client):
+    get_store().put_transcript('vid', 'en', 'hello world', [0.0, 1.0])
+
+    assert client.delete('/api/transcript/vid').status_code == 401
+    assert client.delete('/api/transcript/vid', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert get_store().get_transcript('vid', 'en') is not None
+
+
+WORDS = 'alpha bravo charlie delta echo foxtrot golf hotel india'.split()
+TIMESTAMPS = [0.0, 0.0, 1.0, 1.0, 1.0, 2.5, 4.0, 4.0, 6.0]
+
+
+@pytest.fixture
+def clip_client(app, client):
+    app.config['TRANSCRIPT_WINDOW_MARGIN'] = 0
+    app.extensions['transcript_cache'].put('vid', 'en', ' '.join(WORDS), TIMESTAMPS)
+    return client
+
+
+@pytest.mark.parametrize('query, words, first_word', [
+    ('start=1&end=4', WORDS[2:8], 2),
+    ('start=1.5&end=5', WORDS[5:8], 5),
+    ('start=4', WORDS[6:], 6),
+    ('end=0', WORDS[:2], 0),
+    ('start=7&end=9', [], 9),
+])
+def test_transcript_clip(clip_client, query, words, first_word):
+    response = clip_client.get(f'/api/transcript/vid?{query}')
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['transcript'] == ' '.join(words)
+    assert data['timestamps'] == TIMESTAMPS[first_word:first_word + len(words)]
+    assert data['first_word'] == first_word
+
+
+def test_transcript_clip_includes_the_margin(app, clip_client):
+    app.config['TRANSCRIPT_WINDOW_MARGIN'] = 1.5
+
+    data = clip_client.get('/api/transcript/vid?start=2.5&end=2.5').get_json()
+
+    assert data['transcript'] == ' '.join(WORDS[2:8])
+    assert data['first_word'] == 2
+
+
+@pytest.mark.parametrize('query', ['start=5&end=1', 'start=-1', 'end=soon'])
+def test_invalid_clip_is_rejected(clip_client, query):
+    assert clip_client.get(f'/api/transcript/vid?{query}').status_code == 400
+
+
+def validate(client, user_transcription, **fields):
+    return client.post('/api/validate-transcription', json=dict(
+        video_id='vid', user_transcription=user_transcription, **fields))
+
+
+def test_validation_compares_only_the_clip(clip_client):
+    response = validate(clip_client, 'charlie delta echo foxtrot golf', start=1, end=4)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['actual_transcript'] == ' '.join(WORDS[2:8])
+    # hotel foi dito em 4s e falta; as palavras antes e depois do trecho não contam
+    assert data['results'] == [{'text': word, 'type': 'correct'} for word in WORDS[2:7]] + [
+        {'text': 'hotel', 'type': 'missing'}]
+    assert data['wpm_stats'] == {'total_words': 6, 'duration_minutes': 3 / 60}
+
+
+def test_validation_of_a_clip_between_lines(clip_client):
+    data = validate(clip_client, 'foxtrot', start=1.5, end=3).get_json()
+
+    assert data['actual_transcript'] == 'foxtrot'
+    assert data['results'] == [{'text': 'foxtrot', 'type': 'correct'}]
+
+
+def test_margin_words_the_user_did_not_type_are_not_missing(app, clip_client):
+    app.config['TRANSCRIPT_WINDOW_MARGIN'] = 1.5
+
+    data = validate(clip_client, 'foxtrot', start=2.5, end=2.5, format='compact').get_json()
+
+    assert data['spans'] == [[0, 0, 1]]
+    assert data['wpm_stats']['total_words'] == 1
+
+
+def test_validation_of_a_clip_after_the_transcript(clip_client):
+    data = validate(clip_client, 'alpha', start=7, end=9).get_json()
+
+    assert data['results'] == [{'text': 'alpha', 'type': 'wrong'}]
+    assert data['wpm_stats'] == {'total_words': 0, 'duration_minutes': 0}
+
+
+def test_validation_rejects_start_after_end(clip_client):
+    response = validate(clip_client, 'alpha', start=5, end=1)
+
+    assert response.status_code == 400
+    assert 'start' in response.get_json()['error']
@@ -0,0 +1,45 @@
+import pytest
+
+from app.services.transcription_service import TranscriptWindow, find_window
+
+# Duas palavras em 0s, três em 1s, uma em 2.5s, duas em 4s e uma em 6s
+TIMESTAMPS = [0.0, 0.0, 1.0, 1.0, 1.0, 2.5, 4.0, 4.0, 6.0]
+
+
+def test_open_window_is_the_whole_transcript():
+    assert find_window(TIMESTAMPS) == TranscriptWindow(0, 9, 0, 9)
+
+
+def test_bounds_exactly_on_a_timestamp_include_every_word_said_then():
+    assert find_window(TIMESTAMPS, 1.0, 4.0) == TranscriptWindow(2, 8, 2, 8)
+
+
+def test_bounds_between_lines():
+    # start entre 1s e 2.5s começa na palavra de 2.5s; end entre 4s e 6s para depois das de 4s
+    assert find_window(TIMESTAMPS, 1.5, 5.0) == TranscriptWindow(5, 8, 5, 8)
+    # Nenhuma palavra começa entre 1.5s e 2s
+    window = find_window(TIMESTAMPS, 1.5, 2.0)
+    assert window.core_start == window.core_end == 5
+
+
+def test_margin_widens_the_window_but_not_the_core():
+    assert find_window(TIMESTAMPS, 2.5, 2.5, margin=1.5) == TranscriptWindow(2, 8, 5, 6)
+    assert find_window(TIMESTAMPS, 0.0, 6.0, margin=10) == TranscriptWindow(0, 9, 0, 9)
+
+
+@pytest.mark.parametrize('start, end', [(7.0, 9.0), (7.0, None)])
+def test_window_after_the_transcript_is_empty(start, end):
+    window = find_window(TIMESTAMPS, start, end)
+    assert window.start == window.end == 9
+    assert window.core_start == window.core_end == 9
+
+
+def test_window_before_the_transcript_is_empty():
+    timestamps = [5.0, 6.0]
+    assert find_window(timestamps, 0.0, 2.0) == TranscriptWindow(0, 0, 0, 0)
+    assert find_window(timestamps, None, 2.0) == TranscriptWindow(0, 0, 0, 0)
+
+
+def test_open_start_or_end():
+    assert find_window(TIMESTAMPS, None, 1.0) == TranscriptWindow(0, 5, 0, 5)
+    assert find_window(TIMESTAMPS, 4.0, None) == TranscriptWindow(6, 9, 6, 9)
@@ -0,0 +1,139 @@
+import random
+
+import pytest
+
+from app.services.transcription_alignment import ANCHOR_MIN_CELLS, global_matches, myers_matches
+from app.services.transcription_correction import (CORRECT, MISSING, MISTAKE, WRONG, TranscriptionComparerGlobal,
+                                                   TranscriptionComparerV4Pro)
+from app.services.transcription_service import build_actual_tokens, build_user_tokens
+
+
+def lcs_length(a, b):
+    # Tabela completa de LCS, a referência para os alinhamentos em memória linear
+    prev = [0] * (len(b) + 1)
+    for item in a:
+        cur = [0]
+        for k, other in enumerate(b):
+            cur.append(prev[k] + 1 if item == other else max(prev[k + 1], cur[k]))
+        prev = cur
+    return prev[-1]
+
+
+def assert_common_subsequence(a, b, matches):
+    assert all(a[i] == b[j] for i, j in matches)
+    assert all(i1 < i2 and j1 < j2 for (i1, j1), (i2, j2) in zip(matches, matches[1:]))
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_global_matches_is_an_lcs(seed):
+    rng = random.Random(seed)
+    alphabet = rng.randrange(2, 12)
+    a = [rng.randrange(alphabet) for _ in range(rng.randrange(0, 60))]
+    b = [rng.randrange(alphabet) for _ in range(rng.randrange(0, 60))]
+
+    matches = global_matches(a, b)
+
+    assert_common_subsequence(a, b, matches)
+    assert len(matches) == lcs_length(a, b)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_myers_on_a_subrange_is_an_lcs_of_it(seed):
+    rng = random.Random(seed)
+    a = [rng.randrange(6) for _ in range(80)]
+    b = [rng.randrange(6) for _ in range(80)]
+    a_lo, a_hi, b_lo, b_hi = 10, 70, 5, 60
+
+    matches = myers_matches(a, b, a_lo, a_hi, b_lo, b_hi)
+
+    assert all(a_lo <= i < a_hi and b_lo <= j < b_hi for i, j in matches)
+    assert_common_subsequence(a, b, matches)
+    assert len(matches) == lcs_length(a[a_lo:a_hi], b[b_lo:b_hi])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_long_input_is_split_at_unique_anchors(seed):
+    # Transcrição com palavras comuns repetidas e um marcador único a cada 10; o usuário pula
+    # palavras e digita outras que não estão nela, então o LCS são as palavras que sobraram
+    rng = random.Random(seed)
+    a = []
+    for idx in range(800):
+        a.append(10000 + idx if idx % 10 == 0 else rng.randrange(50))
+    b = []
+    kept = 0
+    for token in a:
+        if rng.random() < 0.1:
+            continue
+        b.append(token)
+        kept += 1
+        if rng.random() < 0.1:
+            b.append(20000 + rng.randrange(100))
+    assert len(a) * len(b) > ANCHOR_MIN_CELLS
+
+    matches = global_matches(a, b)
+
+    assert_common_subsequence(a, b, matches)
+    assert len(matches) == kept
+
+
+def assert_valid_result(result, user_len, actual_len):
+    user_entries = [idx for status, idx in zip(result.statuses, result.indexes) if status != MISSING]
+    missing = [idx for status, idx in zip(result.statuses, result.indexes) if status == MISSING]
+    assert user_entries == list(range(user_len))
+    assert len(set(missing)) == len(missing)
+    assert all(0 <= idx < actual_len for idx in missing)
+
+
+def compare(comparer, user_text, actual_text):
+    actual = build_actual_tokens(actual_text)
+    user = build_user_tokens(user_text)
+    return comparer.compare(user, actual), user, actual
+
+
+@pytest.mark.parametrize('max_hunk_cells', [10000, 0])
+def test_misspelled_word_is_a_mistake_in_the_table_and_windowed_paths(max_hunk_cells):
+    result, _, _ = compare(TranscriptionComparerGlobal(max_hunk_cells=max_hunk_cells),
+                           'the quick brwn fox jumps', 'the quick brown fox jumps')
+
+    assert list(result.statuses) == [CORRECT, CORRECT, MISTAKE, CORRECT, CORRECT]
+
+
+def test_hunk_over_the_cell_cap_is_resolved_in_windows(monkeypatch):
+    rng = random.Random(3)
+    vocabulary = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel']
+    actual_text = ' '.join(rng.choice(vocabulary) for _ in range(150))
+    # Um trecho longo só de palavras erradas entre duas partes corretas
+    user_text = ' '.join(actual_text.split()[:20] + ['zulu%d' % i for i in range(120)] + actual_text.split()[130:])
+    comparer = TranscriptionComparerGlobal()
+    windowed = []
+    resolve_hunk_windowed = comparer.resolve_hunk_windowed
+
+    def spy(user, user_lo, user_hi, actual, actual_lo, actual_hi, result):
+        windowed.append((user_hi - user_lo) * (actual_hi - actual_lo))
+        resolve_hunk_windowed(user, user_lo, user_hi, actual, actual_lo, actual_hi, result)
+    monkeypatch.setattr(comparer, 'resolve_hunk_windowed', spy)
+
+    result, user, actual = compare(comparer, user_text, actual_text)
+
+    assert windowed and all(cells > comparer.max_hunk_cells for cells in windowed)
+    assert_valid_result(result, len(user), len(actual))
+    assert all(status == WRONG for status, idx in zip(result.statuses, result.indexes)
+               if status != MISSING and user.texts[idx].startswith('zulu'))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_global_finds_at_least_as_many_correct_words_as_greedy(seed):
+    rng = random.Random(seed)
+    words = ['word%d' % rng.randrange(30) for _ in range(rng.randrange(20, 200))]
+    typed = [w for w in words if rng.random() > 0.15]
+    for _ in range(len(words) // 10):
+        typed.insert(rng.randrange(len(typed) + 1), rng.choice(words))
+    actual_text, user_text = ' '.join(words), ' '.join(typed)
+
+    global_result, user, actual = compare(TranscriptionComparerGlobal(), user_text, actual_text)
+    greedy_result, _, _ = compare(TranscriptionComparerV4Pro(), user_text, actual_text)
+
+    assert_valid_result(global_result, len(user), len(actual))
+    correct = list(global_result.statuses).count(CORRECT)
+    assert correct == lcs_length(actual.classes, user.classes)
+    assert correct >= list(greedy_result.statuses).count(CORRECT)
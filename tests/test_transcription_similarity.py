@@ -0,0 +1,64 @@
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from app.services.transcription_similarity import _lcs_at_least, clear_similarity_cache, is_similar
+
+THRESHOLDS = [0.0, 0.5, 0.6, 0.75, 0.8, 0.9, 1.0]
+
+
+def random_word(rng, alphabet):
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randrange(0, 12)))
+
+
+def edited(rng, word, alphabet):
+    # Variações parecidas, para que muitos pares fiquem perto do limiar
+    chars = list(word)
+    for _ in range(rng.randrange(0, 4)):
+        roll = rng.random()
+        if roll < 0.4 and chars:
+            del chars[rng.randrange(len(chars))]
+        elif roll < 0.7:
+            chars.insert(rng.randrange(len(chars) + 1), rng.choice(alphabet))
+        elif chars:
+            chars[rng.randrange(len(chars))] = rng.choice(alphabet)
+    return ''.join(chars)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_is_similar_matches_sequence_matcher(seed):
+    rng = random.Random(seed)
+    alphabet = 'abcde' if seed % 2 else "abcdefghijklmnopqrstuvwxyz'"
+    clear_similarity_cache()
+    for _ in range(300):
+        a = random_word(rng, alphabet)
+        b = edited(rng, a, alphabet) if rng.random() < 0.7 else random_word(rng, alphabet)
+        threshold = rng.choice(THRESHOLDS + [rng.random()])
+        expected = SequenceMatcher(None, a, b).ratio() >= threshold
+        assert is_similar(a, b, threshold) == expected, (a, b, threshold)
+        # A segunda chamada vem do cache
+        assert is_similar(a, b, threshold) == expected, (a, b, threshold)
+
+
+def test_threshold_exactly_at_the_ratio():
+    # ratio('abcd', 'abce') = 0.75: o limite é inclusivo
+    assert is_similar('abcd', 'abce', 0.75)
+    assert not is_similar('abcd', 'abce', 0.76)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_banded_lcs_bound(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        a = random_word(rng, 'abc')
+        b = random_word(rng, 'abc')
+        prev = [0] * (len(b) + 1)
+        for ch in a:
+            cur = [0]
+            for k, other in enumerate(b):
+                cur.append(prev[k] + 1 if ch == other else max(prev[k + 1], cur[k]))
+            prev = cur
+        lcs = prev[-1]
+        needed = rng.randrange(0, max(len(a), len(b)) + 2)
+        assert _lcs_at_least(a, b, needed) == (lcs >= needed), (a, b, needed)
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from app.services.upstream_scheduler import (BACKGROUND, INTERACTIVE, Priority, QuotaExceeded, QuotaLedger,
+                                             TokenBucket, UpstreamBusy, UpstreamScheduler, background_priority,
+                                             priority_handle)
+
+
+def make_scheduler(tmp_path, rates, bursts, daily_limit=10000, interactive_wait=5.0, background_wait=5.0):
+    quota = QuotaLedger(str(tmp_path / 'quota.sqlite3'), daily_limit, 0.2)
+    return UpstreamScheduler(rates, bursts, quota, {INTERACTIVE: interactive_wait, BACKGROUND: background_wait})
+
+
+def drain(bucket):
+    bucket.tokens = 0.0
+    bucket.updated = time.monotonic()
+
+
+def test_interactive_calls_go_before_waiting_background_calls(tmp_path):
+    scheduler = make_scheduler(tmp_path, {'videos': 20}, {'videos': 1})
+    drain(scheduler.buckets['videos'])
+    order = []
+
+    def background():
+        with background_priority():
+            scheduler.acquire('videos')
+        order.append(BACKGROUND)
+
+    def interactive():
+        scheduler.acquire('videos')
+        order.append(INTERACTIVE)
+
+    threads = [threading.Thread(target=background) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    threads += [threading.Thread(target=interactive) for _ in range(2)]
+    for thread in threads[2:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert order == [INTERACTIVE, INTERACTIVE, BACKGROUND, BACKGROUND]
+
+
+def test_background_calls_leave_the_reserve_to_interactive_ones():
+    bucket = TokenBucket(rate=0.01, burst=3, background_reserve=1)
+    bucket.acquire(Priority(BACKGROUND), max_wait=0)
+    bucket.acquire(Priority(BACKGROUND), max_wait=0)
+
+    with pytest.raises(UpstreamBusy):
+        bucket.acquire(Priority(BACKGROUND), max_wait=0)
+    bucket.acquire(Priority(INTERACTIVE), max_wait=0)
+    assert bucket.stats()['rejected'] == {INTERACTIVE: 0, BACKGROUND: 1}
+
+
+def test_call_is_refused_when_the_wait_exceeds_max_wait(tmp_path):
+    scheduler = make_scheduler(tmp_path, {'search': 1}, {'search': 1}, interactive_wait=0.1)
+    scheduler.acquire('search')
+
+    started = time.monotonic()
+    with pytest.raises(UpstreamBusy) as excinfo:
+        scheduler.acquire('search')
+    assert time.monotonic() - started < 0.1
+    assert excinfo.value.retry_after > 0.5
+
+
+def test_background_calls_stop_short_of_the_interactive_quota_reserve(tmp_path):
+    scheduler = make_scheduler(tmp_path, {'search': 1000}, {'search': 1000}, daily_limit=1000)
+
+    with background_priority():
+        for _ in range(8):
+            scheduler.acquire('search')
+        with pytest.raises(QuotaExceeded):
+            scheduler.acquire('search')
+    scheduler.acquire('search')
+    scheduler.acquire('search')
+    with pytest.raises(QuotaExceeded) as excinfo:
+        scheduler.acquire('search')
+
+    assert scheduler.quota.used() == 1000
+    assert excinfo.value.retry_after > 0
+
+
+def test_promoted_background_call_is_served_as_interactive(tmp_path):
+    scheduler = make_scheduler(tmp_path, {'proxy': 2}, {'proxy': 3})
+    drain(scheduler.buckets['proxy'])
+    priorities = []
+
+    def background():
+        with background_priority():
+            priorities.append(priority_handle())
+            started = time.monotonic()
+            scheduler.acquire('proxy')
+            priorities.append(time.monotonic() - started)
+
+    thread = threading.Thread(target=background)
+    thread.start()
+    time.sleep(0.05)
+    scheduler.promote(priorities[0])
+    thread.join()
+
+    # Em segundo plano esperaria 2 fichas (1 s); interativa, só 1 (0,5 s)
+    assert priorities[1] < 0.8
+    assert scheduler.buckets['proxy'].stats()['granted'] == {INTERACTIVE: 1, BACKGROUND: 0}
@@ -0,0 +1,143 @@
+import json
+import os
+import random
+import threading
+
+import pytest
+
+from app.services.transcription_correction import AlignmentCancelled
+from app.services.transcription_service import validate_transcription
+from app.services.validation_sessions import close_session, create_session, get_session
+
+TRANSCRIPT_PATH = os.path.join(os.path.dirname(__file__), '..', 'transcript_cache', 'ezmsrB59mj8.json')
+
+
+@pytest.fixture(scope='module')
+def transcript():
+    with open(TRANSCRIPT_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def typed_text(rng, words):
+    # Palavras puladas, truncadas e inventadas, como numa transcrição de verdade
+    typed = []
+    for word in words:
+        roll = rng.random()
+        if roll < 0.05:
+            continue
+        if roll < 0.12 and len(word) > 2:
+            word = word[:-1]
+        elif roll < 0.15:
+            typed.append('junk')
+        typed.append(word)
+    return ' '.join(typed)
+
+
+def session_view(session, client_results, changes):
+    # O que o cliente mostra: os resultados acumulados e as palavras que ainda faltam
+    return client_results + [{'text': text, 'type': 'missing'} for text in session.actual.texts[changes['missing_from']:]]
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_incremental_updates_match_a_full_validation(transcript, seed):
+    rng = random.Random(seed)
+    words = transcript['transcript'].split()
+    first = rng.randrange(0, len(words) // 2) if seed % 2 else 0
+    target = typed_text(rng, words[first:first + rng.randrange(20, 80)])
+    session = create_session('ezmsrB59mj8', 'en', transcript['transcript'], transcript['timestamps'])
+
+    text = ''
+    position = 0
+    client_results = []
+    while position < len(target):
+        if rng.random() < 0.1 and len(text) > 5:
+            # Apaga o fim do texto
+            offset = len(text) - rng.randrange(1, 5)
+            chunk = ''
+        else:
+            step = rng.randrange(1, 4)
+            offset = len(text)
+            chunk = target[position:position + step]
+            position += step
+        text = text[:offset] + chunk
+        changes = session.update(chunk, offset)
+        client_results = client_results[:changes['from']] + changes['results']
+
+        assert len(client_results) == changes['total_results']
+        assert session_view(session, client_results, changes) == validate_transcription(
+            text, transcript['transcript'], transcript['timestamps'])
+
+
+def test_edit_in_the_middle_matches_a_full_validation(transcript):
+    words = transcript['transcript'].split()
+    session = create_session('ezmsrB59mj8', 'en', transcript['transcript'], transcript['timestamps'])
+    text = ' '.join(words[:40])
+    changes = session.update(text)
+    client_results = changes['results']
+
+    middle = text.index(words[20])
+    text = text[:middle] + 'wrong ' + text[middle:]
+    changes = session.update(text[middle:], middle)
+    client_results = client_results[:changes['from']] + changes['results']
+
+    assert changes['from'] > 0
+    assert session_view(session, client_results, changes) == validate_transcription(
+        text, transcript['transcript'], transcript['timestamps'])
+
+
+def test_offset_outside_the_text_is_rejected(transcript):
+    session = create_session('ezmsrB59mj8', 'en', transcript['transcript'], transcript['timestamps'])
+    session.update('hello')
+
+    with pytest.raises(ValueError):
+        session.update('x', 10)
+
+
+def test_closed_session_is_gone(transcript):
+    session = create_session('ezmsrB59mj8', 'en', transcript['transcript'], transcript['timestamps'])
+
+    assert get_session(session.session_id) is session
+    assert close_session(session.session_id)
+    assert get_session(session.session_id) is None
+
+
+def test_update_superseded_while_aligning_is_cancelled(transcript):
+    words = transcript['transcript'].split()
+    session = create_session('ezmsrB59mj8', 'en', transcript['transcript'], transcript['timestamps'])
+    first = ' '.join(words[:30])
+    changes = session.update(first)
+    client_results = changes['results']
+
+    # A segunda atualização fica presa no alinhamento até a terceira chegar
+    aligning = threading.Event()
+    align = session.comparer.align
+
+    def blocking_align(*args, cancel=None, **kwargs):
+        if not aligning.is_set():
+            aligning.set()
+            assert cancel.wait(5)
+        return align(*args, cancel=cancel, **kwargs)
+    session.comparer.align = blocking_align
+
+    second = ' wrong ' + ' '.join(words[30:50])
+    errors = []
+
+    def superseded():
+        try:
+            session.update(second)
+        except AlignmentCancelled as e:
+            errors.append(e)
+    thread = threading.Thread(target=superseded)
+    thread.start()
+    assert aligning.wait(5)
+    third = ' ' + ' '.join(words[50:60])
+    text = first + second + third
+    # O offset conta o texto da atualização cancelada
+    changes = session.update(third, len(first + second))
+    thread.join()
+
+    assert len(errors) == 1
+    client_results = client_results[:changes['from']] + changes['results']
+    assert len(client_results) == changes['total_results']
+    assert session_view(session, client_results, changes) == validate_transcription(
+        text, transcript['transcript'], transcript['timestamps'])